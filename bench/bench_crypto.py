@@ -0,0 +1,194 @@
+#!/usr/bin/python3
+# -*- coding: utf-8 -*-
+''' decryption of encrypted mdx dictionaries: _mdx_decrypt of the key block info,
+    ripemd128 and Salsa20, against the byte-at-a-time versions they replaced
+    (kept below), on the pure python path and, if it is installed, with numpy
+
+    python bench/bench_crypto.py [--entries 950000]
+'''
+import argparse
+import os
+import struct
+import sys
+import tempfile
+import time
+from contextlib import ExitStack
+from unittest import mock
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import mdxgen
+from src.components.classbases import mdpackage
+from src.components.classbases.mdpackage import MdPackage
+from src.components.classbases.utils import pureSalsa20
+from src.components.classbases.utils.pureSalsa20 import Salsa20, salsa20_wordtobyte
+from src.components.classbases.utils.ripemd128 import ripemd128
+
+R = [0, 1, 2, 3, 4, 5, 6, 7, 8, 9, 10, 11, 12, 13, 14, 15,
+    7, 4, 13, 1, 10, 6, 15, 3, 12, 0, 9, 5, 2, 14, 11, 8,
+    3, 10, 14, 4, 9, 15, 8, 1, 2, 7, 0, 6, 13, 11, 5, 12,
+    1, 9, 11, 10, 0, 8, 12, 4, 13, 3, 7, 15, 14, 5, 6, 2]
+RP = [5, 14, 7, 0, 9, 2, 11, 4, 13, 6, 15, 8, 1, 10, 3, 12,
+    6, 11, 3, 7, 0, 13, 5, 10, 14, 15, 8, 12, 4, 9, 1, 2,
+    15, 5, 1, 3, 7, 14, 6, 9, 11, 8, 12, 2, 10, 0, 4, 13,
+    8, 6, 4, 1, 3, 11, 15, 0, 5, 12, 2, 13, 9, 7, 10, 14]
+S = [11, 14, 15, 12, 5, 8, 7, 9, 11, 13, 14, 15, 6, 7, 9, 8,
+    7, 6, 8, 13, 11, 9, 7, 15, 7, 12, 15, 9, 11, 7, 13, 12,
+    11, 13, 6, 7, 14, 9, 13, 15, 14, 8, 13, 6, 5, 12, 7, 5,
+    11, 12, 14, 15, 14, 15, 9, 8, 9, 14, 5, 6, 8, 6, 5, 12]
+SP = [8, 9, 9, 11, 13, 15, 15, 5, 7, 7, 8, 11, 14, 14, 12, 6,
+    9, 13, 15, 7, 12, 8, 9, 11, 7, 7, 12, 7, 6, 15, 13, 11,
+    9, 7, 15, 11, 8, 6, 6, 14, 12, 13, 5, 14, 13, 13, 7, 5,
+    15, 5, 8, 11, 14, 14, 6, 14, 6, 9, 12, 9, 12, 5, 15, 8]
+
+
+def old_f(j: int, x: int, y: int, z: int) -> int:
+    if j < 16:
+        return x ^ y ^ z
+    if j < 32:
+        return (x & y) | (z & ~x)
+    if j < 48:
+        return (x | (0xffffffff & ~y)) ^ z
+    return (x & z) | (y & ~z)
+
+
+def old_k(j: int) -> int:
+    return (0x00000000, 0x5a827999, 0x6ed9eba1, 0x8f1bbcdc)[j // 16]
+
+
+def old_kp(j: int) -> int:
+    return (0x50a28be6, 0x5c4dd124, 0x6d703ef3, 0x00000000)[j // 16]
+
+
+def old_add(*args: int) -> int:
+    return sum(args) & 0xffffffff
+
+
+def old_rol(s: int, x: int) -> int:
+    return (x << s | x >> (32 - s)) & 0xffffffff
+
+
+def old_ripemd128(message: bytes) -> bytes:
+    # a function call per step, a struct.unpack per word
+    origlen = len(message)
+    message += b"\x80" + b"\x00" * (64 - ((origlen - 56) % 64) - 1) + struct.pack("<Q", origlen * 8)
+    x = [[struct.unpack("<L", message[i + j: i + j + 4])[0] for j in range(0, 64, 4)]
+        for i in range(0, len(message), 64)]
+    h0, h1, h2, h3 = 0x67452301, 0xefcdab89, 0x98badcfe, 0x10325476
+    for block in x:
+        a, b, c, d = h0, h1, h2, h3
+        ap, bp, cp, dp = h0, h1, h2, h3
+        for j in range(64):
+            t = old_rol(S[j], old_add(a, old_f(j, b, c, d), block[R[j]], old_k(j)))
+            a, d, c, b = d, c, b, t
+            t = old_rol(SP[j], old_add(ap, old_f(63 - j, bp, cp, dp), block[RP[j]], old_kp(j)))
+            ap, dp, cp, bp = dp, cp, bp, t
+        t = old_add(h1, c, dp)
+        h1 = old_add(h2, d, ap)
+        h2 = old_add(h3, a, bp)
+        h3 = old_add(h0, b, cp)
+        h0 = t
+    return struct.pack("<LLLL", h0, h1, h2, h3)
+
+
+def old_fast_decrypt(data: bytes, key: bytes) -> bytes:
+    b = bytearray(data)
+    previous = 0x36
+    for i in range(len(b)):
+        t = (b[i] >> 4 | b[i] << 4) & 0xff
+        t = t ^ previous ^ (i & 0xff) ^ key[i % len(key)]
+        previous = b[i]
+        b[i] = t
+    return bytes(b)
+
+
+def old_mdx_decrypt(comp_block: bytes) -> bytes:
+    key = old_ripemd128(comp_block[4:8] + struct.pack(b'<L', 0x3695))
+    return comp_block[0:8] + old_fast_decrypt(comp_block[8:], key)
+
+
+def fast_encrypt(data: bytes, key: bytes) -> bytes:
+    # the inverse of _fast_decrypt, how an Encrypted="2" file stores the key block info
+    c = bytearray(len(data))
+    previous = 0x36
+    for i, t in enumerate(data):
+        t = t ^ previous ^ (i & 0xff) ^ key[i % len(key)]
+        c[i] = (t >> 4 | t << 4) & 0xff
+        previous = c[i]
+    return bytes(c)
+
+
+def old_salsa20(s20: Salsa20, data: bytes) -> bytes:
+    # a core call and a counter update per block, an xor per byte
+    munged = bytearray(len(data))
+    for i in range(0, len(data), 64):
+        h = salsa20_wordtobyte(s20.ctx, s20.rounds, is_check_rounds=False)
+        s20.set_counter((s20.get_counter() + 1) % 2**64)
+        for j in range(min(64, len(data) - i)):
+            munged[i + j] = data[i + j] ^ h[j]
+    return bytes(munged)
+
+
+def best_of(func, repeat: int) -> tuple[float, object]:
+    best = float("inf")
+    result = None
+    for _ in range(repeat):
+        strt = time.process_time()
+        result = func()
+        best = min(best, time.process_time() - strt)
+    return best * 1000, result
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    _ = parser.add_argument("--entries", type=int, default=950000)
+    _ = parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    # the compressed key block info of a big dictionary, encrypted as an Encrypted="2" file has it
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "bench.mdx")
+        mdxgen.write(path, [(key, "x") for key, _ in mdxgen.sample(args.entries, 3)], keys_per_block=256)
+        with open(path, "rb") as f:
+            header_size = int.from_bytes(f.read(4), "big")
+            _ = f.seek(4 + header_size + 4)
+            _, _, keyinfo_size, keyinfo_csize, _ = struct.unpack(">5Q", f.read(40))
+            _ = f.read(4)
+            keyinfo_compressed = f.read(keyinfo_csize)
+    key = ripemd128(keyinfo_compressed[4:8] + struct.pack(b'<L', 0x3695))
+    encrypted = keyinfo_compressed[:8] + fast_encrypt(keyinfo_compressed[8:], key)
+    print(f"key block info of {args.entries} keys: {len(encrypted)} bytes compressed, {keyinfo_size} bytes")
+
+    package = MdPackage("", False, "", use_index=False)
+    message = os.urandom(65536)
+    s20_key, s20_iv = os.urandom(16), b"\x00" * 8
+    # the 8 bytes the key of _mdx_decrypt is hashed from, 100 of them per run
+    short = [encrypted[4:8] + struct.pack(b'<L', 0x3695)] * 100
+
+    numpy = ["numpy"] if mdpackage.np is not None else []
+    # ripemd128 has no numpy path
+    benches = [
+        ("_mdx_decrypt", lambda: old_mdx_decrypt(encrypted), lambda: package._mdx_decrypt(encrypted), 1, numpy),
+        ("Salsa20/8 64 KiB", lambda: old_salsa20(Salsa20(s20_key, s20_iv, 8), message),
+            lambda: Salsa20(s20_key, s20_iv, 8).encrypt_bytes(message), 1, numpy),
+        ("ripemd128 64 KiB", lambda: old_ripemd128(message), lambda: ripemd128(message), 1, []),
+        ("ripemd128 8 bytes", lambda: [old_ripemd128(m) for m in short], lambda: [ripemd128(m) for m in short],
+            len(short), []),
+    ]
+    for label, old, new, n, paths in benches:
+        t_old, expected = best_of(old, args.repeat)
+        line = f"{label}: {t_old / n:.2f} ms"
+        for name in ["pure python"] + paths:
+            with ExitStack() as stack:
+                if name == "pure python":
+                    for module in (mdpackage, pureSalsa20):
+                        _ = stack.enter_context(mock.patch.object(module, "np", None))
+                t_new, result = best_of(new, args.repeat)
+            assert result == expected
+            line += f" -> {t_new / n:.2f} ms ({name})"
+        print(line)
+    assert package._mdx_decrypt(encrypted) == keyinfo_compressed
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,89 @@
+#!/usr/bin/python3
+# -*- coding: utf-8 -*-
+''' CPU of a google dictionary lookup: GDictEntry parses an entry once, the
+    lookup it replaced parsed it four times (kept below)
+
+    python bench/bench_gdict_parse.py [--entries 600]
+'''
+import argparse
+import json
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from gdictgen import GDictGen
+from src.components.gdictbase import GDictBase, GDictEntry
+
+
+def old_parse(dictjson: str) -> tuple[str, list[object]]:
+    # the word check: the outer json, then info with every backslash doubled
+    data = json.loads(dictjson, strict=False)
+    inword = json.loads(data["info"].replace('\\', '\\\\'), strict=True)["primaries"][0]["terms"][0]["text"]
+    # the page: the outer json again, then info with \x read as \u00
+    data = json.loads(dictjson, strict=False)
+    primaries = json.loads(data["info"].replace("\\x", "\\u00"), strict=True)["primaries"]
+    return inword, primaries
+
+
+def new_parse(dictjson: str) -> tuple[str, list[object]]:
+    entry = GDictEntry(dictjson)
+    return entry.inword, entry.primaries
+
+
+def cpu_per_call(func, docs: list[tuple[str, str]], repeat: int) -> float:
+    best = float("inf")
+    for _ in range(3):
+        strt = time.process_time()
+        for _ in range(repeat):
+            for word, dictjson in docs:
+                func(word, dictjson)
+        best = min(best, (time.process_time() - strt) / (repeat * len(docs)))
+    return best * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    _ = parser.add_argument("--entries", type=int, default=600)
+    _ = parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    gen = GDictGen()
+    words = sorted(set(gen.vocab[:3000]))[:args.entries]
+    docs = [(word, gen.entry(word)) for word in words]
+    print(f"{len(docs)} entries, mean {sum(len(doc) for _, doc in docs) // len(docs)} bytes")
+
+    dictbase = GDictBase()
+    # the page itself, not where it is kept
+    dictbase.store_page = lambda pagename, html: html
+
+    def old_lookup(word: str, dictjson: str) -> str:
+        inword, primaries = old_parse(dictjson)
+        assert inword == word
+        out: list[str] = []
+        dictbase._render_primary(out, "\t\t", primaries)
+        return "".join(out)
+
+    def new_lookup(word: str, dictjson: str) -> str:
+        entry = GDictEntry(dictjson)
+        assert entry.inword == word
+        out: list[str] = []
+        dictbase._render_primary(out, "\t\t", entry.primaries)
+        return "".join(out)
+
+    for word, dictjson in docs:
+        assert old_parse(dictjson) == new_parse(dictjson)
+        assert old_lookup(word, dictjson) == new_lookup(word, dictjson)
+
+    for label, old, new in (
+            ("parse and word check", lambda w, d: old_parse(d), lambda w, d: new_parse(d)),
+            ("whole lookup", old_lookup, new_lookup)):
+        t_old = cpu_per_call(old, docs, args.repeat)
+        t_new = cpu_per_call(new, docs, args.repeat)
+        print(f"{label}: {t_old:.1f} us -> {t_new:.1f} us per entry ({(1 - t_new / t_old) * 100:.0f}% less CPU)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,128 @@
+#!/usr/bin/python3
+# -*- coding: utf-8 -*-
+''' CPU of rendering a google dictionary page: _render_primary appends to one list
+    joined once, the renderer it replaced returned a string from every node and
+    copied it into its parent's (kept below)
+
+    python bench/bench_gdict_render.py [--entries 600]
+'''
+import argparse
+import json
+import os
+import sys
+import time
+from typing import Any
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from gdictgen import GDictGen
+from src.components.gdictbase import GDictBase, GDictEntry
+
+
+def old_primary(dictbase: GDictBase, tabalign: str, primary: Any) -> str:
+    xml = ""
+    if isinstance(primary, list):
+        for data in primary:
+            html = old_primary(dictbase, tabalign, data)
+            if html[0] == "<":
+                xml += "\n" + tabalign
+            xml += html
+    elif isinstance(primary, dict):
+        if "type" in primary:
+            if primary["type"] == "container":
+                xml += f'{tabalign}<div class = "wordtyp">{primary["labels"][0]["text"]}: </div>\n'
+                xml += tabalign + "<div class = '" + primary["type"] + "1'>\n"
+                tabalign += "\t"
+                entries = primary["entries"]
+                html = old_terms(dictbase, tabalign, entries[0]["terms"], entries[0]["type"])
+            elif "labels" in primary:
+                xml += f"{tabalign}<div class = '{primary["type"]}'>"
+                tabalign += "\t"
+                xml += f"\n{tabalign}<div class = 'labels'>{primary['labels'][0]['text']}</div>"
+                html = old_terms(dictbase, tabalign, primary["terms"], primary["type"])
+            else:
+                xml += f"{tabalign}<div class = '{primary["type"]}'>"
+                tabalign += "\t"
+                html = old_terms(dictbase, tabalign, primary["terms"], primary["type"])
+            if html[0] == "<":
+                xml += "\n" + tabalign
+            xml += html
+            if "entries" in primary:
+                html = old_primary(dictbase, tabalign, primary["entries"])
+                if html[0] == "<":
+                    xml += "\n" + tabalign + "Q: "
+                xml += html
+            tabalign = tabalign[0]
+            if xml[-3] == ">":
+                xml += tabalign
+            if xml[-1] == ">":
+                xml += "\n" + tabalign
+            xml += "</div>\n"
+    elif isinstance(primary, str):
+        xml += old_primary(dictbase, tabalign, json.loads(primary, strict=False))
+    return xml
+
+
+def old_terms(dictbase: GDictBase, tabalign: str, terms: Any, typ: str) -> str:
+    xml = ""
+    if isinstance(terms, list):
+        for data in terms:
+            xml += old_terms(dictbase, tabalign, data, typ)
+    elif isinstance(terms, dict):
+        if "type" in terms:
+            if terms["type"] != "text" or typ == "headword" or typ == "related":
+                if terms["type"] == "sound":
+                    xml += dictbase._get_sound(tabalign, terms["text"])
+                else:
+                    xml += f"\n{tabalign}<div class = '{terms["type"]}'>{terms['text']}</div>"
+            else:
+                xml += f"{terms["text"]}"
+    return xml
+
+
+def new_render(dictbase: GDictBase, primaries: list[Any]) -> str:
+    out: list[str] = []
+    dictbase._render_primary(out, "\t\t", primaries)
+    return "".join(out)
+
+
+def cpu_per_call(func, items: list[Any], repeat: int) -> float:
+    best = float("inf")
+    for _ in range(3):
+        strt = time.process_time()
+        for _ in range(repeat):
+            for item in items:
+                func(item)
+        best = min(best, (time.process_time() - strt) / (repeat * len(items)))
+    return best * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    _ = parser.add_argument("--entries", type=int, default=600)
+    _ = parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    gen = GDictGen()
+    words = sorted(set(gen.vocab[:3000]))[:args.entries]
+    corpus = [GDictEntry(gen.entry(word)).primaries for word in words]
+    # one entry with many senses, where copying every node's string into its parent costs most
+    wide = GDictEntry(gen.entry(words[0])).primaries
+    for _ in range(6):
+        wide[0]["entries"] += wide[0]["entries"]
+    print(f"{len(corpus)} entries, mean {sum(len(new_render(GDictBase(), p)) for p in corpus) // len(corpus)}"
+        f" bytes of html; wide entry {len(new_render(GDictBase(), wide))} bytes")
+
+    dictbase = GDictBase()
+    for primaries in corpus + [wide]:
+        assert old_primary(dictbase, "\t\t", primaries) == new_render(dictbase, primaries)
+
+    for label, items, repeat in (("corpus", corpus, args.repeat), ("wide entry", [wide], args.repeat * 10)):
+        t_old = cpu_per_call(lambda p: old_primary(dictbase, "\t\t", p), items, repeat)
+        t_new = cpu_per_call(lambda p: new_render(dictbase, p), items, repeat)
+        print(f"{label}: {t_old:.1f} us -> {t_new:.1f} us per entry ({(t_new / t_old - 1) * 100:+.0f}% CPU)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,77 @@
+#!/usr/bin/python3
+# -*- coding: utf-8 -*-
+''' memory of the key/record table of an opened mdx: the compact arrays
+    MdPackage keeps, against the str -> 5-tuple dict and key list they replaced
+
+    python bench/bench_memory.py [--entries 200000]
+'''
+import argparse
+import gc
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import mdxgen
+from src.components.classbases.mdpackage import MdPackage
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    _ = parser.add_argument("--entries", type=int, default=200000)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "bench.mdx")
+        mdxgen.write(path, mdxgen.sample(args.entries, 1), keys_per_block=256, rec_block_size=65536)
+
+        package = MdPackage(path, False, "", use_index=False)
+        package.open()
+        n = len(package)
+        keys = [package.key_at(i) for i in range(n)]
+        infos = [(package._rec_block[i], package._rec_strt[i], package._rec_end[i]) for i in range(n)]
+        blocks = [(package._blk_offset[b], package._blk_csize[b], package._blk_dsize[b])
+            for b in range(len(package._blk_offset))]
+        _ = package.close()
+        del package
+        gc.collect()
+
+        # the layout before: key -> (record start, record end, block offset,
+        # compressed size, decompressed size), and the keys once more in a list
+        tracemalloc.start()
+        # fresh copies of the keys, they are counted too
+        record_dict = {key.encode().decode(): (strt, end, *blocks[block])
+            for key, (block, strt, end) in zip(keys, infos)}
+        key_list = list(record_dict)
+        old = tracemalloc.get_traced_memory()[0]
+        del record_dict, key_list
+        gc.collect()
+        tracemalloc.stop()
+
+        tracemalloc.start()
+        package = MdPackage(path, False, "", use_index=False)
+        package.open()
+        gc.collect()
+        new = tracemalloc.get_traced_memory()[0]
+        tracemalloc.stop()
+        _ = package.close()
+
+        print(f"{n} keys: dict/tuple {old / 2**20:.1f} MB ({old / n:.0f} B/key), "
+            f"compact {new / 2**20:.1f} MB ({new / n:.0f} B/key)")
+
+        package = MdPackage(path, False, "")
+        package.open()
+        _ = package.close()
+        strt = time.perf_counter()
+        package = MdPackage(path, False, "")
+        package.open()
+        print(f"reopened from the sidecar index: {(time.perf_counter() - strt) * 1000:.0f} ms")
+        _ = package.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,59 @@
+#!/usr/bin/python3
+# -*- coding: utf-8 -*-
+''' time to open (index) a multi-volume mdx dictionary without its sidecar
+    indexes, by the number of workers decompressing the blocks
+
+    python bench/bench_open.py [--volumes 3] [--entries 200000] [--workers 1,2,4,8]
+'''
+import argparse
+import glob
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import mdxgen
+from src.components.mdictbase import MDictBase
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    _ = parser.add_argument("--volumes", type=int, default=3)
+    _ = parser.add_argument("--entries", type=int, default=200000, help="per volume")
+    _ = parser.add_argument("--workers", default="1,2,4,8")
+    _ = parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        src = os.path.join(tmp, "Bench")
+        os.makedirs(src)
+        for vol in range(args.volumes):
+            name = "Bench.mdx" if vol == 0 else f"Bench.{vol}.mdx"
+            # large record blocks, most of the time goes to inflating them
+            mdxgen.write(os.path.join(src, name), mdxgen.sample(args.entries, vol, f"{vol}"),
+                keys_per_block=256, rec_block_size=65536)
+        size = sum(os.path.getsize(path) for path in glob.glob(os.path.join(src, "*.mdx")))
+        print(f"{args.volumes} volumes, {args.entries} entries each, {size / 2**20:.1f} MiB, "
+            f"{os.cpu_count()} CPUs")
+
+        base = 0.0
+        for workers in [int(w) for w in args.workers.split(",")]:
+            best = float("inf")
+            for _ in range(args.repeat):
+                for idx in glob.glob(os.path.join(src, "*.idx")):
+                    os.remove(idx)
+                dictbase = MDictBase(workers=workers)
+                strt = time.perf_counter()
+                ret, msg = dictbase.open("Bench", src)
+                best = min(best, time.perf_counter() - strt)
+                assert ret == 1, msg
+                _ = dictbase.close()
+            base = base or best
+            print(f"workers {workers}: {best:.2f} s, {base / best:.2f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,137 @@
+#!/usr/bin/python3
+# -*- coding: utf-8 -*-
+''' parsing the key block info, the key blocks and the record block info of an
+    mdx, MdPackage against the field-by-field parsers it replaced (kept below)
+
+    python bench/bench_parse.py [--entries 950000]
+'''
+import argparse
+import io
+import os
+import struct
+import sys
+import tempfile
+import time
+import zlib
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import mdxgen
+from src.components.classbases.mdpackage import MdPackage
+
+
+def old_keyblockinfo(keyblock_info: bytes, num_format: str, width_num: int) -> list[tuple[int, int]]:
+    # v2, utf-8: a slice and a struct.unpack per field
+    keyblockinfo_list: list[tuple[int, int]] = []
+    i = 0
+    while i < len(keyblock_info):
+        _ = struct.unpack(num_format, keyblock_info[i: i + width_num])[0]
+        i += width_num
+        texthead_size = struct.unpack('>H', keyblock_info[i: i + 2])[0]
+        i += 2 + texthead_size + 1
+        texttail_size = struct.unpack('>H', keyblock_info[i: i + 2])[0]
+        i += 2 + texttail_size + 1
+        compressed_size = struct.unpack(num_format, keyblock_info[i: i + width_num])[0]
+        i += width_num
+        decompressed_size = struct.unpack(num_format, keyblock_info[i: i + width_num])[0]
+        i += width_num
+        keyblockinfo_list += [(compressed_size, decompressed_size)]
+    return keyblockinfo_list
+
+
+def old_decode_keyblock(key_block: bytes, num_format: str, width_num: int) -> list[tuple[int, bytes]]:
+    # the terminator found by comparing one slice at a time
+    key_list: list[tuple[int, bytes]] = []
+    keystrt_idx = 0
+    keyend_idx = 0
+    while keystrt_idx < len(key_block):
+        key_id = struct.unpack(num_format, key_block[keystrt_idx: keystrt_idx + width_num])[0]
+        i = keystrt_idx + width_num
+        while i < len(key_block):
+            if key_block[i: i + 1] == b'\x00':
+                keyend_idx = i
+                break
+            i += 1
+        key_text = str(key_block[keystrt_idx + width_num: keyend_idx], 'UTF-8', errors='ignore')
+        keystrt_idx = keyend_idx + 1
+        key_list += [(key_id, key_text.encode('utf-8').strip())]
+    return key_list
+
+
+def old_recordblock_info(f: io.BytesIO, recordblocks_num: int, num_format: str,
+        width_num: int) -> list[tuple[int, int]]:
+    recordblockinfo_list: list[tuple[int, int]] = []
+    for _ in range(recordblocks_num):
+        compressed_size = struct.unpack(num_format, f.read(width_num))[0]
+        decompressed_size = struct.unpack(num_format, f.read(width_num))[0]
+        recordblockinfo_list += [(compressed_size, decompressed_size)]
+    return recordblockinfo_list
+
+
+def best_of(func, repeat: int):
+    best = float("inf")
+    result = None
+    for _ in range(repeat):
+        strt = time.perf_counter()
+        result = func()
+        best = min(best, time.perf_counter() - strt)
+    return best * 1000, result
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    _ = parser.add_argument("--entries", type=int, default=950000)
+    _ = parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "bench.mdx")
+        # short records, the key sections are most of the file
+        mdxgen.write(path, [(key, "x") for key, _ in mdxgen.sample(args.entries, 3)],
+            keys_per_block=256, rec_block_size=65536)
+        package = MdPackage(path, False, "", use_index=False)
+        package.open()
+        num_format, width_num = package._num_format, package._width_num
+
+        # the raw sections of a v2 file
+        with open(path, "rb") as f:
+            header_size = int.from_bytes(f.read(4), "big")
+            _ = f.seek(4 + header_size + 4)
+            keyblocks_num, _, keyinfo_size, keyinfo_csize, keyblocks_size = struct.unpack(">5Q", f.read(40))
+            _ = f.read(4)
+            keyinfo_compressed = f.read(keyinfo_csize)
+            keyblocks = f.read(keyblocks_size)
+            recordblocks_num, _, recordinfo_size, _ = struct.unpack(">4Q", f.read(32))
+            recordinfo = f.read(recordinfo_size)
+        keyinfo = zlib.decompress(keyinfo_compressed[8:])
+
+        t_new, info = best_of(lambda: package._decord_keyblockinfo(keyinfo_compressed, keyinfo_size),
+            args.repeat)
+        t_old, old_info = best_of(lambda: old_keyblockinfo(keyinfo, num_format, width_num), args.repeat)
+        assert [tuple(x) for x in info] == old_info
+        print(f"key block info ({keyblocks_num} blocks): {t_old:.1f} ms -> {t_new:.1f} ms")
+
+        blocks: list[bytes] = []
+        i = 0
+        for csize, dsize in info:
+            blocks.append(bytes(package._inflate_block((keyblocks[i: i + csize], dsize))))
+            i += csize
+        t_new, keys = best_of(lambda: [key for block in blocks for key in package._decode_keyblock(block)],
+            args.repeat)
+        t_old, old_keys = best_of(lambda: [key for block in blocks
+            for key in old_decode_keyblock(block, num_format, width_num)], args.repeat)
+        assert keys == old_keys
+        print(f"key blocks ({len(keys)} keys): {t_old:.0f} ms -> {t_new:.0f} ms")
+
+        t_new, records = best_of(lambda: package._read_recordblock_info(io.BytesIO(recordinfo),
+            recordblocks_num, recordinfo_size), 5)
+        t_old, old_records = best_of(lambda: old_recordblock_info(io.BytesIO(recordinfo),
+            recordblocks_num, num_format, width_num), 5)
+        assert [tuple(x) for x in records] == old_records
+        print(f"record block info ({recordblocks_num} blocks): {t_old * 1000:.0f} us -> {t_new * 1000:.0f} us")
+        _ = package.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,88 @@
+#!/usr/bin/python3
+# -*- coding: utf-8 -*-
+''' the compressed copies of a rendered page: bytes sent and CPU spent per page
+    for the gzip levels and brotli qualities precompress.py could use, and what
+    a copy saves on small pages, against MIN_COMPRESS_SIZE
+
+    python bench/bench_precompress.py [--entries 300]
+'''
+import argparse
+import gzip
+import json
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from gdictgen import GDictGen
+from src.components.classbases.precompress import (BROTLI_QUALITY, GZIP_LEVEL, MIN_COMPRESS_SIZE,
+    brotli, compress_page)
+from src.components.gdictbase import GDictBase, GDictEntry
+
+
+def cpu_per_page(func, pages: list[bytes]) -> tuple[float, int]:
+    ''' best of 3, ms per page, and the bytes of the compressed pages
+    '''
+    best = float("inf")
+    size = 0
+    for _ in range(3):
+        strt = time.process_time()
+        size = sum(len(func(page)) for page in pages)
+        best = min(best, time.process_time() - strt)
+    return best / len(pages) * 1000, size
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    _ = parser.add_argument("--entries", type=int, default=300)
+    args = parser.parse_args()
+
+    gen = GDictGen()
+    dictbase = GDictBase()
+    # the page itself, not where it is kept
+    dictbase.store_page = lambda pagename, html: html
+    words = sorted(set(gen.vocab[:3000]))[:args.entries]
+    pages = [dictbase._render_entry(GDictEntry(gen.entry(word)), word + ".html").encode("utf-8")
+        for word in words]
+    raw = sum(len(page) for page in pages)
+    # one entry with the senses of 40, as the biggest entries of a real dictionary
+    primaries = gen.primaries(words[0])
+    for word in words[1:40]:
+        primaries[0]["entries"] += gen.primaries(word)[0]["entries"]
+    entry = GDictEntry(json.dumps({"ok": True, "info": json.dumps({"primaries": primaries})}))
+    wide = [dictbase._render_entry(entry, words[0] + ".html").encode("utf-8")]
+    print(f"{len(pages)} pages, mean {raw // len(pages)} bytes; a wide page of {len(wide[0])} bytes")
+
+    codecs: list[tuple[str, object]] = [(f"gzip {level}", lambda page, level=level: gzip.compress(page, level,
+        mtime=0)) for level in (1, 6, 9)]
+    if brotli is not None:
+        codecs += [(f"brotli {quality}", lambda page, quality=quality: brotli.compress(page, quality=quality))
+            for quality in (1, 5, 9, 11)]
+    else:
+        print("brotli isn't installed, only gzip is measured")
+    for label, func in codecs:
+        ms, size = cpu_per_page(func, pages)
+        wide_ms, wide_size = cpu_per_page(func, wide)
+        chosen = " <-" if label in (f"gzip {GZIP_LEVEL}", f"brotli {BROTLI_QUALITY}") else ""
+        print(f"{label:>10}: {size / raw * 100:5.1f}% of the page, {ms:5.2f} ms per page;"
+            f" wide page {wide_size / len(wide[0]) * 100:5.1f}%, {wide_ms:6.1f} ms{chosen}")
+
+    ms, _ = cpu_per_page(lambda page: b"".join(compress_page(page).values()), pages)
+    print(f"compress_page, all copies: {ms:.2f} ms per page")
+
+    # what a copy saves on a page cut to n bytes, the headers of a response are a few hundred bytes
+    print(f"small pages (MIN_COMPRESS_SIZE = {MIN_COMPRESS_SIZE}):")
+    for n in (128, 256, 512, 1024, 2048):
+        cut = [page[:n] for page in pages]
+        _, gz = cpu_per_page(lambda page: gzip.compress(page, GZIP_LEVEL, mtime=0), cut)
+        saved = f"gzip saves {(len(cut) * n - gz) / len(cut):4.0f}"
+        if brotli is not None:
+            _, br = cpu_per_page(lambda page: brotli.compress(page, quality=BROTLI_QUALITY), cut)
+            saved += f", brotli {(len(cut) * n - br) / len(cut):4.0f}"
+        print(f"  {n:5} bytes: {saved} bytes per page")
+
+
+if __name__ == "__main__":
+    main()
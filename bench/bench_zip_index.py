@@ -0,0 +1,78 @@
+#!/usr/bin/python3
+# -*- coding: utf-8 -*-
+''' name lookups of ZipArchive: has_file on the name set and prefix_names on
+    the sorted names, against a list search and a regex scan over every name
+
+    python bench/bench_zip_index.py [--names 200000]
+'''
+import argparse
+import os
+import random
+import re
+import sys
+import tempfile
+import time
+import zipfile
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.components.classbases.ziparchive import ZipArchive
+
+
+def per_call(func, items: list[str], repeat: int = 1) -> float:
+    strt = time.perf_counter()
+    for _ in range(repeat):
+        for item in items:
+            _ = func(item)
+    return (time.perf_counter() - strt) / (repeat * len(items)) * 1e6
+
+
+def regex_scan(names: list[str], pattern: str, limit: int) -> list[str]:
+    regex = re.compile(pattern)
+    return [name for name in names if regex.search(name)][:limit]
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    _ = parser.add_argument("--names", type=int, default=200000)
+    args = parser.parse_args()
+
+    rnd = random.Random(5)
+    letters = "abcdefghijklmnopqrstuvwxyz"
+    words: set[str] = set()
+    while len(words) < args.names:
+        words.add("".join(rnd.choice(letters) for _ in range(rnd.randint(3, 10))))
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "bench.zip")
+        with zipfile.ZipFile(path, "w") as zipf:
+            for word in words:
+                zipf.writestr(f"{word[0]}/{word}.json", b"{}")
+
+        archive = ZipArchive()
+        strt = time.perf_counter()
+        ret, msg = archive.open(path)
+        assert ret == 1, msg
+        print(f"{args.names} names, open {(time.perf_counter() - strt) * 1000:.0f} ms")
+
+        names = archive.names(".json")
+        # in archive order, as namelist() gives them
+        file_list = list(names)
+        rnd.shuffle(file_list)
+        probes = [rnd.choice(names) for _ in range(200)] + [f"x/zz{i}.json" for i in range(200)]
+        old = per_call(lambda name: name in file_list, probes)
+        new = per_call(archive.has_file, probes, 100)
+        print(f"has_file: list {old:.0f} us -> set {new:.2f} us")
+
+        prefixes = [(name[0] + "/" + name[2: 5]) for name in rnd.sample(names, 100)]
+        for prefix in prefixes:
+            assert regex_scan(names, "^" + re.escape(prefix), 100) == \
+                archive.prefix_names(prefix, 100, ".json")
+        old = per_call(lambda prefix: regex_scan(names, "^" + re.escape(prefix), 100), prefixes)
+        new = per_call(lambda prefix: archive.prefix_names(prefix, 100, ".json"), prefixes, 10)
+        print(f"prefix query, up to 100 names: regex scan {old / 1000:.1f} ms -> bisect {new:.1f} us")
+        _ = archive.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,52 @@
+#!/usr/bin/python3
+# -*- coding: utf-8 -*-
+''' synthetic entries shaped like the google dictionary files,
+    {"ok": true, "info": "<json of the primaries>"} with \\xhh escapes in info
+'''
+import json
+import random
+
+_SYLLABLES = ("ba be bi bo bu ca co de di fa fe ga go ha he la le li lo ma me mi mo na ne no "
+    "pa pe pi po ra re ri ro sa se si so ta te ti to va ve vi wa we ya yo za ze").split()
+
+
+class GDictGen:
+    def __init__(self, seed: int = 7):
+        self._rnd: random.Random = random.Random(seed)
+        self.vocab: list[str] = ["".join(self._rnd.choice(_SYLLABLES) for _ in range(self._rnd.randint(1, 3)))
+            for _ in range(3000)] + "the a of to and in that is for it as with on by".split() * 20
+
+    def _sentence(self, n: int) -> str:
+        return " ".join(self._rnd.choice(self.vocab) for _ in range(n)).capitalize() + "."
+
+    def _text(self, n: int) -> dict[str, str]:
+        return {"type": "text", "text": self._sentence(n)}
+
+    def primaries(self, word: str) -> list[dict[str, object]]:
+        rnd = self._rnd
+        pos_entries: list[dict[str, object]] = []
+        for pos in rnd.sample(["Noun", "Verb", "Adjective", "Adverb"], rnd.randint(1, 3)):
+            senses: list[dict[str, object]] = []
+            for _ in range(rnd.randint(1, 5)):
+                sense: dict[str, object] = {"type": "meaning", "terms": [self._text(rnd.randint(6, 16))]}
+                examples: list[dict[str, object]] = [{"type": "example", "terms": [self._text(rnd.randint(5, 12))]}
+                    for _ in range(rnd.randint(0, 3))]
+                if rnd.random() < 0.3:
+                    examples.append({"type": "related", "labels": [{"text": "Synonyms"}],
+                        "terms": [{"type": "text", "text": rnd.choice(self.vocab)} for _ in range(rnd.randint(2, 6))]})
+                if examples:
+                    sense["entries"] = examples
+                senses.append(sense)
+            pos_entries.append({"type": "container", "labels": [{"text": pos}], "entries": senses})
+        return [{"type": "headword", "terms": [
+                {"type": "text", "text": word},
+                {"type": "phonetic", "text": "/" + word + "/"},
+                {"type": "sound", "text": f"http://example.com/{word}.mp3"}],
+            "entries": pos_entries}]
+
+    def entry(self, word: str) -> str:
+        info = json.dumps({"primaries": self.primaries(word)})
+        # the files escape markup and quotes as \xhh inside info
+        for plain, escaped in ((" of ", " \\x3cb\\x3eof\\x3c/b\\x3e "), (" to ", " to\\x27s ")):
+            info = info.replace(plain, escaped)
+        return json.dumps({"ok": True, "info": info})
@@ -0,0 +1,85 @@
+#!/usr/bin/python3
+# -*- coding: utf-8 -*-
+''' a minimal MDict 2.0 writer, synthetic dictionaries for the benchmarks
+'''
+import random
+import struct
+import zlib
+
+LETTERS = "abcdefghijklmnopqrstuvwxyz"
+
+
+def _block(data: bytes) -> bytes:
+    # zlib, with the adler32 of the decompressed data
+    return b"\x02\x00\x00\x00" + struct.pack(">I", zlib.adler32(data) & 0xffffffff) + zlib.compress(data)
+
+
+def write(path: str, entries: list[tuple[str, str | bytes]], is_mdd: bool = False,
+        keys_per_block: int = 64, rec_block_size: int = 8192):
+    ''' entries sorted by key, text records for mdx, bytes for mdd
+    '''
+    kenc = "utf-16-le" if is_mdd else "utf-8"
+    term = b"\x00\x00" if is_mdd else b"\x00"
+    if is_mdd:
+        hdr = ('<Library_Data GeneratedByEngineVersion="2.0" RequiredEngineVersion="2.0" Encrypted="0" '
+            'Format="" KeyCaseSensitive="No" Title=""/>\r\n\x00')
+    else:
+        hdr = ('<Dictionary GeneratedByEngineVersion="2.0" RequiredEngineVersion="2.0" Encrypted="0" '
+            'Encoding="UTF-8" Format="Html" KeyCaseSensitive="No" Title="bench"/>\r\n\x00')
+    hb = hdr.encode("utf-16-le")
+    out = bytearray(struct.pack(">I", len(hb)) + hb + struct.pack("<I", zlib.adler32(hb) & 0xffffffff))
+
+    records: list[bytes] = []
+    offsets: list[int] = []
+    offset = 0
+    for _, value in entries:
+        data = value if isinstance(value, bytes) else value.encode("utf-8") + b"\x00"
+        offsets.append(offset)
+        records.append(data)
+        offset += len(data)
+
+    keyblocks: list[bytes] = []
+    keyinfo = bytearray()
+    for i in range(0, len(entries), keys_per_block):
+        chunk = entries[i: i + keys_per_block]
+        raw = bytearray()
+        for j, (key, _) in enumerate(chunk):
+            raw += struct.pack(">Q", offsets[i + j]) + key.encode(kenc) + term
+        block = _block(bytes(raw))
+        keyblocks.append(block)
+        first, last = chunk[0][0].encode(kenc), chunk[-1][0].encode(kenc)
+        # lengths in characters, utf-16 has two bytes per character
+        width = 2 if is_mdd else 1
+        keyinfo += struct.pack(">QH", len(chunk), len(first) // width) + first + term
+        keyinfo += struct.pack(">H", len(last) // width) + last + term
+        keyinfo += struct.pack(">QQ", len(block), len(raw))
+    keyinfo_compressed = _block(bytes(keyinfo))
+    keyblock_data = b"".join(keyblocks)
+    nums = struct.pack(">QQQQQ", len(keyblocks), len(entries), len(keyinfo),
+        len(keyinfo_compressed), len(keyblock_data))
+    out += nums + struct.pack(">I", zlib.adler32(nums) & 0xffffffff) + keyinfo_compressed + keyblock_data
+
+    alldata = b"".join(records)
+    recblocks = [alldata[i: i + rec_block_size] for i in range(0, len(alldata), rec_block_size)]
+    compressed = [_block(block) for block in recblocks]
+    out += struct.pack(">QQQQ", len(compressed), len(entries), 16 * len(compressed), sum(map(len, compressed)))
+    for block, raw_block in zip(compressed, recblocks):
+        out += struct.pack(">QQ", len(block), len(raw_block))
+    for block in compressed:
+        out += block
+    with open(path, "wb") as f:
+        _ = f.write(out)
+
+
+def sample(n: int, seed: int = 0, prefix: str = "") -> list[tuple[str, str]]:
+    ''' n random headwords starting with prefix, with short html entries, sorted
+    '''
+    rnd = random.Random(seed)
+    words: set[str] = set()
+    while len(words) < n:
+        words.add(prefix + "".join(rnd.choice(LETTERS) for _ in range(rnd.randint(2, 10))))
+    entries: list[tuple[str, str]] = []
+    for word in sorted(words):
+        text = " ".join(rnd.choice(LETTERS) * rnd.randint(1, 5) for _ in range(rnd.randint(5, 60)))
+        entries.append((word, f"<div class='w'>{word}</div><p>{text}</p><link href='s.css'>"))
+    return entries
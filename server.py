@@ -2,6 +2,7 @@
 # -*- coding: UTF-8 -*-
 import os
 import sys
+from typing import cast
 
 from flask import Flask
 from flask_cors import CORS
@@ -11,6 +12,9 @@ from src.services.socket_service import socketio
 from src.dictapi import DictApi
 from src.reciteapi import ReciteApi
 from src.fileapi import FileApi
+from src.resourceapi import ResourceApi
+from src.healthapi import HealthApi
+from src.app_factory import get_dict_app
 # from src.utilities.message_sender import start_periodic_user_push, start_periodic_room_push
 
 
@@ -55,6 +59,10 @@ def create_server():
     app.add_url_rule('/dicts/<int:dict_id>/<string:word>/', view_func=dict_view,
         methods=['GET'],
     )
+    app.add_url_rule('/dicts/<int:dict_id>/<string:word>/suggest', view_func=dict_view,
+        defaults={'action': 'suggest'},
+        methods=['GET'],
+    )
 
     # words/{word}/add/level/{level}
     app.add_url_rule(
@@ -71,8 +79,9 @@ def create_server():
     file_view = FileApi.as_view("file_api")
     # dicts/Google/output/able.html
     # audios/Google-us/output/able.mp3
+    # dicts/Oxford/output/img/a.png
     app.add_url_rule(
-        '/<string:itemspath>/<string:itemname>/output/<string:filename>',
+        '/<string:itemspath>/<string:itemname>/output/<path:filename>',
         view_func=file_view,
         methods=['GET']
     )
@@ -86,10 +95,27 @@ def create_server():
     app.add_url_rule(
         '/<string:itempath>/<int:itemnum>/upload/<string:filename>',
         view_func=file_view,
-        methods=['POST']
+        methods=['POST', 'DELETE']
     )
     # app.url_map.strict_slashes = False
 
+    # dicts/1/res/img/a.png
+    resource_view = ResourceApi.as_view('resource_api')
+    app.add_url_rule('/dicts/<int:dict_id>/res/<path:resource>', view_func=resource_view,
+        methods=['GET'],
+    )
+
+    # health, ready
+    health_view = HealthApi.as_view('health_api')
+    app.add_url_rule('/health', view_func=health_view,
+        defaults={'check': 'health'},
+        methods=['GET'],
+    )
+    app.add_url_rule('/ready', view_func=health_view,
+        defaults={'check': 'ready'},
+        methods=['GET'],
+    )
+
     # for recite
     recite_view = ReciteApi.as_view('recite_api')
     app.add_url_rule('/recite/<string:action>/<string:para>/', view_func=recite_view,
@@ -107,6 +133,10 @@ def create_server():
 
     socketio.init_app(app)
 
+    # start opening the dicts in the background before the first request,
+    # each of them is served as soon as it is ready
+    _ = get_dict_app(cast(str, app.static_folder))
+
     # Start periodic push tasks
     # start_periodic_user_push(target_user='user_123', interval=8)
     # start_periodic_room_push(target_room='room_100', interval=10)
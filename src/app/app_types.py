@@ -1,5 +1,6 @@
 #!/usr/bin/python3
 # -*- coding: UTF-8 -*-
+import os
 # from dataclasses import dataclass
 from typing import TypedDict, NotRequired
 
@@ -11,6 +12,19 @@ class DictDict(TypedDict):
     Desc: str
     Cover: NotRequired[str]
     Format: str
+    # budget of the decompressed record block cache of mdx, in MB
+    CacheMB: NotRequired[float]
+    # map mdx/mdd into memory instead of reading them per lookup
+    Mmap: NotRequired[bool]
+    # threads to decompress mdx/mdd blocks with while opening
+    Workers: NotRequired[int]
+    # headwords before and after a lookup to render in the background, 0 is off
+    Prefetch: NotRequired[int]
+    # build the spelling suggestion index while warming up, otherwise on the first /suggest.
+    # The build holds the GIL for tens of seconds on dicts of a million headwords
+    Suggest: NotRequired[bool]
+    # budget of the rendered pages kept in <dict>/output/ across restarts, in MB
+    OutputMB: NotRequired[float]
 
 class WordDictDict(TypedDict):
     Name: str
@@ -54,6 +68,12 @@ class DictionaryDict(TypedDict):
     common: CommonInfo
     AudioBaseId: int
     Debug: DebugCfg
+    # budget of the rendered pages cache shared by all dicts, in MB
+    PageCacheMB: NotRequired[float]
+    # also keep rendered pages in <dict>/output/, which survives restarts
+    WriteOutput: NotRequired[bool]
+    # threads opening the dicts in the background at start
+    WarmupWorkers: NotRequired[int]
 
 class ReciteDict(TypedDict):
     common: CommonInfo
@@ -76,6 +96,14 @@ class SvrCfgDict(TypedDict):
     ReciteWords: ReciteDict
 
 
+DEFAULT_CACHE_MB: float = 16
+DEFAULT_OPEN_WORKERS: int = min(4, os.cpu_count() or 1)
+DEFAULT_PAGE_CACHE_MB: float = 32
+DEFAULT_PREFETCH_WORKERS: int = 1
+DEFAULT_WARMUP_WORKERS: int = 2
+DEFAULT_OUTPUT_MB: float = 256
+DEFAULT_SUGGEST: bool = False
+
 # ------------------------------
 # Default SvrCfgDict Instance
 # ------------------------------
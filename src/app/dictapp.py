@@ -9,11 +9,13 @@ import random
 import json
 import logging
 from functools import partial
+from html import escape
 from typing import TypedDict
 from typing import cast, Unpack
 
 from src.logit import pv, po, pe
-from src.components.classbases.dictbase import DictBase
+from src.components.classbases.dictbase import DictBase, PageCache
+from src.components.classbases.lrucache import LRUCache
 from src.components.auidoarchive import AuidoArchive
 from src.components.gdictbase import GDictBase
 from src.components.mdictbase import MDictBase
@@ -21,6 +23,10 @@ from src.components.sdictbase import SDictBase
 from src.components.worddict import WordDict
 from src.components.usrprogress import WorldProgressTuple, UsrProgress
 from src.app.app_types import SvrCfgDict, UserDict, DEFAULT_SVR_CFG
+from src.app.app_types import DEFAULT_CACHE_MB, DEFAULT_OPEN_WORKERS, DEFAULT_PAGE_CACHE_MB
+from src.app.app_types import DEFAULT_PREFETCH_WORKERS, DEFAULT_WARMUP_WORKERS, DEFAULT_OUTPUT_MB
+from src.app.app_types import DEFAULT_SUGGEST
+from src.app.warmup import Warmup, LoadState, WarmupReportDict
 from src.utilities.download_queue import TaskStatus, DownloadCallbackKwargs
 from src.utilities.download_queue import DownloadCallback, DownloadQueue
 from src.utilities.message_sender import notify_user
@@ -39,15 +45,29 @@ class ActEnum(IntEnum):
     TEST_MODE = auto()
     FINISH = auto()
 
+# keys of the audio archive and the word dict in the warm-up
+AUDIO_KEY = "audio"
+WORDDICT_KEY = "worddict"
+
+
+def _dict_key(dict_id: int) -> str:
+    return f"dicts/{dict_id}"
+
+
 class DictApp:
     def __init__(self, start_path: str):
         self._start_path: str = os.path.abspath(start_path)
         print(f"dictApp: {self._start_path}")
 
         self._dictbase_map: dict[int, DictBase] = {}
+        # rendered pages of all the dicts
+        self._page_cache: PageCache | None = None
+        self._write_output: bool = True
         # self._dictbase_list: list[DictBase] = []
         self._audiobase: AuidoArchive = AuidoArchive()
         self._wordbase: WordDict = WordDict()
+        # opens all of the above in the background
+        self._warmup: Warmup | None = None
 
         self._missdict_file: str = ""
         self._missaudio_file: str = ""
@@ -159,7 +179,9 @@ class DictApp:
     def curword(self):
         return self._curword
 
-    def _add_dictbase(self, name: str, dictsrc: str, format: str):
+    def _add_dictbase(self, name: str, dictsrc: str, format: str,
+            cache_mb: float = DEFAULT_CACHE_MB, use_mmap: bool = False,
+            workers: int = DEFAULT_OPEN_WORKERS):
         dictbase: DictBase | None = None
         match format:
             case 'ZIP':
@@ -167,10 +189,14 @@ class DictApp:
             case 'SQLite':
                 dictbase = SDictBase()
             case 'mdx':
-                dictbase = MDictBase()
+                dictbase = MDictBase(cache_mb=cache_mb, use_mmap=use_mmap, workers=workers)
             case _:
                 raise NotImplementedError(f"Unknown dict's format: {format}!")
 
+        dictbase.set_page_cache(self._page_cache, self._write_output)
+        return dictbase
+
+    def _open_dictbase(self, dictbase: DictBase, name: str, dictsrc: str) -> tuple[int, str]:
         ret, msg = dictbase.open(name, dictsrc)
 
         if ret == 1:
@@ -178,7 +204,13 @@ class DictApp:
         else:
             self._dictlogger.error(f"Fail to Open {name}, due to {msg}")
 
-        return dictbase
+        return ret, msg
+
+    def _open_worddict(self, name: str, src: str) -> tuple[int, str]:
+        ret, msg = self._wordbase.open(name, src)
+        if ret != 1:
+            self._dictlogger.error(f"Fail to open {src}, because of {msg}")
+        return ret, msg
 
     def read_configure(self, cfgfile: str) -> bool:
         self._cfgfile = cfgfile
@@ -199,6 +231,13 @@ class DictApp:
         common = self._cfgdict["Dictionary"]["common"]
         self._dictlogger.info(f"Dictionary: v{common["ver"]}")
 
+        page_cache_mb = self._cfgdict["Dictionary"].get("PageCacheMB", DEFAULT_PAGE_CACHE_MB)
+        if page_cache_mb > 0:
+            self._page_cache = LRUCache(int(page_cache_mb * 1024 * 1024))
+        self._write_output = self._cfgdict["Dictionary"].get("WriteOutput", True)
+        self._warmup = Warmup(self._cfgdict["Dictionary"].get("WarmupWorkers",
+            DEFAULT_WARMUP_WORKERS))
+
         agent_cfg = self._cfgdict['Agents']
         # bIEAgent = agent_cfg.bIEAgent
         agent_name = agent_cfg["ActiveAgent"]
@@ -208,16 +247,7 @@ class DictApp:
                 self._agent_dict[agent["Name"]] = {"ip": agent["ip"], "program": agent["Program"]}
             self._active_agent(agent_name)
 
-        dicts_cfg = self._cfgdict["DictBases"]
-        # print(dict_cfg)
-        for dict_cfg in dicts_cfg:
-            dict_src = os.path.join(self._start_path, dict_cfg["Src"])
-            dictbase = self._add_dictbase(dict_cfg["Name"], dict_src, dict_cfg["Format"])
-            dictbase.desc = dict_cfg["Desc"]
-            if "Cover" in dict_cfg:
-                dictbase.cover = dict_cfg["Cover"]
-            self._dictbase_map[dict_cfg["Id"]] = dictbase
-
+        # every lookup needs the audio archive and the word dict, they go first
         audio_cfg = self._cfgdict['AudioBases'][0]
         audio_src = os.path.join(self._start_path, audio_cfg["Src"])
         audio_format = audio_cfg['Format']
@@ -225,11 +255,8 @@ class DictApp:
             audio_name = audio_cfg["Name"]
             self._audiobase = AuidoArchive()
             self._audiobase.desc = audio_cfg["Desc"]
-            ret, msg = self._audiobase.open(audio_name, audio_src)
-            if ret != 1:
-                self._dictlogger.error(f"Fail to open {audio_src}, because of {msg}")
-            else:
-                self._dictlogger.info(f"Success to open {audio_src}")
+            self._warmup.submit(AUDIO_KEY,
+                partial(self._open_dictbase, self._audiobase, audio_name, audio_src))
 
             # if "Download" in audio_cfg:
                 # self._audiobase.download = audio_cfg["Download"]
@@ -240,10 +267,27 @@ class DictApp:
 
         worddict_cfg = self._cfgdict["WordDict"]
         worddict_src = os.path.join(self._start_path, worddict_cfg["Src"])
+        self._warmup.submit(WORDDICT_KEY,
+            partial(self._open_worddict, worddict_cfg["Name"], worddict_src))
 
-        ret, msg = self._wordbase.open(worddict_cfg["Name"], worddict_src)
-        if ret != 1:
-            self._dictlogger.error(f"Fail to open {worddict_src}, because of {msg}")
+        dicts_cfg = self._cfgdict["DictBases"]
+        # print(dict_cfg)
+        for dict_cfg in dicts_cfg:
+            dict_src = os.path.join(self._start_path, dict_cfg["Src"])
+            dictbase = self._add_dictbase(dict_cfg["Name"], dict_src, dict_cfg["Format"],
+                dict_cfg.get("CacheMB", DEFAULT_CACHE_MB), dict_cfg.get("Mmap", False),
+                dict_cfg.get("Workers", DEFAULT_OPEN_WORKERS))
+            dictbase.set_prefetch(dict_cfg.get("Prefetch", 0), DEFAULT_PREFETCH_WORKERS)
+            dictbase.set_output_budget(int(dict_cfg.get("OutputMB", DEFAULT_OUTPUT_MB) * 1024 * 1024))
+            # known before it's open
+            dictbase.name = dict_cfg["Name"]
+            dictbase.desc = dict_cfg["Desc"]
+            if "Cover" in dict_cfg:
+                dictbase.cover = dict_cfg["Cover"]
+            self._dictbase_map[dict_cfg["Id"]] = dictbase
+            self._warmup.submit(_dict_key(dict_cfg["Id"]),
+                partial(self._open_dictbase, dictbase, dict_cfg["Name"], dict_src),
+                dictbase.build_suggester if dict_cfg.get("Suggest", DEFAULT_SUGGEST) else None)
 
         # usrsCfg = JSON.parse(JSON.stringify(self._cfg['Users']))
 
@@ -325,6 +369,44 @@ class DictApp:
         # print(agent_cfg)
         self._dictlogger.info(f"activate agent: {agent_cfg}")
 
+    def check_ready(self, dict_id: int | None = None, lookup: bool = True) -> tuple[LoadState, str]:
+        '''
+            READY if dict_id can be served, and also the audio archive and the word dict
+            a lookup needs, otherwise the state of the first that can't and why
+        '''
+        if self._warmup is None:
+            return LoadState.PENDING, "the dictionaries aren't configured yet"
+        keys: list[str] = [] if dict_id is None else [_dict_key(dict_id)]
+        if lookup:
+            keys += [AUDIO_KEY, WORDDICT_KEY]
+        return self._warmup.check(keys)
+
+    def dict_state(self, dict_id: int) -> LoadState:
+        return self._load_state(_dict_key(dict_id))
+
+    def _load_state(self, key: str) -> LoadState:
+        if self._warmup is None:
+            return LoadState.PENDING
+        return self._warmup.state(key)
+
+    @property
+    def warmup_report(self) -> WarmupReportDict | None:
+        if self._warmup is None:
+            return None
+        return self._warmup.report
+
+    def find_dictbase(self, tempdir: str) -> DictBase | None:
+        ''' the dictbase whose output dir is tempdir
+        '''
+        tempdir = os.path.normcase(os.path.abspath(tempdir))
+        for dict_id, dictbase in self._dictbase_map.items():
+            # it has no output dir before it's open
+            if self.dict_state(dict_id) is not LoadState.READY:
+                continue
+            if os.path.normcase(os.path.abspath(dictbase.tempdir)) == tempdir:
+                return dictbase
+        return None
+
     def _record2file(self, file_: str, something: str):
         with open(file_, "w", encoding="utf-8") as f:
             _ = f.write(something)
@@ -348,6 +430,15 @@ class DictApp:
 
         return word_dict
 
+    def suggest(self, dict_id: int, word: str, k: int) -> list[str]:
+        '''
+            return up to k headwords spelled like word
+        '''
+        dictbase = self._dictbase_map.get(dict_id)
+        assert dictbase is not None
+        self._dictlogger.info(f"suggest for '{word}' in dict '{dictbase.name}', top {k}")
+        return dictbase.suggest(word, k)
+
     def query_word(self, dict_id: int, word: str) -> tuple[str, str, bool, str, int]:
         '''
             return [dict_url, audio_url, is_new, level, stars]
@@ -363,6 +454,8 @@ class DictApp:
 
         ret_dict, dict_url = dictbase.query_word(word)
         # print(f"ret_dict: {ret_dict}, dict: {dict}")
+        if ret_dict == 1:
+            dictbase.prefetch_around(word)
         ret_audio, audio_url = self._audiobase.query_word(word)
 
         if ret_dict == 0:
@@ -386,11 +479,12 @@ class DictApp:
             self._record2file(self._missdict_file, dict_url)
 
         if ret_dict <= 0:
-            dicterr_file = os.path.join(dictbase.tempdir, word + "-error.html")
             html = f"<div class='headword'>\n\t<div class='text'>{dict_url}</div>\n</div>"
-            with open(dicterr_file, "w", encoding="utf-8") as f:
-                _ = f.write(html)
-            dict_url = dicterr_file
+            # don't keep a miss waiting for the suggestion index to be built
+            suggestions = dictbase.suggest(word) if dictbase.suggest_stats is not None else []
+            if suggestions:
+                html += f"\n<div class='suggestions'>{escape(', '.join(suggestions))}</div>"
+            dict_url = dictbase.store_page(word + "-error.html", html)
         else:
             # if not self._usr_progress.has_Word(word):
             #     ret = self._usr_progress.insert_word(word);
@@ -458,6 +552,9 @@ class DictApp:
         return self._wordbase.add_level(word, level)
 
     def add_file(self, which: str, num: int, localfile: str):
+        state, msg = self.check_ready(num if which == "dicts" else None, which == "audios")
+        if state is not LoadState.READY:
+            return -1, msg
         ret = -1
         msg = f"{localfile} is no file"
         try:
@@ -476,6 +573,28 @@ class DictApp:
             msg = str(e)
         return ret, msg
 
+    def del_word(self, which: str, num: int, word: str):
+        state, msg = self.check_ready(num if which == "dicts" else None, which == "audios")
+        if state is not LoadState.READY:
+            return -1, msg
+        if which == "audios":
+            dictbase: DictBase = self._audiobase
+        elif which == "dicts" and num in self._dictbase_map:
+            dictbase = self._dictbase_map[num]
+        else:
+            return -1, f"unsupport {which}/{num}/{word}"
+        try:
+            if dictbase.del_word(word):
+                msg = f"OK to delete '{word}' from {dictbase.name}"
+                ret = 1
+            else:
+                msg = f"no '{word}' in {dictbase.name}"
+                ret = 0
+        except NotImplementedError as e:
+            ret, msg = -1, str(e)
+        print(f"delete {which}/{num}/{word}, ret = {ret}, msg: {msg}")
+        return ret, msg
+
     def go_study_mode(self):
         """
         Return:
@@ -1068,9 +1187,14 @@ class DictApp:
             _ = f.write(json.dumps(self._cfgdict, ensure_ascii=False))
 
     def close(self):
+        if self._warmup is not None:
+            self._warmup.close()
         self._download_queue.wait_for_completion()
 
-        for _, dictbase_ in self._dictbase_map.items():
+        for dict_id, dictbase_ in self._dictbase_map.items():
+            # its opening was dropped by the warm-up, or is still going on
+            if self.dict_state(dict_id) in (LoadState.PENDING, LoadState.LOADING):
+                continue
             srcfile = dictbase_.src
             print("Start to close " + srcfile)
             ret = dictbase_.close()
@@ -1080,7 +1204,13 @@ class DictApp:
             else:
                 self._dictlogger.error(f"Fail to close {srcfile}")
 
-        if self._audiobase:
+        if self._page_cache is not None:
+            print(f"page cache: {self._page_cache.stats}")
+            self._page_cache.clear()
+
+        # like the dicts, skipped unless the warm-up opened it
+        if self._audiobase and self._load_state(AUDIO_KEY) not in \
+                (LoadState.PENDING, LoadState.LOADING):
             ret = self._audiobase.close()
             srcfile = self._audiobase.src
             if ret:
@@ -0,0 +1,142 @@
+#!/usr/bin/python3
+# -*- coding: utf-8 -*-
+import threading
+import time
+from collections.abc import Callable
+from concurrent.futures import ThreadPoolExecutor
+from enum import StrEnum
+from typing import TypedDict
+
+
+class LoadState(StrEnum):
+    PENDING = "pending"
+    LOADING = "loading"
+    READY = "ready"
+    FAILED = "failed"
+
+
+class LoadProgressDict(TypedDict):
+    state: LoadState
+    msg: str
+    # queued before it started loading
+    wait_ms: float | None
+    # opening it
+    load_ms: float | None
+    # warming it up after it's ready, e.g. its suggestion index
+    warm_ms: float | None
+
+
+class WarmupReportDict(TypedDict):
+    # nothing is pending or loading any more
+    done: bool
+    elapsed_ms: float
+    items: dict[str, LoadProgressDict]
+
+
+class Warmup:
+    ''' open dictionaries on a background pool, each of them can be served
+        as soon as it is ready instead of after all of them
+    '''
+    def __init__(self, workers: int):
+        self._pool: ThreadPoolExecutor = ThreadPoolExecutor(max_workers=workers,
+            thread_name_prefix="warmup")
+        self._lock: threading.Lock = threading.Lock()
+        self._progress: dict[str, LoadProgressDict] = {}
+        self._strt: float = time.perf_counter()
+        self._elapsed_ms: float | None = None
+
+    def submit(self, key: str, load: Callable[[], tuple[int, str]],
+            warm: Callable[[], object] | None = None):
+        ''' load() in the background, then warm() once it is ready
+        '''
+        with self._lock:
+            self._progress[key] = {
+                "state": LoadState.PENDING,
+                "msg": "",
+                "wait_ms": None,
+                "load_ms": None,
+                "warm_ms": None
+            }
+            self._elapsed_ms = None
+        _ = self._pool.submit(self._run, key, load, warm, time.perf_counter())
+
+    def state(self, key: str) -> LoadState:
+        ''' READY for anything not loaded here
+        '''
+        with self._lock:
+            progress = self._progress.get(key)
+            return LoadState.READY if progress is None else progress["state"]
+
+    def check(self, keys: list[str]) -> tuple[LoadState, str]:
+        ''' READY if all the keys are, otherwise the state of the first that isn't and why
+        '''
+        with self._lock:
+            for key in keys:
+                progress = self._progress.get(key)
+                if progress is None or progress["state"] is LoadState.READY:
+                    continue
+                if progress["state"] is LoadState.FAILED:
+                    return LoadState.FAILED, f"{key} failed to load: {progress['msg']}"
+                return progress["state"], f"{key} is {progress['state']}, try again later"
+        return LoadState.READY, ""
+
+    @property
+    def report(self) -> WarmupReportDict:
+        with self._lock:
+            elapsed_ms = self._elapsed_ms
+            return {
+                "done": elapsed_ms is not None,
+                "elapsed_ms": round(elapsed_ms if elapsed_ms is not None else
+                    (time.perf_counter() - self._strt) * 1000, 1),
+                "items": {key: progress.copy() for key, progress in self._progress.items()}
+            }
+
+    def close(self):
+        ''' drop what hasn't started, without waiting for what has
+        '''
+        self._pool.shutdown(wait=False, cancel_futures=True)
+
+    def _check_done(self):
+        # under the lock
+        if self._elapsed_ms is None and all(progress["state"] in (LoadState.READY, LoadState.FAILED)
+                for progress in self._progress.values()):
+            self._elapsed_ms = (time.perf_counter() - self._strt) * 1000
+            print(f"warmed up in {self._elapsed_ms:.0f} ms")
+
+    def _run(self, key: str, load: Callable[[], tuple[int, str]],
+            warm: Callable[[], object] | None, queued: float):
+        strt = time.perf_counter()
+        with self._lock:
+            progress = self._progress[key]
+            progress["state"] = LoadState.LOADING
+            progress["wait_ms"] = round((strt - queued) * 1000, 1)
+        try:
+            ret, msg = load()
+        except Exception as e:
+            ret, msg = -1, str(e)
+        load_ms = round((time.perf_counter() - strt) * 1000, 1)
+        state = LoadState.READY if ret == 1 else LoadState.FAILED
+        print(f"{key} is {state} in {load_ms} ms {msg}")
+        with self._lock:
+            progress["state"] = state
+            progress["msg"] = msg
+            progress["load_ms"] = load_ms
+            self._check_done()
+        if state is not LoadState.READY or warm is None:
+            return
+        # after whatever is still waiting to be opened
+        try:
+            _ = self._pool.submit(self._warm, progress, key, warm)
+        except RuntimeError:
+            # closing
+            pass
+
+    def _warm(self, progress: LoadProgressDict, key: str, warm: Callable[[], object]):
+        strt = time.perf_counter()
+        try:
+            _ = warm()
+        except Exception as e:
+            print(f"Fail to warm up {key}: {e}")
+            return
+        with self._lock:
+            progress["warm_ms"] = round((time.perf_counter() - strt) * 1000, 1)
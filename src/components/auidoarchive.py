@@ -16,7 +16,8 @@ class AuidoArchive(DictBase):
         self._compression: int = 0
         self._compresslevel: int = 0
         # self._download: dict[str, str] | None = None
-        self._audiozip: ZipArchive = ZipArchive()
+        # the manifest follows the zip as it is appended to and compacted
+        self._audiozip: ZipArchive = ZipArchive(on_change=self._source_changed)
 
     @override
     def open(self, name: str, src: str) -> tuple[int, str]:
@@ -28,22 +29,21 @@ class AuidoArchive(DictBase):
 
     @override
     def close(self) -> bool:
-        return True
+        _ = self._audiozip.close()
+        return super().close()
 
     @override
     def query_word(self, word: str) -> tuple[int, str]:
-        audiofile = os.path.join(self._tempdir, word + ".mp3")
-
-        if os.path.isfile(audiofile):
+        audiofile = self._find_file(word + ".mp3")
+        if audiofile:
             return 1, audiofile
 
         filename = word[0].lower() + "/" + word + ".mp3"
         if self._audiozip.has_file(filename):
             audio = self._audiozip.read_file(filename)
             if audio:
-                with open(audiofile, 'wb') as f:
-                    _ = f.write(audio)
-                return 1, audiofile
+                # served from output/ whether pages are written there or not
+                return 1, self.store_file(word + ".mp3", audio)
             return -1, f"Fail to read audio '{word}' in '{self._name}'!"
         if self._download is not None:
             audiourl = (self._download["URL"]).format(word)
@@ -60,7 +60,10 @@ class AuidoArchive(DictBase):
         if os.path.isfile(localfile):
             with open(localfile, "rb") as f:
                 wordmp3 = f.read()
+                # before add_file(), which may append the batch and restore the manifest
+                self._source_changing()
                 _ = self._audiozip.add_file(filename, wordmp3)
+                self._forget_page(word + ".mp3")
                 return 1, f"OK to add '{basename}' to {self._name}.zip"
         else:
             return -1, f"Fail to add '{basename}' to {self._name}.zip"
@@ -71,5 +74,14 @@ class AuidoArchive(DictBase):
 
     @override
     def del_word(self, word: str) -> bool:
-        filename = word[0] + "/" + word + ".mp3"
-        return self._audiozip.del_file(filename)
+        filename = word[0].lower() + "/" + word + ".mp3"
+        if not self._audiozip.del_file(filename):
+            return False
+        # the copy query_word left in output/
+        self._forget_page(word + ".mp3")
+        return True
+
+    @property
+    @override
+    def storage_stats(self) -> dict[str, int | float | str] | None:
+        return {**self._audiozip.compact_stats, **self._output_stats()}
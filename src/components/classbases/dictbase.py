@@ -1,12 +1,20 @@
 #!/usr/bin/python3
 # -*- coding: utf-8 -*-
 import abc
+import hashlib
 import os
 import shutil
+import threading
 import time
 import json
+from collections.abc import Callable
 from typing import TypedDict, cast
 
+from src.components.classbases.lrucache import LRUCache
+from src.components.classbases.prefetcher import Prefetcher
+from src.components.classbases.precompress import ENCODINGS, SUFFIXES, compress_page
+from src.components.classbases.suggester import Suggester, SUGGEST_TOPK
+
 class DownloadCfgDict(TypedDict):
     Mode: str
     URL: str
@@ -16,14 +24,43 @@ class DictCfgDict(TypedDict):
     Download: DownloadCfgDict
 
 
+# rendered pages of all the dictionaries, (output dir, page name) -> html bytes
+type PageCache = LRUCache[tuple[str, str], bytes]
+
+# size of the rendered pages kept in output/ by default
+DEFAULT_OUTPUT_BUDGET = 256 * 1024 * 1024
+# what output/ was rendered from, in output/
+MANIFEST = ".manifest.json"
+# copied to output/ from the source dir, they aren't evicted
+STATIC_EXTS = (".css", ".js")
+
+
+def _remove_dirs(paths: list[str]):
+    for path in paths:
+        shutil.rmtree(path, ignore_errors=True)
+        print(f"OK to remove {path}")
+
+
 class DictBase(abc.ABC):
+    # bump it when the pages change, output/ is rendered afresh then
+    RENDERER_VERSION: int = 1
+
     def __init__(self):
         self._name: str = ""
         self._src: str = ""
         self._desc: str = ""
         self._cover: str = ""
-        self._tempir: str = ""
+        self._tempdir: str = ""
         self._download: DownloadCfgDict | None = None
+        self._page_cache: PageCache | None = None
+        # keep a copy of every rendered page in output/
+        self._write_output: bool = True
+        self._output_budget: int = DEFAULT_OUTPUT_BUDGET
+        # rendered pages in output/, page name -> file size
+        self._output_pages: LRUCache[str, int] = LRUCache(self._output_budget, int)
+        self._prefetcher: Prefetcher | None = None
+        self._suggester: Suggester | None = None
+        self._suggester_lock: threading.Lock = threading.Lock()
 
     def _init_dict(self, src: str):
         if not os.path.isdir(src):
@@ -37,23 +74,144 @@ class DictBase(abc.ABC):
                 cfgdict = cast(DictCfgDict, json.loads(json_data))
                 self._download = cfgdict["Download"]
 
-        self._tempdir: str = os.path.join(src, "output")
-        if not os.path.exists(self._tempdir):
-            os.makedirs(self._tempdir)
+        self._tempdir = os.path.join(src, "output")
+        self._check_output()
 
         with os.scandir(src) as entries:
             for entry in entries:
                 if entry.is_file():
                     _, file_extension = os.path.splitext(entry.name)
-                    if file_extension in [".css", ".js"]:
+                    if file_extension in STATIC_EXTS:
                         dest_file = os.path.join(self._tempdir, entry.name)
-                        if not os.path.isfile(dest_file):
+                        if not os.path.isfile(dest_file) or \
+                                os.path.getmtime(dest_file) < entry.stat().st_mtime:
                             _ = shutil.copy(entry.path, dest_file)
 
+        self._load_output_pages()
+
+    def _source_files(self) -> list[str]:
+        ''' what the pages are rendered from
+        '''
+        return [self._src] if os.path.isfile(self._src) else []
+
+    def _manifest(self) -> dict[str, str]:
+        digest = hashlib.sha1()
+        for path in self._source_files():
+            stat = os.stat(path)
+            digest.update(f"{os.path.basename(path)}\0{stat.st_size}\0{stat.st_mtime_ns}\n".encode())
+        return {
+            "source": digest.hexdigest(),
+            "renderer": f"{type(self).__name__}/{self.RENDERER_VERSION}"
+        }
+
+    def _write_manifest(self, manifest: dict[str, str]):
+        with open(os.path.join(self._tempdir, MANIFEST), "w", encoding="utf-8") as f:
+            json.dump(manifest, f)
+
+    def _check_output(self):
+        ''' keep output/ from the last run only if it was rendered from the same source
+            by the same renderer, otherwise start it afresh
+        '''
+        manifest = self._manifest()
+        old_manifest: dict[str, str] | None = None
+        try:
+            with open(os.path.join(self._tempdir, MANIFEST), "r", encoding="utf-8") as f:
+                old_manifest = cast(dict[str, str], json.load(f))
+        except (OSError, ValueError):
+            pass
+
+        if old_manifest != manifest and os.path.isdir(self._tempdir):
+            print(f"output of {self._name} is stale: {old_manifest} -> {manifest}")
+            # moved aside now, removed in the background
+            try:
+                os.replace(self._tempdir, f"{self._tempdir}.stale-{time.time_ns()}")
+            except OSError:
+                shutil.rmtree(self._tempdir, ignore_errors=True)
+
+        parent, base = os.path.split(self._tempdir)
+        with os.scandir(parent) as entries:
+            stale_dirs = [entry.path for entry in entries
+                if entry.is_dir() and entry.name.startswith(base + ".stale-")]
+        if stale_dirs:
+            threading.Thread(target=_remove_dirs, args=(stale_dirs,), daemon=True,
+                name=f"remove-{self._name}").start()
+
+        os.makedirs(self._tempdir, exist_ok=True)
+        if old_manifest != manifest:
+            self._write_manifest(manifest)
+
+    def _load_output_pages(self):
+        ''' the pages left in output/ by the last run, the least recently written first out
+        '''
+        pages: dict[str, list[int]] = {}
+        copies: list[tuple[str, str, int]] = []
+        with os.scandir(self._tempdir) as entries:
+            for entry in entries:
+                if not entry.is_file():
+                    continue
+                root, ext = os.path.splitext(entry.name)
+                if ext in SUFFIXES and root.endswith(".html"):
+                    copies.append((root, entry.path, entry.stat().st_size))
+                elif ext == ".tmp":
+                    # a file the last run didn't finish writing
+                    os.remove(entry.path)
+                elif ext not in STATIC_EXTS and not entry.name.startswith("."):
+                    # the pages, and the files stored as they are
+                    stat = entry.stat()
+                    pages[entry.name] = [stat.st_mtime_ns, stat.st_size]
+        # the compressed copies count with their page
+        for pagename, path, size in copies:
+            if pagename in pages:
+                pages[pagename][1] += size
+            else:
+                os.remove(path)
+
+        self._output_pages = LRUCache(self._output_budget, int, self._remove_page_file)
+        for pagename, (_, size) in sorted(pages.items(), key=lambda item: item[1][0]):
+            _ = self._output_pages.put(pagename, size)
+
+    def _remove_page_file(self, pagename: str, _size: int):
+        pagefile = os.path.join(self._tempdir, pagename)
+        for path in (pagefile, *(pagefile + suffix for suffix in SUFFIXES)):
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+
+    def _forget_page(self, pagename: str):
+        ''' drop a page rendered from what its source doesn't say any more
+        '''
+        if self._page_cache is not None:
+            for suffix in ("", *SUFFIXES):
+                _ = self._page_cache.pop((self._tempdir, pagename + suffix))
+        _ = self._output_pages.pop(pagename)
+        self._remove_page_file(pagename, 0)
+
+    def _source_changing(self):
+        ''' the source has changes this dictbase hasn't written yet, output/ is only
+            valid for the source on disk again after _source_changed()
+        '''
+        try:
+            os.remove(os.path.join(self._tempdir, MANIFEST))
+        except FileNotFoundError:
+            pass
+
+    def _source_changed(self):
+        ''' the source was changed by this dictbase, which forgot the pages it affected,
+            so output/ stays valid for it
+        '''
+        # never opened, there is no output/ to keep
+        if self._tempdir:
+            self._write_manifest(self._manifest())
+
     @property
     def name(self) -> str:
         return self._name
 
+    @name.setter
+    def name(self, name: str):
+        self._name = name
+
     @property
     def src(self) -> str:
         return self._src
@@ -78,6 +236,173 @@ class DictBase(abc.ABC):
     def tempdir(self) -> str:
         return self._tempdir
 
+    def set_output_budget(self, budget: int):
+        ''' bytes of rendered pages kept in output/, across restarts
+        '''
+        self._output_budget = budget
+
+    def set_page_cache(self, page_cache: PageCache | None, write_output: bool = True):
+        ''' pages are always written to output/ without a cache
+        '''
+        self._page_cache = page_cache
+        self._write_output = write_output or page_cache is None
+
+    def _find_page(self, pagename: str) -> str:
+        ''' path of a page rendered before, "" if there is none
+        '''
+        htmlfile = os.path.join(self._tempdir, pagename)
+        if self._page_cache is not None and (self._tempdir, pagename) in self._page_cache:
+            return htmlfile
+        if self._write_output and os.path.isfile(htmlfile):
+            _ = self._output_pages.get(pagename)
+            return htmlfile
+        return ""
+
+    def store_page(self, pagename: str, html: str) -> str:
+        ''' keep a rendered page, return its path in output/,
+            which is only a url when output isn't written
+        '''
+        htmlfile = os.path.join(self._tempdir, pagename)
+        data = html.encode("utf-8")
+        # compressed once here instead of on every request
+        variants = compress_page(data)
+        if self._page_cache is not None:
+            _ = self._page_cache.put((self._tempdir, pagename), data)
+            for encoding, compressed in variants.items():
+                _ = self._page_cache.put((self._tempdir, pagename + ENCODINGS[encoding]),
+                    compressed)
+        if self._write_output:
+            size = len(data)
+            # the copies go first, a page on disk has its copies or none of a former rendering
+            by_suffix = {ENCODINGS[encoding]: compressed for encoding, compressed in variants.items()}
+            for suffix in SUFFIXES:
+                encoded = by_suffix.get(suffix)
+                if encoded is not None:
+                    self._write_file(htmlfile + suffix, encoded)
+                    size += len(encoded)
+                elif os.path.isfile(htmlfile + suffix):
+                    os.remove(htmlfile + suffix)
+            self._write_file(htmlfile, data)
+            _ = self._output_pages.put(pagename, size)
+        return htmlfile
+
+    def store_file(self, filename: str, data: bytes) -> str:
+        ''' keep a file served from output/ as it is, return its path there,
+            it counts against the budget like the pages
+        '''
+        path = os.path.join(self._tempdir, filename)
+        self._write_file(path, data)
+        _ = self._output_pages.put(filename, len(data))
+        return path
+
+    def _find_file(self, filename: str) -> str:
+        ''' path of a file stored before, "" if there is none
+        '''
+        path = os.path.join(self._tempdir, filename)
+        if os.path.isfile(path):
+            _ = self._output_pages.get(filename)
+            return path
+        return ""
+
+    def _write_file(self, path: str, data: bytes):
+        # whole or not at all, output/ outlives the process
+        tmpfile = f"{path}.{threading.get_ident()}.tmp"
+        with open(tmpfile, "wb") as f:
+            _ = f.write(data)
+        os.replace(tmpfile, path)
+
+    def read_page(self, pagename: str) -> bytes | None:
+        ''' a rendered page from the page cache
+        '''
+        if self._page_cache is None:
+            return None
+        return self._page_cache.get((self._tempdir, pagename))
+
+    def set_prefetch(self, depth: int, workers: int = 1):
+        ''' after a lookup, render the depth headwords before and after it in the background
+        '''
+        if self._prefetcher is not None:
+            self._prefetcher.close()
+            self._prefetcher = None
+        if depth > 0:
+            self._prefetcher = Prefetcher(self._prefetch_page, depth, workers, self._name)
+
+    def prefetch_around(self, word: str):
+        if self._prefetcher is None:
+            return
+        self._prefetcher.on_lookup(word, self._neighbours(word, self._prefetcher.depth))
+
+    @property
+    def prefetch_stats(self) -> dict[str, int | float] | None:
+        if self._prefetcher is None:
+            return None
+        return self._prefetcher.stats
+
+    def _neighbours(self, word: str, n: int) -> list[str]:
+        ''' up to n headwords after word and n before it, nearest first
+        '''
+        return []
+
+    def _prefetch_page(self, word: str) -> bool:
+        if self._find_page(word + ".html"):
+            return False
+        ret, _ = self.query_word(word)
+        return ret == 1
+
+    def _stop_prefetch(self):
+        if self._prefetcher is not None:
+            print(f"prefetch of {self._name}: {self._prefetcher.stats}")
+            self._prefetcher.close()
+            self._prefetcher = None
+
+    def _headwords(self) -> tuple[int, Callable[[int], str]]:
+        ''' number of headwords and headword_at(i), what suggestions are made of
+        '''
+        words: list[str] = []
+        return len(words), words.__getitem__
+
+    def build_suggester(self) -> dict[str, int | float]:
+        ''' index the headwords for suggest() if they aren't, return the index stats
+        '''
+        with self._suggester_lock:
+            if self._suggester is None:
+                n, headword_at = self._headwords()
+                self._suggester = Suggester(n, headword_at)
+                print(f"suggestions of {self._name}: {self._suggester.stats}")
+            return self._suggester.stats
+
+    def suggest(self, word: str, k: int = SUGGEST_TOPK) -> list[str]:
+        ''' up to k headwords spelled like word, nearest first
+        '''
+        _ = self.build_suggester()
+        assert self._suggester is not None
+        return self._suggester.suggest(word, k)
+
+    @property
+    def suggest_stats(self) -> dict[str, int | float] | None:
+        if self._suggester is None:
+            return None
+        return self._suggester.stats
+
+    def _add_headword(self, word: str):
+        if self._suggester is not None:
+            self._suggester.add(word)
+
+    def _remove_headword(self, word: str):
+        if self._suggester is not None:
+            self._suggester.remove(word)
+
+    def _output_stats(self) -> dict[str, int | float | str]:
+        stats = self._output_pages.stats
+        return {"output_files": stats["entries"], "output_bytes": stats["bytes"],
+            "output_budget": stats["budget"]}
+
+    @property
+    def storage_stats(self) -> dict[str, int | float | str] | None:
+        ''' the files of a dictionary that can be changed, and how much of them is dead
+        '''
+        return None
+
     @property
     def download(self):
         return self._download
@@ -103,14 +428,17 @@ class DictBase(abc.ABC):
     def check_addword(self, localfile: str) -> tuple[int, str]:
         return 0, localfile
 
+    def read_resource(self, name: str) -> tuple[int, bytes | memoryview | str]:
+        ''' a file referenced by the entries, e.g. an image or a font,
+            as raw bytes, or the error message
+        '''
+        return -1, f"There is no {name} in {self._name}"
+
     @abc.abstractmethod
     def del_word(self, word: str) -> bool:
         pass
 
     def close(self) -> bool:
-        if os.path.exists(self._tempdir):
-            shutil.rmtree(self._tempdir)
-        time.sleep(1)
-        if not os.path.isdir(self._tempdir):
-            print(f"OK to remove {self._tempdir}")
+        self._stop_prefetch()
+        # output/ is kept for the next start, see _check_output()
         return True
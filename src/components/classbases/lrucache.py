@@ -0,0 +1,102 @@
+#!/usr/bin/python3
+# -*- coding: utf-8 -*-
+import threading
+from collections import OrderedDict
+from collections.abc import Callable, Hashable
+
+
+class LRUCache[K: Hashable, V]:
+    ''' thread-safe LRU cache bounded by the total size of its values in bytes,
+        on_evict(key, value) is called for what falls out of it
+    '''
+    def __init__(self, budget: int, sizeof: Callable[[V], int] = len,
+            on_evict: Callable[[K, V], None] | None = None):
+        self._budget: int = budget
+        self._sizeof: Callable[[V], int] = sizeof
+        self._on_evict: Callable[[K, V], None] | None = on_evict
+        self._size: int = 0
+        self._data: OrderedDict[K, tuple[V, int]] = OrderedDict()
+        self._lock: threading.Lock = threading.Lock()
+
+        self._hits: int = 0
+        self._misses: int = 0
+        self._evictions: int = 0
+
+    @property
+    def budget(self) -> int:
+        return self._budget
+
+    @property
+    def size(self) -> int:
+        return self._size
+
+    @property
+    def stats(self) -> dict[str, int]:
+        with self._lock:
+            return {
+                "hits": self._hits,
+                "misses": self._misses,
+                "evictions": self._evictions,
+                "entries": len(self._data),
+                "bytes": self._size,
+                "budget": self._budget
+            }
+
+    def __contains__(self, key: K) -> bool:
+        with self._lock:
+            return key in self._data
+
+    def get(self, key: K) -> V | None:
+        with self._lock:
+            item = self._data.get(key)
+            if item is None:
+                self._misses += 1
+                return None
+            self._data.move_to_end(key)
+            self._hits += 1
+            return item[0]
+
+    def put(self, key: K, value: V) -> bool:
+        ''' return False if value alone is bigger than the budget,
+            the value it would have replaced is dropped then too
+        '''
+        size = self._sizeof(value)
+        if size > self._budget:
+            with self._lock:
+                old = self._data.pop(key, None)
+                if old is not None:
+                    self._size -= old[1]
+                    self._evictions += 1
+            # stale now, and off the budget
+            if old is not None and self._on_evict is not None:
+                self._on_evict(key, old[0])
+            return False
+        evicted: list[tuple[K, V]] = []
+        with self._lock:
+            old = self._data.pop(key, None)
+            if old is not None:
+                self._size -= old[1]
+            self._data[key] = (value, size)
+            self._size += size
+            while self._size > self._budget:
+                evicted_key, (evicted_value, evicted_size) = self._data.popitem(last=False)
+                self._size -= evicted_size
+                self._evictions += 1
+                evicted.append((evicted_key, evicted_value))
+        if self._on_evict is not None:
+            for evicted_key, evicted_value in evicted:
+                self._on_evict(evicted_key, evicted_value)
+        return True
+
+    def pop(self, key: K) -> V | None:
+        with self._lock:
+            item = self._data.pop(key, None)
+            if item is None:
+                return None
+            self._size -= item[1]
+            return item[0]
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+            self._size = 0
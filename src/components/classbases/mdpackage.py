@@ -5,12 +5,25 @@ modified from
 https://github.com/csarron/mdict-analysis
 
 """
+import os
 import re
+import sys
+import json
+import hashlib
+import mmap
+import heapq
 import struct
-from io import BytesIO, BufferedIOBase
+from array import array
+from bisect import bisect_right
+from collections import deque
+from collections.abc import Callable, Iterable, Iterator
+from concurrent.futures import Future, ThreadPoolExecutor
+from itertools import accumulate
+from contextlib import contextmanager
+from io import BytesIO
 # zlib compression is used for engine version >=2.0
 import zlib
-from typing import cast
+from typing import BinaryIO, cast
 
 # pip install python3-lzo-indexer
 # pip install python-lzo
@@ -21,21 +34,96 @@ try:
 except ImportError:
     lzo = None
     print("LZO compression support is not available")
+# numpy only speeds up decryption of encrypted dictionaries
+try:
+    import numpy as np
+except ImportError:
+    np = None
 # try:
     # import xml.etree.cElementTree as ET
 # except ImportError:
 import xml.etree.ElementTree as ET
 
+from src.components.classbases.lrucache import LRUCache
+from src.components.classbases.mergedindex import find_sorted, prefix_range
 from src.components.classbases.utils.ripemd128 import ripemd128
 from src.components.classbases.utils.pureSalsa20 import Salsa20
 
+_U8 = struct.Struct('>B')
+_U16BE = struct.Struct('>H')
+_U32BE = struct.Struct('>I')
+_NUM_STRUCTS = {fmt: struct.Struct(fmt) for fmt in ('>I', '>Q')}
+_PAIR_STRUCTS = {'>I': struct.Struct('>II'), '>Q': struct.Struct('>QQ')}
+
+_NIBBLE_SWAP = bytes(((i >> 4) | (i << 4)) & 0xff for i in range(256))
+_BYTE_RANGE = bytes(range(256))
+
+# bump when the layout of the sidecar index changes
+INDEX_VERSION = 2
+
+
+class ViewReader:
+    ''' file-like cursor over a read-only memoryview,
+        read() returns slices of the view instead of copies
+    '''
+    def __init__(self, view: memoryview):
+        self._view: memoryview = view
+        self._pos: int = 0
+
+    def seek(self, pos: int) -> int:
+        self._pos = pos
+        return pos
+
+    def tell(self) -> int:
+        return self._pos
+
+    def read(self, size: int = -1) -> memoryview:
+        end = len(self._view) if size < 0 else min(self._pos + size, len(self._view))
+        data = self._view[self._pos: end]
+        self._pos = end
+        return data
+
+
+type SourceReader = BinaryIO | ViewReader
+
+
+def imap_ordered[T, R](func: Callable[[T], R], items: Iterable[T], workers: int,
+        pool: ThreadPoolExecutor | None = None) -> Iterator[R]:
+    ''' map func over items on a thread pool, yield the results in input order,
+        keep at most 2 * workers tasks in flight to bound memory.
+        pool: a pool of workers threads shared with other callers, one of its own if None
+    '''
+    if workers <= 1:
+        yield from map(func, items)
+        return
+    if pool is None:
+        with ThreadPoolExecutor(max_workers=workers) as own_pool:
+            yield from imap_ordered(func, items, workers, own_pool)
+        return
+    pending: deque[Future[R]] = deque()
+    try:
+        for item in items:
+            pending.append(pool.submit(func, item))
+            if len(pending) >= 2 * workers:
+                yield pending.popleft().result()
+        while pending:
+            yield pending.popleft().result()
+    finally:
+        # a shared pool outlives this call, what is left of it isn't needed
+        for future in pending:
+            _ = future.cancel()
+
 
 class MdPackage:
     ''' read from mdd, mdx
     '''
     def __init__(self, srcfile: str, is_mdd: bool = False, encoding: str = 'UTF-16',
-            passcode: tuple[bytes, str] | None = None):
+            passcode: tuple[bytes, str] | None = None, use_index: bool = True,
+            scan_records: bool = False, lazy_verify: bool = True,
+            block_cache: LRUCache[tuple[str, int], bytes | memoryview] | None = None,
+            use_mmap: bool = False):
         self._file_pos: int = 0
+        self._header_adler32: int = 0
 
         self._version: float = 0
         self._is_substyle: bool = False
@@ -46,6 +134,9 @@ class MdPackage:
         # def _recordBlockOffset: any
         self._num_format: str = ">I"
         self._width_num: int = 4
+        # precompiled for the parsers: a number, a pair of numbers
+        self._num_struct: struct.Struct = _NUM_STRUCTS[self._num_format]
+        self._pair_struct: struct.Struct = _PAIR_STRUCTS[self._num_format]
 
         # def _keyBlockOffset: any
         self._entries_num: int = 0
@@ -53,9 +144,26 @@ class MdPackage:
         self._wigdth_num: int = 0
 
         self._keyblock_list: list[tuple[int, bytes]] = []
-        self._key_list: list[str] = []
-        # <word, [record_strt, record_end, compressblock_strt, compressed_size, decompressed_size]>
-        self._record_dict: dict[str, tuple[int, int, int, int, int]] = {}
+        # only used while building the tables below
+        # [compressblock_strt, compressed_size, decompressed_size]
+        self._block_list: list[tuple[int, int, int]] = []
+        # <word, [block_idx, record_strt, record_end]>
+        self._record_dict: dict[str, tuple[int, int, int]] = {}
+
+        # compact key/record table, entry i is the i-th key in code point order
+        # key i is _key_buf[_key_offsets[i]: _key_offsets[i+1]] in utf-8
+        self._key_buf: bytes = b""
+        self._key_offsets: array[int] = array('Q', [0])
+        # position of key i in file order
+        self._key_order: array[int] = array('I')
+        # record offsets are relative to the decompressed block
+        self._rec_block: array[int] = array('I')
+        self._rec_strt: array[int] = array('I')
+        self._rec_end: array[int] = array('I')
+        # one item per record block
+        self._blk_offset: array[int] = array('Q')
+        self._blk_csize: array[int] = array('Q')
+        self._blk_dsize: array[int] = array('Q')
 
         self._header_tag: dict[str, str] = {}
         self._srcfile: str = srcfile
@@ -63,65 +171,149 @@ class MdPackage:
         self._encoding: str = encoding.upper()
         self._passcode = passcode
 
-    def open(self):
+        # sidecar index next to the source file, e.g. foo.mdx.idx
+        self._use_index: bool = use_index
+        self._idxfile: str = srcfile + ".idx"
+
+        # True: decompress every record block at open to locate records,
+        # False: locate records from the record block info only
+        self._scan_records: bool = scan_records
+        # True: check adler32 of a record block only on its first read,
+        # False: check it on every read
+        self._lazy_verify: bool = lazy_verify
+        self._verified_blocks: set[int] = set()
+
+        # decompressed record blocks, keyed by (srcfile, block_idx),
+        # may be shared by the packages of one dictionary
+        self._block_cache: LRUCache[tuple[str, int], bytes | memoryview] | None = block_cache
+
+        # the blocks are decompressed on it while opening
+        self._pool: ThreadPoolExecutor | None = None
+
+        # one read-only mapping for the lifetime of the package,
+        # every reader gets its own cursor on it, so no lock is needed
+        self._use_mmap: bool = use_mmap
+        self._mmap: mmap.mmap | None = None
+        self._view: memoryview | None = None
+
+    def open(self, workers: int = 1, pool: ThreadPoolExecutor | None = None):
+        ''' workers: threads to decompress and checksum key/record blocks with,
+            pool: a pool of that many threads shared with other packages, one of its own if None
+        '''
+        self._pool = pool
         print(f"open {self._srcfile}")
+        if self._use_mmap:
+            with open(self._srcfile, 'rb') as f:
+                self._mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            self._view = memoryview(self._mmap)
+
         self._header_tag = self._read_header()
         # print('Finish to __read_header')
 
-        self._keyblock_list = self._read_keyblocks()
-        # print('Finish to __read_keyblocks')
-
-        if self._is_mdd:
-            self._decode_mdd_recordblock()
-            # print('Finish to __decode_mdd_recordblock')
+        if self._use_index and self._load_index():
+            print(f"load index {self._idxfile}")
         else:
-            self._decode_mdx_recordblock()
-            # print('Finish to __decode_mdx_recordblock')
+            self._keyblock_list = self._read_keyblocks(workers)
+            # print('Finish to __read_keyblocks')
+
+            if not self._scan_records:
+                self._index_recordblock()
+                # print('Finish to __index_recordblock')
+            elif self._is_mdd:
+                self._decode_mdd_recordblock(workers)
+                # print('Finish to __decode_mdd_recordblock')
+                self._verified_blocks = set(range(len(self._block_list)))
+            else:
+                self._decode_mdx_recordblock(workers)
+                # print('Finish to __decode_mdx_recordblock')
+                self._verified_blocks = set(range(len(self._block_list)))
+
+            # only needed to split the record blocks
+            self._keyblock_list = []
+            self._compact()
 
-        self._key_list = list(self._record_dict.keys())
+            if self._use_index:
+                self._save_index()
+        self._pool = None
 
     def has_record(self, key: str):
-        return key in self._key_list
+        return self.find_key(key) >= 0
+
+    def read_data(self, key: str) -> tuple[int, memoryview | str]:
+        ''' the record as it is stored, for binary resources in mdd,
+            a view into the decompressed record block, nothing is decoded
+        '''
+        i = self.find_key(key)
+        if i < 0:
+            return -1, f"There is no {key} in {self._srcfile}"
+        return 1, self.read_data_at(i)
+
+    def read_data_at(self, i: int) -> memoryview:
+        record_block = self._read_recordblock(self._rec_block[i])
+        return memoryview(record_block)[self._rec_strt[i]: self._rec_end[i]]
 
     def read_record(self, key: str) -> tuple[int, str]:
-        if key in self._key_list:
-            record_strt, record_end, compressblock_strt, \
-                compressblk_size, decompress_size = self._record_dict[key]
-        else:
+        i = self.find_key(key)
+        if i < 0:
             return -1, f"There is no {key} in {self._srcfile}"
+        return 1, self.read_record_at(i)
+
+    def read_record_at(self, i: int) -> str:
+        # convert to utf-8
+        record = str(self.read_data_at(i), self._encoding, errors = 'ignore').strip('\x00')
+        # substitute styles
+        if self._is_substyle and self._stylesheet:
+            record = self._substitute_stylesheet(record)
+
+        return record
+
+    @property
+    def cache_stats(self) -> dict[str, int] | None:
+        if self._block_cache is None:
+            return None
+        return self._block_cache.stats
 
-        with open(self._srcfile, 'rb') as f:
+    def _read_recordblock(self, block_idx: int) -> bytes | memoryview:
+        ''' read and decompress one record block, through the block cache if any
+        '''
+        if self._block_cache is not None:
+            record_block = self._block_cache.get((self._srcfile, block_idx))
+            if record_block is not None:
+                return record_block
+
+        compressblock_strt = self._blk_offset[block_idx]
+        compressblk_size = self._blk_csize[block_idx]
+        decompress_size = self._blk_dsize[block_idx]
+        with self._open_source() as f:
             _ = f.seek(compressblock_strt)
             recordblock_compressed = f.read(compressblk_size)
-            # 4 bytes indicates block compression type
-            recordblock_type = recordblock_compressed[:4]
-            # 4 bytes adler checksum in uncompressed content
-            adler32 = cast(int, struct.unpack('>I', recordblock_compressed[4:8])[0])
-            # print(f"adler32: {adler32}")
+        # 4 bytes indicates block compression type
+        recordblock_type = recordblock_compressed[:4]
+        # 4 bytes adler checksum in uncompressed content
+        adler32 = cast(int, _U32BE.unpack_from(recordblock_compressed, 4)[0])
+        # print(f"adler32: {adler32}")
 
-            # record_block: Buffer
-            record_block = self._decompress(recordblock_type,
-                recordblock_compressed, decompress_size)
+        # record_block: Buffer
+        record_block = self._decompress(recordblock_type,
+            recordblock_compressed, decompress_size)
 
+        if block_idx not in self._verified_blocks:
             # notice that adler32 return signed value
             assert adler32 == zlib.adler32(record_block) & 0xffffffff
+            if self._lazy_verify:
+                self._verified_blocks.add(block_idx)
 
-            assert len(record_block) == decompress_size
-
-            record = record_block[record_strt: record_end]
-            # convert to utf-8
-            record = record.decode(self._encoding, errors = 'ignore').strip('\x00')
-            # substitute styles
-            if self._is_substyle and self._stylesheet:
-                record = self._substitute_stylesheet(record)
+        assert len(record_block) == decompress_size
 
-            return 1, record
+        if self._block_cache is not None:
+            _ = self._block_cache.put((self._srcfile, block_idx), record_block)
+        return record_block
 
     def search_record(self, pattern: str, limit: int):
         word_list: list[str] = []
         regexp = re.compile(pattern)
         i = 0
-        for key in self._key_list:
+        for key in self._keys_in_file_order():
             match = re.search(regexp, key)
             if match:
                 word_list.append(key)
@@ -131,6 +323,64 @@ class MdPackage:
 
         return word_list
 
+    def prefix_records(self, prefix: str, limit: int) -> list[str]:
+        ''' keys starting with prefix, the first limit + 1 of them in file order,
+            same as search_record("^" + prefix + ".*", limit) for a plain prefix
+        '''
+        lo, hi = prefix_range(len(self), prefix, self.key_bytes_at)
+        if hi - lo > limit + 1:
+            idx_list = heapq.nsmallest(limit + 1, range(lo, hi), key=self._key_order.__getitem__)
+        else:
+            idx_list = sorted(range(lo, hi), key=self._key_order.__getitem__)
+        return [self.key_at(i) for i in idx_list]
+
+    def __len__(self) -> int:
+        return len(self._key_order)
+
+    def key_at(self, i: int) -> str:
+        return self.key_bytes_at(i).decode('utf-8')
+
+    def key_bytes_at(self, i: int) -> bytes:
+        return self._key_buf[self._key_offsets[i]: self._key_offsets[i+1]]
+
+    def file_pos(self, i: int) -> int:
+        ''' position in the file of the i-th key of the key table
+        '''
+        return self._key_order[i]
+
+    def _keys_in_file_order(self) -> Iterator[str]:
+        idx_list = array('I', bytes(4 * len(self._key_order)))
+        for i, pos in enumerate(self._key_order):
+            idx_list[pos] = i
+        for i in idx_list:
+            yield self.key_at(i)
+
+    def find_key(self, key: str) -> int:
+        ''' index of key in the key table, -1 if missing
+        '''
+        # utf-8 byte order is the same as code point order
+        return find_sorted(len(self), key.encode('utf-8'), self.key_bytes_at)
+
+    def _compact(self):
+        ''' move _record_dict and _block_list into the compact arrays
+        '''
+        keys = [key.encode('utf-8') for key in self._record_dict]
+        infos = list(self._record_dict.values())
+        self._record_dict = {}
+
+        order = sorted(range(len(keys)), key=keys.__getitem__)
+        self._key_order = array('I', order)
+        self._key_buf = b"".join([keys[pos] for pos in order])
+        self._key_offsets = array('Q', accumulate((len(keys[pos]) for pos in order), initial=0))
+        self._rec_block = array('I', (infos[pos][0] for pos in order))
+        self._rec_strt = array('I', (infos[pos][1] for pos in order))
+        self._rec_end = array('I', (infos[pos][2] for pos in order))
+
+        self._blk_offset = array('Q', (block[0] for block in self._block_list))
+        self._blk_csize = array('Q', (block[1] for block in self._block_list))
+        self._blk_dsize = array('Q', (block[2] for block in self._block_list))
+        self._block_list = []
+
     def check_addrecord(self, word: str, record: str) -> tuple[int, str]:
         raise NotImplementedError(f"Don't support to add record: {word}, {record}")
 
@@ -138,10 +388,113 @@ class MdPackage:
         raise NotImplementedError("Don't support to delete word: " + word)
 
     def close(self) -> bool:
+        if self._view is not None:
+            self._view.release()
+            self._view = None
+        if self._mmap is not None:
+            try:
+                self._mmap.close()
+            except BufferError:
+                # blocks still referenced by the cache, leave it to gc
+                pass
+            self._mmap = None
+        return True
+
+    @contextmanager
+    def _open_source(self) -> Iterator[SourceReader]:
+        ''' a cursor on the mapping in mmap mode, otherwise the opened file
+        '''
+        if self._view is not None:
+            yield ViewReader(self._view)
+        else:
+            with open(self._srcfile, 'rb') as f:
+                yield f
+
+    def _fingerprint(self) -> dict[str, int | str]:
+        """ identify the source file the index was built from, and how it was read:
+            the keys are decoded with the encoding, the key block info decrypted with the passcode
+        """
+        stat = os.stat(self._srcfile)
+        passcode = ""
+        if self._passcode is not None:
+            regcode, userid = self._passcode
+            # not the passcode itself, the index is readable by anyone
+            passcode = hashlib.sha256(regcode + b"\0" + userid.encode("utf-8")).hexdigest()
+        return {
+            "size": stat.st_size,
+            "mtime": stat.st_mtime_ns,
+            "header": self._header_adler32,
+            "encoding": self._encoding,
+            "passcode": passcode
+        }
+
+    def _index_arrays(self) -> list[array[int]]:
+        return [self._key_offsets, self._key_order, self._rec_block, self._rec_strt,
+            self._rec_end, self._blk_offset, self._blk_csize, self._blk_dsize]
+
+    def _load_index(self) -> bool:
+        """ load the key/record table from the sidecar index,
+            return False if it is missing or stale
+
+            layout: one line of json header, the arrays, the key buffer
+        """
+        if not os.path.isfile(self._idxfile):
+            return False
+        try:
+            with open(self._idxfile, "rb") as f:
+                header = json.loads(f.readline())
+                if header["version"] != INDEX_VERSION or \
+                        header["byteorder"] != sys.byteorder or \
+                        header["fingerprint"] != self._fingerprint():
+                    print(f"stale index {self._idxfile}")
+                    return False
+                arrays: list[array[int]] = []
+                for typecode, length in header["arrays"]:
+                    arr = array(typecode)
+                    arr.fromfile(f, length)
+                    arrays.append(arr)
+                key_buf = f.read(header["keybuf"])
+                if len(key_buf) != header["keybuf"]:
+                    raise EOFError("truncated key buffer")
+                entries_num: int = header["entries_num"]
+            # a header listing the wrong number of arrays is rebuilt like a truncated one
+            key_offsets, key_order, rec_block, rec_strt, rec_end, blk_offset, blk_csize, blk_dsize = arrays
+        except (OSError, EOFError, ValueError, KeyError, TypeError) as reason:
+            print(f"Fail to load index {self._idxfile}, because {reason}")
+            return False
+
+        self._entries_num = entries_num
+        self._key_buf = key_buf
+        self._key_offsets, self._key_order, self._rec_block, self._rec_strt = \
+            key_offsets, key_order, rec_block, rec_strt
+        self._rec_end, self._blk_offset, self._blk_csize, self._blk_dsize = \
+            rec_end, blk_offset, blk_csize, blk_dsize
         return True
 
+    def _save_index(self):
+        arrays = self._index_arrays()
+        header = {
+            "version": INDEX_VERSION,
+            "fingerprint": self._fingerprint(),
+            "byteorder": sys.byteorder,
+            "entries_num": self._entries_num,
+            "arrays": [[arr.typecode, len(arr)] for arr in arrays],
+            "keybuf": len(self._key_buf)
+        }
+        tmpfile = self._idxfile + ".tmp"
+        try:
+            with open(tmpfile, "wb") as f:
+                _ = f.write(json.dumps(header).encode("utf-8") + b"\n")
+                for arr in arrays:
+                    arr.tofile(f)
+                _ = f.write(self._key_buf)
+            # never leave a half-written index behind
+            os.replace(tmpfile, self._idxfile)
+        except OSError as reason:
+            print(f"Fail to save index {self._idxfile}, because {reason}")
+
     def _read_header(self):
-        with open(self._srcfile, "rb") as f:
+        with self._open_source() as f:
             # number of bytes of header text, big-endian, integer
             headersize_bytes = f.read(4)
             # print(f"sizeOfHeaderRaw = {headersize_bytes.join()}")
@@ -157,11 +510,12 @@ class MdPackage:
             adler32 = cast(int, struct.unpack("<I", adler32_bytes)[0])
             # print(f"adler32 = { adler32 }")
             assert adler32 == zlib.adler32(header_bytes) & 0xffffffff
+            self._header_adler32 = adler32
             # mark down key block offset
             self._file_pos = f.tell()
 
         # header text in utf-16 encoding ending with '\x00\x00'
-        header_text = header_bytes[:-2].decode('utf-16')
+        header_text = str(header_bytes[:-2], 'utf-16')
         # print(f"header_text = {header_text}")
         header_tags = self._parse_header(header_text)
         if not header_tags:
@@ -212,6 +566,8 @@ class MdPackage:
         else:
             self._width_num = 8
             self._num_format = '>Q'
+        self._num_struct = _NUM_STRUCTS[self._num_format]
+        self._pair_struct = _PAIR_STRUCTS[self._num_format]
 
         return header_tags
 
@@ -235,8 +591,8 @@ class MdPackage:
         encrypt_key = s20.encrypt_bytes(reg_code)
         return encrypt_key
 
-    def _read_keyblocks(self):
-        with open(self._srcfile, 'rb') as f:
+    def _read_keyblocks(self, workers: int = 1):
+        with self._open_source() as f:
             _ = f.seek(self._file_pos)
 
             # the following numbers could be encrypted
@@ -260,7 +616,7 @@ class MdPackage:
                 else:
                     encrypted_key = self._decrypt_regcode_by_deviceid(regcode, userid)
 
-                block = self._salsa_decrypt(block, encrypted_key)
+                block = self._salsa_decrypt(bytes(block), encrypted_key)
 
             # decode self block
             sf = BytesIO(block)
@@ -307,7 +663,7 @@ class MdPackage:
             # print(f"keyblock_compressed = {keyblock_compressed.join()}")
 
             # extract key block
-            keyblock_list = self._decode_keyblocks(keyblock_compressed, keyblockinfo_list)
+            keyblock_list = self._decode_keyblocks(keyblock_compressed, keyblockinfo_list, workers)
 
             self._file_pos = f.tell()
 
@@ -332,11 +688,20 @@ class MdPackage:
         # assert(num == len)
         # return buf
 
-    def _read_number(self, f: BufferedIOBase) -> int:
+    def _read_number(self, f: SourceReader | BytesIO) -> int:
         data = f.read(self._width_num)
-        num = cast(int, struct.unpack(self._num_format, data)[0])
+        num = cast(int, self._num_struct.unpack(data)[0])
         return num
 
+    def _read_recordblock_info(self, f: SourceReader, recordblocks_num: int,
+            recordblockinfo_size: int) -> list[tuple[int, int]]:
+        ''' (compressed size, decompressed size) of every record block
+        '''
+        assert recordblockinfo_size == recordblocks_num * self._pair_struct.size
+        recordblock_info = f.read(recordblockinfo_size)
+        return cast(list[tuple[int, int]],
+            list(self._pair_struct.iter_unpack(recordblock_info)))
+
     def _decord_keyblockinfo(self, keyblockinfo_compressed: bytes,
             keyblockinfodecomp_size: int):
         if self._version >= 2:
@@ -354,163 +719,201 @@ class MdPackage:
             # print(f"keyblock_info = {keyblock_info}")
 
             # adler checksum
-            adler32 = cast(int, struct.unpack('>I', keyblockinfo_compressed[4:8])[0])
+            adler32 = cast(int, _U32BE.unpack_from(keyblockinfo_compressed, 4)[0])
             # print(f"adler32 in keyblock_info = {adler32}")
             assert adler32 == zlib.adler32(keyblock_info) & 0xffffffff
         else:
             # no compression and encrypt
             keyblock_info = keyblockinfo_compressed
 
-        # keyblkinfo_text = ''.join(map(lambda x:(',') + str(x), keyblock_info))
-        # print('keyBlockInfo =', keyblkinfo_text)
         # decode # [keyblockcompressed_size, keyblockdecompressed_size]
         keyblockinfo_list: list[tuple[int, int]] = []
         entries_num: int = 0
-        i: int = 0
         if self._version >= 2:
-            byte_format = '>H'
-            byte_width = 2
+            size_struct = _U16BE
             textterm_size = 1
         else:
-            byte_format = '>B'
-            byte_width = 1
+            size_struct = _U8
             textterm_size = 0
-
+        # text head and tail are counted in characters
+        char_width = 2 if self._encoding == 'UTF-16' else 1
+        num_unpack = self._num_struct.unpack_from
+        size_unpack = size_struct.unpack_from
+        pair_unpack = self._pair_struct.unpack_from
+        num_width = self._width_num
+        size_width = size_struct.size
+        pair_width = self._pair_struct.size
+
+        keyblock_info = memoryview(keyblock_info)
         keyblkinfo_len = len(keyblock_info)
-        # print(f"keyblkinfo_len = {keyblkinfo_len}")
+        i: int = 0
         while i < keyblkinfo_len:
             # number in entries in current key block
-            entries_num += cast(int, struct.unpack(self._num_format,
-                keyblock_info[i: i+self._width_num])[0])
-            # print(f"entries_num: {entries_num}")
-            i += self._width_num
-            # text head size
-            # print(f"byte_format: {byte_format}")
-            # print(f"strt: {i}, end: {i + byte_width}")
-            texthead_size = cast(int, struct.unpack(byte_format,
-                keyblock_info[i: i+byte_width])[0])
-            # print(f"texthead_size: {texthead_size}")
-            i += byte_width
-            # text head
-            if self._encoding != 'UTF-16':
-                i += texthead_size + textterm_size
-            else:
-                i += (texthead_size + textterm_size) * 2
-            # text tail size
-            texttail_size = cast(int, struct.unpack(byte_format, keyblock_info[i: i+byte_width])[0])
-            # print(f"texttail_size: {texttail_size}")
-            i += byte_width
-            # text tail
-            if self._encoding != 'UTF-16':
-                i += texttail_size + textterm_size
-            else:
-                i += (texttail_size + textterm_size) * 2
-
-            # print(f"self.__num_format: {self.__num_format}")
-
-            # key block compressed size
-            keyblockcompressed_size = cast(int, struct.unpack(self._num_format,
-                keyblock_info[i:i+self._width_num])[0])
-            # print(f"keyblockcompressed_size: {keyblockcompressed_size}")
-            i += self._width_num
-            # key block decompressed size
-            keyblockdecompressed_size = cast(int, struct.unpack(self._num_format,
-                keyblock_info[i:i+self._width_num])[0])
-            # print(f"keyblockdecompressed_size: {keyblockdecompressed_size}")
-            i += self._width_num
-
-            keyblockinfo_list += [(keyblockcompressed_size, keyblockdecompressed_size)]
-            # assert(entries_num == self.__entries_num)
-        # print(f"keyblockinfo_list = { keyblockinfo_list }")
+            entries_num += num_unpack(keyblock_info, i)[0]
+            i += num_width
+            # text head size, text head
+            texthead_size = size_unpack(keyblock_info, i)[0]
+            i += size_width + (texthead_size + textterm_size) * char_width
+            # text tail size, text tail
+            texttail_size = size_unpack(keyblock_info, i)[0]
+            i += size_width + (texttail_size + textterm_size) * char_width
+            # key block compressed size, key block decompressed size
+            keyblockinfo_list.append(pair_unpack(keyblock_info, i))
+            i += pair_width
         return keyblockinfo_list
 
-    def _fast_decrypt(self, data: bytes, key: bytes) -> bytes:
-        b = bytearray(data)
-        key_ary = bytearray(key)
-        previous = 0x36
-        for i in range(len(b)):
-            t = (b[i] >> 4 | b[i] << 4) & 0xff
-            t = t ^ previous ^ (i & 0xff) ^ key_ary[i % len(key_ary)]
-            previous = b[i]
-            b[i] = t
-        bb = bytes(b)
-        bbb = ''.join(map(lambda x:(',') + str(x), bb))
-        # print('FastDecrypt =', bbb)
-        return bb
+    def _fast_decrypt(self, data: bytes | memoryview, key: bytes) -> bytes:
+        ''' t[i] = swap_nibbles(c[i]) ^ c[i-1] ^ i ^ key[i % len(key)], with c[-1] = 0x36
+        '''
+        n = len(data)
+        if n == 0:
+            return b''
+        if np is not None:
+            b = np.frombuffer(data, dtype=np.uint8)
+            t = (b >> 4) | (b << 4)
+            t[0] ^= 0x36
+            t[1:] ^= b[:-1]
+            t ^= np.arange(n, dtype=np.uint8)
+            t ^= np.tile(np.frombuffer(key, dtype=np.uint8), n // len(key) + 1)[:n]
+            return t.tobytes()
+        data = bytes(data)
+        # the per-byte terms are xor-ed all at once as big integers
+        rounds = n // 256 + 1
+        t = int.from_bytes(data.translate(_NIBBLE_SWAP), 'little')
+        t ^= int.from_bytes(b'\x36' + data[:-1], 'little')
+        t ^= int.from_bytes((_BYTE_RANGE * rounds)[:n], 'little')
+        t ^= int.from_bytes((key * (n // len(key) + 1))[:n], 'little')
+        return t.to_bytes(n, 'little')
 
     def _mdx_decrypt(self, comp_block: bytes):
         tail = struct.pack(b'<L', 0x3695)
         # print('Tail of key of compBlock =', tail)
-        msg = comp_block[4:8]
+        msg = bytes(comp_block[4:8])
         # print('msg =', str(msg))
         key = ripemd128(msg + tail)
         # key_text = ''.join(map(lambda x:(',0x' if len(hex(x))>=4 else ',0x0') + hex(x)[2:], key))
         key_text = ''.join(map(lambda x:(',') + str(x), key))
         # print('Key of compBlock =', key_text)
-        return comp_block[0:8] + self._fast_decrypt(comp_block[8:], key)
+        return bytes(comp_block[0:8]) + self._fast_decrypt(comp_block[8:], key)
 
-    def _decode_keyblocks(self, keyblock_compressed: bytes,
-            keyblockinfo_list: list[tuple[int, int]]):
+    def _decode_keyblocks(self, keyblock_compressed: bytes | memoryview,
+            keyblockinfo_list: list[tuple[int, int]], workers: int = 1):
         key_list: list[tuple[int, bytes]] = []
+        blocks: list[tuple[bytes | memoryview, int]] = []
         i = 0
         for compressed_size, decompressed_size in keyblockinfo_list:
             start = i
             end = i + compressed_size
-            # 4 bytes : compression type
-            keyblock_type = keyblock_compressed[start:start+4]
-            # print(f"keyBlockTypeStr: {keyBlockTypeStr}")
-
-            # 4 bytes : adler checksum in decompressed key block
-            adler32 = cast(int, struct.unpack('>I', keyblock_compressed[start+4:start+8])[0])
-
-            # print(f"strt: {start}, end: {end}")
-            key_block = self._decompress(keyblock_type,
-                keyblock_compressed[start: end], decompressed_size)
-            # print(f"key_block: {key_block.join()}")
-            assert adler32 == zlib.adler32(key_block) & 0xffffffff
-
-            # extract one single key block into a key list
-            key_list += self._decode_keyblock(key_block)
-
+            blocks.append((keyblock_compressed[start: end], decompressed_size))
             i += compressed_size
 
+        # decompression releases the GIL, so blocks inflate in parallel,
+        # results come back in key order
+        for keys in imap_ordered(self._decode_compressed_keyblock, blocks, workers, self._pool):
+            key_list += keys
+
         # print(f"len in keyblock_list = {len(key_list)}")
         return key_list
 
-    def _decode_keyblock(self, key_block: bytes):
+    def _decode_compressed_keyblock(self, block: tuple[bytes | memoryview, int]):
+        key_block = self._inflate_block(block)
+        # extract one single key block into a key list
+        return self._decode_keyblock(key_block)
+
+    def _inflate_block(self, block: tuple[bytes | memoryview, int]) -> bytes | memoryview:
+        ''' decompress one key/record block and check its adler32
+        '''
+        block_compressed, decompressed_size = block
+        # 4 bytes : compression type
+        block_type = block_compressed[:4]
+        # 4 bytes : adler checksum in decompressed block
+        adler32 = cast(int, _U32BE.unpack_from(block_compressed, 4)[0])
+
+        decompressed_block = self._decompress(block_type, block_compressed, decompressed_size)
+        # notice that adler32 return signed value
+        assert adler32 == zlib.adler32(decompressed_block) & 0xffffffff
+        assert len(decompressed_block) == decompressed_size
+        return decompressed_block
+
+    def _decode_keyblock(self, key_block: bytes | memoryview):
         key_list: list[tuple[int, bytes]] = []
+        # key text ends with '\x00', a utf-16 one with '\x00\x00' at an even offset
+        if self._encoding == 'UTF-16':
+            delimiter = b'\x00\x00'
+            width = 2
+        else:
+            delimiter = b'\x00'
+            width = 1
+        key_block = bytes(key_block)
+        find = key_block.find
+        id_unpack = self._num_struct.unpack_from
+        num_width = self._width_num
+        encoding = self._encoding
+        block_len = len(key_block)
         keystrt_idx = 0
-        keyend_idx = 0
-        while keystrt_idx < len(key_block):
+        while keystrt_idx < block_len:
             # the corresponding record's offset in record block
-            key_id = cast(int, struct.unpack(self._num_format,
-                key_block[keystrt_idx:keystrt_idx+self._width_num])[0])
-            # key text ends with '\x00'
-            if self._encoding == 'UTF-16':
-                delimiter = b'\x00\x00'
-                width = 2
-            else:
-                delimiter = b'\x00'
-                width = 1
-            i = keystrt_idx + self._width_num
-            while i < len(key_block):
-                if key_block[i:i+width] == delimiter:
-                    keyend_idx = i
-                    break
-                i += width
-            key_text = key_block[keystrt_idx+self._width_num: keyend_idx] \
-                .decode(self._encoding, errors='ignore')
-            # print('keyText1 =', keyText1)
-            key_bytes = key_text.encode('utf-8').strip()
+            key_id = id_unpack(key_block, keystrt_idx)[0]
+            text_strt = keystrt_idx + num_width
+            keyend_idx = find(delimiter, text_strt)
+            while width == 2 and keyend_idx >= 0 and (keyend_idx - text_strt) & 1:
+                keyend_idx = find(delimiter, keyend_idx + 1)
+            if keyend_idx < 0:
+                keyend_idx = block_len
+            key_text = str(key_block[text_strt: keyend_idx], encoding, errors='ignore')
+            key_list.append((key_id, key_text.encode('utf-8').strip()))
             keystrt_idx = keyend_idx + width
-            key_list += [(key_id, key_bytes)]
         return key_list
 
-    def _decode_mdd_recordblock(self):
-        with open(self._srcfile, 'rb') as f:
+    def _index_recordblock(self):
+        ''' locate every record by the record block info only,
+            the record blocks are not decompressed
+        '''
+        with self._open_source() as f:
             _ = f.seek(self._file_pos)
 
-            size_counter = 0
+            recordblocks_num = self._read_number(f)
+            entries_num = self._read_number(f)
+            assert entries_num == self._entries_num
+
+            recordblockinfo_size = self._read_number(f)
+            recordblock_size = self._read_number(f)
+
+            # record block info section
+            # decompress_ends[i]: offset of the end of block i in the decompressed records
+            decompress_ends: list[int] = []
+            compressblock_strt = f.tell() + recordblockinfo_size
+            offset = 0
+            for compressed_size, decompressed_size in self._read_recordblock_info(f,
+                    recordblocks_num, recordblockinfo_size):
+                self._block_list.append((compressblock_strt, compressed_size, decompressed_size))
+                compressblock_strt += compressed_size
+                offset += decompressed_size
+                decompress_ends.append(offset)
+
+            assert f.tell() == compressblock_strt - recordblock_size
+
+        keys_num = len(self._keyblock_list)
+        for i, (record_strt, key_bytes) in enumerate(self._keyblock_list):
+            # the block whose decompressed range holds record_strt
+            block_idx = bisect_right(decompress_ends, record_strt)
+            if block_idx >= recordblocks_num:
+                break
+            block_end = decompress_ends[block_idx]
+            offset = block_end - self._block_list[block_idx][2]
+
+            # record end index
+            if i < keys_num - 1:
+                record_end = min(self._keyblock_list[i + 1][0], block_end)
+            else:
+                record_end = block_end
+
+            info = block_idx, record_strt-offset, record_end-offset
+            self._record_dict[key_bytes.decode("UTF-8")] = info
+
+    def _decode_mdd_recordblock(self, workers: int = 1):
+        with self._open_source() as f:
+            _ = f.seek(self._file_pos)
 
             recordblocks_num = self._read_number(f)
             entries_num = self._read_number(f)
@@ -520,35 +923,18 @@ class MdPackage:
             recordblock_size = self._read_number(f)
 
             # record block info section
-            recordblockinfo_list: list[tuple[int, int]] = []
-            for i in range(recordblocks_num):
-                compressed_size = self._read_number(f)
-                decompressed_size = self._read_number(f)
-                recordblockinfo_list += [(compressed_size, decompressed_size)]
-                size_counter += self._width_num * 2
-            assert size_counter == recordblockinfo_size
-
-            # actual record block
+            recordblockinfo_list = self._read_recordblock_info(f, recordblocks_num,
+                recordblockinfo_size)
+
+            # actual record block, read here and inflated on the workers
+            compressblock_strt = f.tell()
+            recordblocks = ((f.read(compressed_size), decompressed_size)
+                for compressed_size, decompressed_size in recordblockinfo_list)
             offset = 0
             i = 0
             size_counter = 0
-            for compressed_size, decompressed_size in recordblockinfo_list:
-                compressblock_strt = f.tell()
-                # compressblock_strt = f.read(compressed_size)
-                recordblock_compressed = f.read(compressed_size)
-                # 4 bytes: compression type
-                recordblock_type = recordblock_compressed[:4]
-                # 4 bytes: adler32 checksum in decompressed record block
-                adler32 = cast(int, struct.unpack('>I', recordblock_compressed[4:8])[0])
-
-                # recordBlockTypeStr = recordblock_type.join()
-                record_block = self._decompress(recordblock_type,
-                    recordblock_compressed, decompressed_size)
-                # notice that adler32 return signed value
-                assert adler32 == zlib.adler32(record_block) & 0xffffffff
-
-                assert len(record_block) == decompressed_size
-
+            for (compressed_size, decompressed_size), record_block in zip(recordblockinfo_list,
+                    imap_ordered(self._inflate_block, recordblocks, workers, self._pool)):
                 # split record block according to the offset info from key block
                 while i < len(self._keyblock_list):
                     record_strt, key_bytes = self._keyblock_list[i]
@@ -564,17 +950,18 @@ class MdPackage:
                     i += 1
 
                     # yield key_text, data
-                    info = record_strt-offset, record_end-offset, \
-                        compressblock_strt, compressed_size, decompressed_size
+                    info = len(self._block_list), record_strt-offset, record_end-offset
                     self._record_dict[key_bytes.decode("UTF-8")] = info
 
+                self._block_list.append((compressblock_strt, compressed_size, decompressed_size))
+                compressblock_strt += compressed_size
                 offset += len(record_block)
                 size_counter += compressed_size
 
             assert size_counter == recordblock_size
 
-    def _decode_mdx_recordblock(self):
-        with open(self._srcfile, 'rb') as f:
+    def _decode_mdx_recordblock(self, workers: int = 1):
+        with self._open_source() as f:
             _ = f.seek(self._file_pos)
 
             recordblocks_num = self._read_number(f)
@@ -592,37 +979,18 @@ class MdPackage:
             # print(f"mid in file = {f.tell()}")
 
             # record block info section
-            recordblockinfo_list: list[tuple[int, int]] = []
-            size_counter: int = 0
-            for i in range(recordblocks_num):
-                compressed_size = self._read_number(f)
-                decompressed_size = self._read_number(f)
-                recordblockinfo_list += [(compressed_size, decompressed_size)]
-                size_counter += self._width_num * 2
+            recordblockinfo_list = self._read_recordblock_info(f, recordblocks_num,
+                recordblockinfo_size)
 
-            assert size_counter == recordblockinfo_size
-
-            # actual record block data
+            # actual record block, read here and inflated on the workers
+            compressblock_strt = f.tell()
+            recordblocks = ((f.read(compressed_size), decompressed_size)
+                for compressed_size, decompressed_size in recordblockinfo_list)
             offset = 0
             i = 0
             size_counter = 0
-            for compressed_size, decompressed_size in recordblockinfo_list:
-                compressblock_strt = f.tell()
-                # print(f"compressblock_strt = { compressblock_strt }")
-                recordblock_compressed = f.read(compressed_size)
-                # 4 bytes indicates block compression type
-                recordblock_type = recordblock_compressed[: 4]
-                # 4 bytes adler checksum in uncompressed content
-                adler32 = cast(int, struct.unpack('>I', recordblock_compressed[4:8])[0])
-
-                record_block = self._decompress(recordblock_type,
-                    recordblock_compressed, decompressed_size)
-
-                # notice that adler32 return signed value
-                assert adler32 == zlib.adler32(record_block) & 0xffffffff
-
-                assert len(record_block) == decompressed_size
-
+            for (compressed_size, decompressed_size), record_block in zip(recordblockinfo_list,
+                    imap_ordered(self._inflate_block, recordblocks, workers, self._pool)):
                 # split record block according to the offset info from key block
                 # for word, record_strt in self._KeyDict.items():
                 while i < len(self._keyblock_list):
@@ -640,10 +1008,11 @@ class MdPackage:
 
                     i += 1
 
-                    info = record_strt-offset, record_end-offset, \
-                        compressblock_strt, compressed_size, decompressed_size
+                    info = len(self._block_list), record_strt-offset, record_end-offset
                     self._record_dict[key_text.decode("UTF-8")] = info
 
+                self._block_list.append((compressblock_strt, compressed_size, decompressed_size))
+                compressblock_strt += compressed_size
                 offset += len(record_block)
                 size_counter += compressed_size
 
@@ -661,7 +1030,8 @@ class MdPackage:
                 txt_styled += + style[0] + p + style[1]
         return txt_styled
 
-    def _decompress(self, compr_type: bytes, compr_block: bytes, decompr_size: int) -> bytes:
+    def _decompress(self, compr_type: bytes | memoryview, compr_block: bytes | memoryview,
+            decompr_size: int) -> bytes | memoryview:
         match compr_type:
             case b'\x00\x00\x00\x00':    # no compression
                 return compr_block[8:]
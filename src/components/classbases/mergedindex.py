@@ -0,0 +1,121 @@
+#!/usr/bin/python3
+# -*- coding: utf-8 -*-
+import heapq
+from array import array
+from bisect import bisect_left
+from collections.abc import Callable, Iterator
+from itertools import chain, zip_longest
+from typing import Protocol
+
+
+class KeyTable(Protocol):
+    ''' keys sorted by their utf-8 bytes, addressed by position
+    '''
+    def __len__(self) -> int: ...
+
+    def key_bytes_at(self, i: int) -> bytes: ...
+
+    def file_pos(self, i: int) -> int: ...
+
+
+def find_sorted(n: int, key_bytes: bytes, key_bytes_at: Callable[[int], bytes]) -> int:
+    ''' position of key_bytes in a sorted table of n keys, -1 if missing
+    '''
+    i = bisect_left(range(n), key_bytes, key=key_bytes_at)
+    if i < n and key_bytes_at(i) == key_bytes:
+        return i
+    return -1
+
+
+def prefix_range(n: int, prefix: str, key_bytes_at: Callable[[int], bytes]) -> tuple[int, int]:
+    ''' [lo, hi) of the keys starting with prefix in a sorted table of n keys
+    '''
+    # the keys are compared as bytes, so is the bound: the prefix with its last byte
+    # one higher, which needn't be utf-8. A utf-8 byte is never 0xff
+    prefix_bytes = prefix.encode('utf-8')
+    lo = bisect_left(range(n), prefix_bytes, key=key_bytes_at)
+    if not prefix_bytes:
+        return lo, n
+    upper = prefix_bytes[:-1] + bytes((prefix_bytes[-1] + 1,))
+    hi = bisect_left(range(n), upper, lo, key=key_bytes_at)
+    return lo, hi
+
+
+def _entries(vol: int, table: KeyTable) -> Iterator[tuple[bytes, int, int]]:
+    for i in range(len(table)):
+        yield table.key_bytes_at(i), vol, i
+
+
+class MergedIndex[T: KeyTable]:
+    ''' one sorted key table over several volumes, only (volume, position)
+        pairs are stored, the keys stay in the volumes.
+        A key in more than one volume belongs to the first of them.
+    '''
+    def __init__(self, volumes: list[T]):
+        self._volumes: list[T] = volumes
+        self._vol: array[int] = array('H')
+        self._local: array[int] = array('I')
+        if len(volumes) == 1:
+            n = len(volumes[0])
+            self._vol = array('H', bytes(2 * n))
+            self._local = array('I', range(n))
+        else:
+            last: bytes | None = None
+            for key_bytes, vol, i in heapq.merge(*(_entries(vol, table)
+                    for vol, table in enumerate(volumes))):
+                if key_bytes == last:
+                    continue
+                last = key_bytes
+                self._vol.append(vol)
+                self._local.append(i)
+
+    @property
+    def volumes(self) -> list[T]:
+        return self._volumes
+
+    def __len__(self) -> int:
+        return len(self._local)
+
+    def entry_at(self, j: int) -> tuple[int, int]:
+        return self._vol[j], self._local[j]
+
+    def key_bytes_at(self, j: int) -> bytes:
+        return self._volumes[self._vol[j]].key_bytes_at(self._local[j])
+
+    def key_at(self, j: int) -> str:
+        return self.key_bytes_at(j).decode('utf-8')
+
+    def find(self, key: str) -> tuple[int, int]:
+        ''' (volume, position in the volume) of key, (-1, -1) if missing
+        '''
+        j = find_sorted(len(self._local), key.encode('utf-8'), self.key_bytes_at)
+        if j < 0:
+            return -1, -1
+        return self.entry_at(j)
+
+    def neighbours(self, key: str, n: int) -> list[str]:
+        ''' up to n keys after key and n before it in key order,
+            nearest first, alternating from the next one
+        '''
+        size = len(self._local)
+        key_bytes = key.encode('utf-8')
+        j = bisect_left(range(size), key_bytes, key=self.key_bytes_at)
+        after = j + 1 if j < size and self.key_bytes_at(j) == key_bytes else j
+        pairs = zip_longest(range(after, min(after + n, size)), range(j - 1, max(j - n, 0) - 1, -1))
+        return [self.key_at(i) for i in chain.from_iterable(pairs) if i is not None]
+
+    def prefix_keys(self, prefix: str, limit: int) -> list[str]:
+        ''' keys starting with prefix, the first limit + 1 of them in file order,
+            volume by volume
+        '''
+        lo, hi = prefix_range(len(self._local), prefix, self.key_bytes_at)
+
+        def file_order(j: int) -> tuple[int, int]:
+            vol, i = self.entry_at(j)
+            return vol, self._volumes[vol].file_pos(i)
+
+        if hi - lo > limit + 1:
+            idx_list = heapq.nsmallest(limit + 1, range(lo, hi), key=file_order)
+        else:
+            idx_list = sorted(range(lo, hi), key=file_order)
+        return [self.key_at(j) for j in idx_list]
@@ -0,0 +1,39 @@
+#!/usr/bin/python3
+# -*- coding: utf-8 -*-
+import gzip
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+# a rendered page is compressed once when it is stored, the copies are sent
+# to the clients accepting them.
+# content coding -> suffix of the compressed copy, the preferred first
+ENCODINGS: dict[str, str] = {"br": ".br", "gzip": ".gz"} if brotli is not None else {"gzip": ".gz"}
+# suffixes of the copies any run may have left, brotli may have been there
+SUFFIXES = (".br", ".gz")
+# smaller pages aren't worth a compressed copy
+MIN_COMPRESS_SIZE = 512
+
+# pages are compressed by the request that renders them, or by the prefetch.
+# Higher levels save a few percent for several times the time, brotli 11 hundreds of ms
+GZIP_LEVEL = 6
+BROTLI_QUALITY = 5
+
+
+def compress_page(data: bytes) -> dict[str, bytes]:
+    ''' content coding -> compressed data, only for the codings that make it smaller
+    '''
+    variants: dict[str, bytes] = {}
+    if len(data) < MIN_COMPRESS_SIZE:
+        return variants
+    for encoding in ENCODINGS:
+        if encoding == "br":
+            assert brotli is not None
+            compressed = brotli.compress(data, quality=BROTLI_QUALITY)
+        else:
+            # mtime=0, the same page always gives the same bytes
+            compressed = gzip.compress(data, GZIP_LEVEL, mtime=0)
+        if len(compressed) < len(data):
+            variants[encoding] = compressed
+    return variants
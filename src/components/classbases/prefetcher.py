@@ -0,0 +1,94 @@
+#!/usr/bin/python3
+# -*- coding: utf-8 -*-
+import threading
+from collections import OrderedDict
+from collections.abc import Callable
+from concurrent.futures import Future, ThreadPoolExecutor
+
+# prefetched words remembered for the hit rate, per depth
+PREFETCHED_PER_DEPTH = 64
+
+
+class Prefetcher:
+    ''' render the neighbours of a looked-up word on a bounded background pool,
+        the next lookup cancels whatever is left of the previous one
+    '''
+    def __init__(self, render: Callable[[str], bool], depth: int, workers: int = 1, name: str = ""):
+        # render(word) is False if there was nothing to do
+        self._render: Callable[[str], bool] = render
+        self._depth: int = depth
+        self._pool: ThreadPoolExecutor = ThreadPoolExecutor(max_workers=workers,
+            thread_name_prefix=f"prefetch-{name}")
+        self._lock: threading.Lock = threading.Lock()
+        self._generation: int = 0
+        self._pending: list[Future[None]] = []
+        # rendered in the background and not looked up yet
+        self._prefetched: OrderedDict[str, None] = OrderedDict()
+        self._prefetched_max: int = PREFETCHED_PER_DEPTH * depth
+
+        self._lookups: int = 0
+        self._hits: int = 0
+        self._scheduled: int = 0
+        self._rendered: int = 0
+        self._cancelled: int = 0
+        self._failed: int = 0
+
+    @property
+    def depth(self) -> int:
+        return self._depth
+
+    @property
+    def stats(self) -> dict[str, int | float]:
+        with self._lock:
+            return {
+                "lookups": self._lookups,
+                "hits": self._hits,
+                "hit_rate": self._hits / self._lookups if self._lookups else 0.0,
+                "scheduled": self._scheduled,
+                "rendered": self._rendered,
+                "cancelled": self._cancelled,
+                "failed": self._failed
+            }
+
+    def on_lookup(self, word: str, neighbours: list[str]):
+        ''' count word as a hit if it was prefetched, then prefetch its neighbours
+        '''
+        with self._lock:
+            self._lookups += 1
+            if word in self._prefetched:
+                del self._prefetched[word]
+                self._hits += 1
+
+            # the user moved on, drop the work queued for the previous word
+            self._generation += 1
+            for future in self._pending:
+                if future.cancel():
+                    self._cancelled += 1
+            generation = self._generation
+            self._pending = [self._pool.submit(self._run, generation, neighbour)
+                for neighbour in neighbours if neighbour != word]
+            self._scheduled += len(self._pending)
+
+    def close(self):
+        self._pool.shutdown(wait=False, cancel_futures=True)
+
+    def _run(self, generation: int, word: str):
+        if generation != self._generation:
+            with self._lock:
+                self._cancelled += 1
+            return
+        try:
+            rendered = self._render(word)
+        except Exception as e:
+            print(f"Fail to prefetch {word}: {e}")
+            with self._lock:
+                self._failed += 1
+            return
+        if not rendered:
+            return
+        with self._lock:
+            self._rendered += 1
+            self._prefetched[word] = None
+            self._prefetched.move_to_end(word)
+            while len(self._prefetched) > self._prefetched_max:
+                _ = self._prefetched.popitem(last=False)
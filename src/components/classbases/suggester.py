@@ -0,0 +1,208 @@
+#!/usr/bin/python3
+# -*- coding: utf-8 -*-
+import heapq
+import threading
+import time
+from array import array
+from bisect import bisect_left
+from collections.abc import Callable
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+# edits between a miss and the words suggested for it
+MAX_DISTANCE = 2
+# deletes are only made from the first characters of a word
+PREFIX_LENGTH = 7
+# misses shorter than this are only allowed one edit, everything is one edit from them
+SHORT_WORD = 6
+# suggestions returned for a miss
+SUGGEST_TOPK = 5
+
+# an entry is the hash of a delete, over the number of characters deleted from the word,
+# over the id of the word
+_ID_BITS = 24
+_LEVEL_BITS = 2
+_MAX_WORDS = 1 << _ID_BITS
+_ID_MASK = _MAX_WORDS - 1
+_HASH_MASK = (1 << (64 - _ID_BITS - _LEVEL_BITS)) - 1
+
+
+def _delete_levels(word: str, max_distance: int) -> list[set[str]]:
+    ''' word, then the strings made by deleting 1, 2, ... max_distance characters of it
+    '''
+    levels = [{word}]
+    for _ in range(max_distance):
+        levels.append({edit[:i] + edit[i + 1:] for edit in levels[-1] for i in range(len(edit))})
+    return levels
+
+
+def _delete_keys(word: str, max_distance: int) -> list[int]:
+    return [(hash(delete) & _HASH_MASK) << _LEVEL_BITS | level
+        for level, deletes in enumerate(_delete_levels(word, max_distance)) for delete in deletes]
+
+
+def edit_distance(a: str, b: str, max_distance: int) -> int:
+    ''' optimal string alignment distance of a and b (a transposition is one edit),
+        max_distance + 1 once it's bigger than max_distance
+    '''
+    if abs(len(a) - len(b)) > max_distance:
+        return max_distance + 1
+    # the common prefix and suffix cost nothing
+    shortest = min(len(a), len(b))
+    strt = 0
+    while strt < shortest and a[strt] == b[strt]:
+        strt += 1
+    end = 0
+    while end < shortest - strt and a[-1 - end] == b[-1 - end]:
+        end += 1
+    a = a[strt: len(a) - end]
+    b = b[strt: len(b) - end]
+    if not a or not b:
+        return min(max(len(a), len(b)), max_distance + 1)
+
+    prev2: list[int] = []
+    prev = list(range(len(b) + 1))
+    for i in range(1, len(a) + 1):
+        ca = a[i - 1]
+        cur = [i] * (len(b) + 1)
+        row_min = i
+        for j in range(1, len(b) + 1):
+            cb = b[j - 1]
+            cost = prev[j - 1] + (ca != cb)
+            if prev[j] + 1 < cost:
+                cost = prev[j] + 1
+            if cur[j - 1] + 1 < cost:
+                cost = cur[j - 1] + 1
+            if i > 1 and j > 1 and ca == b[j - 2] and a[i - 2] == cb and prev2[j - 2] + 1 < cost:
+                cost = prev2[j - 2] + 1
+            cur[j] = cost
+            if cost < row_min:
+                row_min = cost
+        if row_min > max_distance:
+            return max_distance + 1
+        prev2, prev = prev, cur
+    return min(prev[-1], max_distance + 1)
+
+
+class Suggester:
+    ''' spelling suggestions by symmetric deletes (SymSpell) over the words of a dictionary.
+        Only sorted (hash of a delete, characters deleted, word id) entries are kept,
+        the words stay in the dictionary and are read back by word_at(id) to check the candidates.
+    '''
+    def __init__(self, n: int, word_at: Callable[[int], str],
+            max_distance: int = MAX_DISTANCE, prefix_length: int = PREFIX_LENGTH):
+        assert max_distance < 1 << _LEVEL_BITS
+        self._word_at: Callable[[int], str] = word_at
+        self._max_distance: int = max_distance
+        self._prefix_length: int = prefix_length
+        self._lock: threading.Lock = threading.Lock()
+        if n > _MAX_WORDS:
+            print(f"only the first {_MAX_WORDS} of {n} words get suggested")
+            n = _MAX_WORDS
+        self._n: int = n
+
+        strt = time.perf_counter()
+        packed: array[int] = array('Q')
+        last_prefix: str | None = None
+        keys: list[int] = []
+        for i in range(n):
+            prefix = word_at(i)[:prefix_length].lower()
+            # neighbouring words often share their prefix, and so their deletes
+            if prefix != last_prefix:
+                keys = _delete_keys(prefix, max_distance)
+                last_prefix = prefix
+            packed.extend([key << _ID_BITS | i for key in keys])
+        if np is not None:
+            # sorted in place, without a list of python ints
+            np.frombuffer(packed, dtype=np.uint64).sort()
+        else:
+            # by the top byte of the hash first, a list of 1/256 of them at a time
+            buckets = [array('Q') for _ in range(256)]
+            for entry in packed:
+                buckets[entry >> 56].append(entry)
+            packed = array('Q')
+            for bucket in buckets:
+                packed.extend(sorted(bucket))
+                del bucket[:]
+        self._entries: array[int] = packed
+        self._build_ms: float = (time.perf_counter() - strt) * 1000
+
+        # words added after the build, by the keys of their deletes
+        self._added_words: list[str] = []
+        self._added: dict[int, list[int]] = {}
+        # words deleted from the dictionary, still in the entries
+        self._removed: set[str] = set()
+
+    @property
+    def stats(self) -> dict[str, int | float]:
+        return {
+            "words": self._n + len(self._added_words),
+            "entries": len(self._entries),
+            "bytes": len(self._entries) * self._entries.itemsize,
+            "build_ms": round(self._build_ms, 1)
+        }
+
+    def add(self, word: str):
+        ''' make a word added to the dictionary suggestible
+        '''
+        with self._lock:
+            # its entries are still there
+            if word in self._removed:
+                self._removed.discard(word)
+                return
+            i = self._n + len(self._added_words)
+            self._added_words.append(word)
+            for key in _delete_keys(word[:self._prefix_length].lower(), self._max_distance):
+                self._added.setdefault(key, []).append(i)
+
+    def remove(self, word: str):
+        ''' stop suggesting a word deleted from the dictionary
+        '''
+        with self._lock:
+            self._removed.add(word)
+
+    def _word(self, i: int) -> str:
+        if i < self._n:
+            return self._word_at(i)
+        return self._added_words[i - self._n]
+
+    def suggest(self, word: str, k: int = SUGGEST_TOPK) -> list[str]:
+        ''' up to k words nearest to word, by edit distance then length difference
+        '''
+        query = word.lower()
+        max_distance = min(self._max_distance, 1 if len(query) < SHORT_WORD else len(query))
+        entries = self._entries
+        size = len(entries)
+        seen: set[int] = set()
+        scored: list[tuple[int, int, str]] = []
+        # a word d edits away is found by d deletes at most on each side,
+        # so the next level can't bring anything nearer than d + 1
+        for distance, deletes in enumerate(_delete_levels(query[:self._prefix_length],
+                max_distance)):
+            candidates: set[int] = set()
+            for delete in deletes:
+                # only the words that lost no more than max_distance characters to it
+                key = (hash(delete) & _HASH_MASK) << _LEVEL_BITS
+                i = bisect_left(entries, key << _ID_BITS)
+                stop = (key | max_distance) + 1 << _ID_BITS
+                while i < size and entries[i] < stop:
+                    candidates.add(entries[i] & _ID_MASK)
+                    i += 1
+                if self._added:
+                    for level in range(max_distance + 1):
+                        candidates.update(self._added.get(key | level, ()))
+            candidates -= seen
+            seen |= candidates
+
+            for i in candidates:
+                candidate = self._word(i)
+                if candidate in self._removed:
+                    continue
+                found = edit_distance(query, candidate.lower(), max_distance)
+                if found <= max_distance:
+                    scored.append((found, abs(len(candidate) - len(word)), candidate))
+            if sum(1 for found, _, _ in scored if found <= distance) >= k:
+                break
+        return [candidate for _, _, candidate in heapq.nsmallest(k, scored)]
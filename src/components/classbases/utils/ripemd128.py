@@ -112,51 +112,56 @@ sp = [ 8, 9, 9,11,13,15,15, 5, 7, 7, 8,11,14,14,12, 6,
       15, 5, 8,11,14,14, 6,14, 6, 9,12, 9,12, 5,15, 8]
 
 
+# (r, s, r', s') of every step, one tuple of 16 steps per round
+_steps = tuple(tuple(zip(r[i:i+16], s[i:i+16], rp[i:i+16], sp[i:i+16])) for i in range(0, 64, 16))
+_block = struct.Struct("<16L")
+_M = 0xffffffff
+
+
 def ripemd128(message: bytes):
+    """ The message is padded once, each block is unpacked with one call
+        and the four rounds are unrolled, so f, K and Kp are inlined
+        instead of being dispatched on every step.
+    """
     h0 = 0x67452301
     h1 = 0xefcdab89
     h2 = 0x98badcfe
     h3 = 0x10325476
-    x: list[list[int]] = pad_split(message)
-    # print('X =', x)
-    x_len = len(x)
-    # print('x_len =', x_len)
-    for i in range(x_len):
+    message = bytes(message)
+    origlen = len(message)
+    pad_len = 64 - ((origlen - 56) % 64)
+    message += b"\x80" + b"\x00" * (pad_len - 1) + struct.pack("<Q", origlen * 8)
+    M = _M
+    round0, round1, round2, round3 = _steps
+    for x in _block.iter_unpack(message):
         a,  b,  c,  d = h0, h1, h2, h3
         ap, bp, cp, dp = h0, h1, h2, h3
-        for j in range(64):
-            sj = s[j]
-            # print('sj =', sj)
-            fj = f(j, b, c, d)
-            # print('fj =', fj)
-            xj = x[i][r[j]]
-            # print('xj =', xj)
-            kj = K(j)
-            # print('kj =', kj)
-            t = rol(sj, add(a, fj, xj, kj))
-            # print('T1 =', T)
-            a, d, c, b = d, c, b, t
-            t = rol(sp[j], add(ap, f(63-j, bp, cp, dp), x[i][rp[j]], Kp(j)))
-            # print('T2 =', T)
-            ap, dp, cp, bp = dp, cp, bp, t
-        # print('A =', a)
-        # print('Ap =', ap)
-        # print('B =', b)
-        # print('Bp =', bp)
-        # print('C =', c)
-        # print('Cp =', cp)
-        # print('D =', d)
-        # print('Dp =', dp)
-
-        t =  add(h1, c, dp)
-        h1 = add(h2, d, ap)
-        h2 = add(h3, a, bp)
-        h3 = add(h0, b, cp)
+        for rj, sj, rpj, spj in round0:
+            t = (a + (b ^ c ^ d) + x[rj]) & M
+            a, d, c, b = d, c, b, (t << sj | t >> (32 - sj)) & M
+            t = (ap + ((bp & dp) | (cp & ~dp)) + x[rpj] + 0x50a28be6) & M
+            ap, dp, cp, bp = dp, cp, bp, (t << spj | t >> (32 - spj)) & M
+        for rj, sj, rpj, spj in round1:
+            t = (a + ((b & c) | (d & ~b)) + x[rj] + 0x5a827999) & M
+            a, d, c, b = d, c, b, (t << sj | t >> (32 - sj)) & M
+            t = (ap + ((bp | (M & ~cp)) ^ dp) + x[rpj] + 0x5c4dd124) & M
+            ap, dp, cp, bp = dp, cp, bp, (t << spj | t >> (32 - spj)) & M
+        for rj, sj, rpj, spj in round2:
+            t = (a + ((b | (M & ~c)) ^ d) + x[rj] + 0x6ed9eba1) & M
+            a, d, c, b = d, c, b, (t << sj | t >> (32 - sj)) & M
+            t = (ap + ((bp & cp) | (dp & ~bp)) + x[rpj] + 0x6d703ef3) & M
+            ap, dp, cp, bp = dp, cp, bp, (t << spj | t >> (32 - spj)) & M
+        for rj, sj, rpj, spj in round3:
+            t = (a + ((b & d) | (c & ~d)) + x[rj] + 0x8f1bbcdc) & M
+            a, d, c, b = d, c, b, (t << sj | t >> (32 - sj)) & M
+            t = (ap + (bp ^ cp ^ dp) + x[rpj]) & M
+            ap, dp, cp, bp = dp, cp, bp, (t << spj | t >> (32 - spj)) & M
+
+        t =  (h1 + c + dp) & M
+        h1 = (h2 + d + ap) & M
+        h2 = (h3 + a + bp) & M
+        h3 = (h0 + b + cp) & M
         h0 = t
-    # print('h0 =', h0)
-    # print('h1 =', h1)
-    # print('h2 =', h2)
-    # print('h3 =', h3)
 
     return struct.pack("<LLLL", h0, h1, h2, h3)
 
@@ -1,9 +1,46 @@
 #!/usr/bin/python3
 # -*- coding: UTF-8 -*-
 import os
-import re
+import threading
+import time
+from bisect import bisect_left, insort
+from collections import Counter
+from collections.abc import Callable
+from itertools import chain, islice, zip_longest
 from zipfile import ZipFile, BadZipFile, LargeZipFile
 
+# open readers kept for reuse, more are opened while all of them are busy
+READER_POOL_SIZE = 4
+# added files are kept in memory and appended together, every append
+# rewrites the whole central directory. A batch is appended once it has this many files,
+BATCH_FILES = 64
+# or this many bytes,
+BATCH_BYTES = 4 * 1024 * 1024
+# or its first file has waited this long
+BATCH_SECONDS = 5.0
+# the tail of the archive an append overwrites, put back if the append doesn't finish
+JOURNAL_SUFFIX = ".journal"
+# deleted names, their files stay in the archive until it is compacted
+TOMBSTONE_SUFFIX = ".deleted"
+# the compacted archive while it is written
+COMPACT_SUFFIX = ".compact.tmp"
+# compacted in the background once this share of the files in the archive are
+# deleted or shadowed by a newer copy,
+COMPACT_DEAD_RATIO = 0.25
+# and at least this many
+COMPACT_MIN_DEAD = 64
+# after a compaction failed it isn't started again by adds and deletes for this long,
+# doubled by every further failure
+COMPACT_RETRY_SECONDS = 60.0
+COMPACT_RETRY_MAX_SECONDS = 24 * 3600.0
+# an open handle blocks replacing the archive on some systems, the reads
+# still running when it is swapped are waited for this many times
+SWAP_ATTEMPTS = 20
+
+
+class _CompactStopped(Exception):
+    pass
+
 
 class ZipArchive:
     '''
@@ -12,12 +49,54 @@ class ZipArchive:
         压缩模式有ZIP_STORED和ZIP_DEFLATED，ZIP_STORED只是存储模式，不会对文件进行压缩，
         这个是默认值，如果你需要对文件进行压缩，必须使用ZIP_DEFLATED模式
     '''
-    def __init__(self):
+    def __init__(self, on_change: Callable[[], object] | None = None):
         self._zipsrc: str = ""
+        # called after the archive changed on disk, by a batch or a compaction
+        self._on_change: Callable[[], object] | None = on_change
         self._compression: int = 0
         self._compresslevel: int = 0
 
-        self._file_list: list[str] = []
+        # the names, for membership
+        self._file_set: set[str] = set()
+        # the same names in sorted order, for neighbours and prefixes
+        self._sorted_names: list[str] = []
+
+        # readers parse the central directory once when opened, a read is then
+        # a seek and an inflate. Appending doesn't move what's already in the archive,
+        # so a reader only has to be replaced for the files added after it was opened
+        self._lock: threading.Lock = threading.Lock()
+        # appending, deleting, swapping in a compacted archive and opening a reader don't overlap
+        self._write_lock: threading.Lock = threading.Lock()
+        # bumped by every batch appended
+        self._generation: int = 0
+        # generation each file was added at
+        self._added: dict[str, int] = {}
+        # idle readers with the generation they were opened at
+        self._readers: list[tuple[int, ZipFile]] = []
+        # readers from before it are closed when they are put back
+        self._oldest: int = 0
+
+        # added files not appended yet, read from here until they are
+        self._pending: dict[str, bytes] = {}
+        self._pending_bytes: int = 0
+        self._timer: threading.Timer | None = None
+
+        # a name can be in the archive more than once, the last copy is read.
+        # A tombstone of n deletes the first n copies, a copy added later is alive again.
+        # Tombstones only count for the archive with the same comment, a compaction changes it
+        self._counts: Counter[str] = Counter()
+        self._tombstones: dict[str, int] = {}
+        self._token: str = ""
+        # files in the archive, and those of them deleted or shadowed
+        self._members: int = 0
+        self._dead: int = 0
+
+        self._compactor: threading.Thread | None = None
+        self._stop_compact: threading.Event = threading.Event()
+        self._compaction: dict[str, int | float | str] = {"state": "idle"}
+        # no automatic compaction before this, after a failure
+        self._compact_after: float = 0.0
+        self._compact_backoff: float = COMPACT_RETRY_SECONDS
 
     def _create_empty_zip_if_not_exists(self, zip_path: str):
         zip_dir = os.path.dirname(zip_path)
@@ -31,38 +110,417 @@ class ZipArchive:
     def open(self, zipsrc: str) -> tuple[int, str]:
         self._zipsrc = zipsrc
         self._create_empty_zip_if_not_exists(self._zipsrc)
+        self._rollback()
+        # a compaction that didn't finish
+        if os.path.exists(self._zipsrc + COMPACT_SUFFIX):
+            os.remove(self._zipsrc + COMPACT_SUFFIX)
+        self._stop_compact.clear()
         try:
             with ZipFile(self._zipsrc, 'r') as zipf:
-                self._file_list = zipf.namelist()
+                names = zipf.namelist()
+                self._token = zipf.comment.decode("utf-8", "replace")
         except (BadZipFile, LargeZipFile) as reason:
             return -1, str(reason)
+        self._counts = Counter(names)
+        self._tombstones = self._read_tombstones()
+        self._file_set = {name for name in self._counts if self._on_disk(name)}
+        self._sorted_names = sorted(self._file_set)
+        self._members = len(names)
+        self._dead = self._members - len(self._file_set)
         return 1, ""
 
     def close(self) -> bool:
-        return True
+        self._stop_compact.set()
+        if self._compactor is not None:
+            self._compactor.join()
+        ret = self.flush()
+        with self._lock:
+            if self._timer is not None:
+                self._timer.cancel()
+                self._timer = None
+            self._oldest = self._generation + 1
+            readers = self._readers
+            self._readers = []
+        for _, reader in readers:
+            reader.close()
+        return ret
+
+    def _get_reader(self, filename: str) -> tuple[int, ZipFile]:
+        with self._lock:
+            needed = self._added.get(filename, 0)
+            for i in range(len(self._readers) - 1, -1, -1):
+                if self._readers[i][0] >= needed:
+                    return self._readers.pop(i)
+        with self._write_lock:
+            return self._generation, ZipFile(self._zipsrc, 'r')
+
+    def _put_reader(self, generation: int, reader: ZipFile):
+        with self._lock:
+            if generation >= self._oldest:
+                self._readers.append((generation, reader))
+                self._readers.sort(key=lambda item: item[0])
+                if len(self._readers) <= READER_POOL_SIZE:
+                    return
+                # the one opened first knows the fewest files
+                _, reader = self._readers.pop(0)
+        reader.close()
+
+    def _on_disk(self, filename: str) -> bool:
+        # its last copy in the archive isn't deleted, under the lock
+        return self._counts[filename] > self._tombstones.get(filename, 0)
 
     def add_file(self, filename: str, data: bytes | str) -> bool:
-        with ZipFile(self._zipsrc, 'a') as zipf:
-            zipf.writestr(filename, data)
-        self._file_list.append(filename)
+        ''' readable at once, appended to the archive with the next batch
+        '''
+        if isinstance(data, str):
+            data = data.encode("utf-8")
+        with self._lock:
+            old = self._pending.get(filename)
+            if old is not None:
+                self._pending_bytes -= len(old)
+            self._pending[filename] = data
+            self._pending_bytes += len(data)
+            # added again, the newest copy is read
+            if filename not in self._file_set:
+                self._file_set.add(filename)
+                insort(self._sorted_names, filename)
+            full = len(self._pending) >= BATCH_FILES or self._pending_bytes >= BATCH_BYTES
+            if not full and self._timer is None:
+                self._timer = threading.Timer(BATCH_SECONDS, self.flush)
+                self._timer.daemon = True
+                self._timer.start()
+        if full:
+            return self.flush()
+        return True
+
+    def flush(self) -> bool:
+        ''' append the pending files to the archive with one rewrite of the central directory,
+            on_change is called once nothing is left pending
+        '''
+        with self._write_lock:
+            with self._lock:
+                if self._timer is not None:
+                    self._timer.cancel()
+                    self._timer = None
+                batch = dict(self._pending)
+            if not batch:
+                return True
+            if not self._append(batch):
+                return False
+        with self._lock:
+            # added to again meanwhile, on_change waits for that batch
+            settled = not self._pending
+        if settled and self._on_change is not None:
+            _ = self._on_change()
+        self._check_compact()
+        return True
+
+    def _append(self, batch: dict[str, bytes]) -> bool:
+        # under the write lock
+        try:
+            with ZipFile(self._zipsrc, 'a') as zipf:
+                # where the new files start, over the old central directory
+                self._write_journal(zipf.start_dir)
+                for filename, data in batch.items():
+                    zipf.writestr(filename, data)
+            with open(self._zipsrc, 'r+b') as f:
+                os.fsync(f.fileno())
+            os.remove(self._zipsrc + JOURNAL_SUFFIX)
+        except (OSError, BadZipFile, LargeZipFile) as e:
+            print(f"Fail to append {len(batch)} files to {self._zipsrc}: {e}")
+            self._rollback()
+            # still pending, tried again with the next batch
+            return False
+        with self._lock:
+            self._generation += 1
+            for filename, data in batch.items():
+                self._added[filename] = self._generation
+                # the copy it shadows
+                if self._on_disk(filename):
+                    self._dead += 1
+                self._counts[filename] += 1
+                # unless it was added again meanwhile
+                if self._pending.get(filename) is data:
+                    del self._pending[filename]
+                    self._pending_bytes -= len(data)
+            self._members += len(batch)
         return True
 
+    def _write_journal(self, offset: int):
+        # the tail from offset, written aside and synced before the archive is touched
+        journal = self._zipsrc + JOURNAL_SUFFIX
+        with open(self._zipsrc, 'rb') as f:
+            _ = f.seek(offset)
+            tail = f.read()
+        with open(journal + ".tmp", 'wb') as f:
+            _ = f.write(offset.to_bytes(8, "little"))
+            _ = f.write(tail)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(journal + ".tmp", journal)
+
+    def _rollback(self):
+        ''' put back the tail of the archive an unfinished append overwrote
+        '''
+        journal = self._zipsrc + JOURNAL_SUFFIX
+        if not os.path.exists(journal):
+            return
+        with open(journal, 'rb') as f:
+            offset = int.from_bytes(f.read(8), "little")
+            tail = f.read()
+        with open(self._zipsrc, 'r+b') as f:
+            _ = f.seek(offset)
+            _ = f.write(tail)
+            _ = f.truncate()
+            f.flush()
+            os.fsync(f.fileno())
+        os.remove(journal)
+        print(f"rolled back an unfinished append to {self._zipsrc}")
+
     def read_file(self, filename: str) -> bytes:
-        with ZipFile(self._zipsrc, 'r') as zipf:
-            file_: bytes = zipf.read(filename)
+        with self._lock:
+            if filename not in self._file_set:
+                raise KeyError(f"There is no item named {filename!r} in the archive")
+            pending = self._pending.get(filename)
+        if pending is not None:
+            return pending
+        generation, reader = self._get_reader(filename)
+        try:
+            file_: bytes = reader.read(filename)
+        finally:
+            self._put_reader(generation, reader)
         return file_
 
     def has_file(self, filename: str) -> bool:
-        return filename in self._file_list
+        return filename in self._file_set
+
+    def neighbours(self, filename: str, n: int, suffix: str = "") -> list[str]:
+        ''' up to n names ending with suffix after filename and n before it,
+            in name order, nearest first, alternating from the next one
+        '''
+        # add_file() and del_file() change the list under the lock, the scan stops after n names
+        with self._lock:
+            names = self._sorted_names
+            j = bisect_left(names, filename)
+            strt = j + 1 if j < len(names) and names[j] == filename else j
+            after = (names[i] for i in range(strt, len(names)) if names[i].endswith(suffix))
+            before = (names[i] for i in range(j - 1, -1, -1) if names[i].endswith(suffix))
+            found_after = list(islice(after, n))
+            found_before = list(islice(before, n))
+        pairs = zip_longest(found_after, found_before)
+        return [name for name in chain.from_iterable(pairs) if name is not None]
 
-    def search_file(self, pattern: str, wdmatch_lst: list[str]) -> int:
-        regex = re.compile(pattern)
-        for word in self._file_list:
-            # gLogger.info(word)
-            match = regex.search(word)
-            if match:
-                wdmatch_lst.append(word)
-        return len(wdmatch_lst)
+    def prefix_names(self, prefix: str, limit: int, suffix: str = "") -> list[str]:
+        ''' up to limit names starting with prefix and ending with suffix, in name order
+        '''
+        found: list[str] = []
+        with self._lock:
+            names = self._sorted_names
+            i = bisect_left(names, prefix)
+            while i < len(names) and len(found) < limit and names[i].startswith(prefix):
+                if names[i].endswith(suffix):
+                    found.append(names[i])
+                i += 1
+        return found
+
+    def names(self, suffix: str = "") -> list[str]:
+        ''' names ending with suffix, in name order
+        '''
+        with self._lock:
+            names = list(self._sorted_names)
+        return [name for name in names if name.endswith(suffix)]
 
     def del_file(self, filename: str) -> bool:
-        raise NotImplementedError("don't support to delete file: " + filename)
+        ''' gone at once, its copies stay in the archive under a tombstone until it is compacted
+        '''
+        with self._write_lock, self._lock:
+            if filename not in self._file_set:
+                return False
+            pending = self._pending.pop(filename, None)
+            if pending is not None:
+                self._pending_bytes -= len(pending)
+            if self._on_disk(filename):
+                count = self._counts[filename]
+                with open(self._zipsrc + TOMBSTONE_SUFFIX, "a", encoding="utf-8") as f:
+                    _ = f.write(self._tombstone_line(self._token, filename, count))
+                    f.flush()
+                    os.fsync(f.fileno())
+                self._tombstones[filename] = count
+                self._dead += 1
+            self._file_set.discard(filename)
+            del self._sorted_names[bisect_left(self._sorted_names, filename)]
+        self._check_compact()
+        return True
+
+    def _tombstone_line(self, token: str, filename: str, count: int) -> str:
+        return f"{token}\t{count}\t{filename}\n"
+
+    def _read_tombstones(self) -> dict[str, int]:
+        tombstones: dict[str, int] = {}
+        try:
+            with open(self._zipsrc + TOMBSTONE_SUFFIX, "r", encoding="utf-8") as f:
+                for line in f:
+                    parts = line.split("\t", 2)
+                    # cut short by a crash, or for the archive before it was compacted
+                    if not line.endswith("\n") or len(parts) != 3 or parts[0] != self._token:
+                        continue
+                    filename = parts[2][:-1]
+                    tombstones[filename] = max(int(parts[1]), tombstones.get(filename, 0))
+        except FileNotFoundError:
+            pass
+        return tombstones
+
+    def _write_tombstones(self, lines: list[str]):
+        path = self._zipsrc + TOMBSTONE_SUFFIX
+        if not lines:
+            if os.path.exists(path):
+                os.remove(path)
+            return
+        with open(path + ".tmp", "w", encoding="utf-8") as f:
+            f.writelines(lines)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(path + ".tmp", path)
+
+    @property
+    def compact_stats(self) -> dict[str, int | float | str]:
+        ''' the files in the archive, how many of them are dead,
+            and the progress or the outcome of the last compaction
+        '''
+        with self._lock:
+            return {"files": self._members, "dead": self._dead, **self._compaction}
+
+    def _check_compact(self):
+        with self._lock:
+            due = (self._dead >= COMPACT_MIN_DEAD and self._dead >= self._members * COMPACT_DEAD_RATIO
+                and time.monotonic() >= self._compact_after)
+        if due:
+            _ = self.compact()
+
+    def compact(self) -> bool:
+        ''' rewrite the archive without its dead files in the background,
+            False if it is being compacted already or closing
+        '''
+        with self._lock:
+            if self._stop_compact.is_set() or (self._compactor is not None
+                    and self._compactor.is_alive()):
+                return False
+            self._compaction = {"state": "running", "copied": 0, "total": 0}
+            self._compactor = threading.Thread(target=self._compact, daemon=True,
+                name="compact-" + os.path.basename(self._zipsrc))
+            self._compactor.start()
+        return True
+
+    def _compact(self):
+        strt = time.perf_counter()
+        before = os.path.getsize(self._zipsrc)
+        tmp = self._zipsrc + COMPACT_SUFFIX
+        token = f"compacted {time.time_ns()}"
+        _ = self.flush()
+        with self._lock:
+            generation = self._generation
+            # the live files now, those appended or deleted meanwhile are caught up at the swap
+            names = sorted(name for name in self._file_set if self._on_disk(name))
+            self._compaction["total"] = len(names)
+        try:
+            with ZipFile(tmp, 'w') as dst:
+                dst.comment = token.encode("utf-8")
+                # a reader of its own, the copy doesn't hold up the lookups. Opened like
+                # _get_reader() does, not while a batch is rewriting the central directory
+                with self._write_lock:
+                    src = ZipFile(self._zipsrc, 'r')
+                with src:
+                    for i, filename in enumerate(names):
+                        if self._stop_compact.is_set():
+                            raise _CompactStopped("closing")
+                        # its last copy, as it was stored
+                        dst.writestr(src.getinfo(filename), src.read(filename))
+                        if i % 1000 == 0:
+                            with self._lock:
+                                self._compaction["copied"] = i
+                with self._write_lock:
+                    self._swap(dst, tmp, token, generation)
+        # whatever went wrong, the state leaves "running" and tmp goes, or it is never compacted again
+        except Exception as e:
+            try:
+                os.remove(tmp)
+            except FileNotFoundError:
+                pass
+            state = "stopped" if isinstance(e, _CompactStopped) else "failed"
+            print(f"compaction of {self._zipsrc} {state}: {e}")
+            with self._lock:
+                self._compaction["state"] = state
+                if state == "failed":
+                    # not retried by every add or delete, it would most likely fail the same way
+                    self._compaction["error"] = str(e)
+                    self._compact_after = time.monotonic() + self._compact_backoff
+                    self._compact_backoff = min(self._compact_backoff * 2, COMPACT_RETRY_MAX_SECONDS)
+            return
+
+        after = os.path.getsize(self._zipsrc)
+        ms = round((time.perf_counter() - strt) * 1000, 1)
+        print(f"compacted {self._zipsrc} from {before} to {after} bytes in {ms} ms")
+        with self._lock:
+            self._compaction = {"state": "done", "copied": len(names), "total": len(names),
+                "before": before, "after": after, "ms": ms}
+            self._compact_after = 0.0
+            self._compact_backoff = COMPACT_RETRY_SECONDS
+        if self._on_change is not None:
+            _ = self._on_change()
+
+    def _swap(self, dst: ZipFile, tmp: str, token: str, generation: int):
+        # under the write lock, nothing is appended or deleted until the compacted archive is in place.
+        # The files appended since the copy started
+        with self._lock:
+            appended = sorted(name for name, added in self._added.items() if added > generation)
+        if appended:
+            with ZipFile(self._zipsrc, 'r') as src:
+                for filename in appended:
+                    dst.writestr(src.getinfo(filename), src.read(filename))
+        counts = Counter(dst.namelist())
+        dst.close()
+        with open(tmp, 'r+b') as f:
+            os.fsync(f.fileno())
+
+        with self._lock:
+            # deleted since the copy started
+            tombstones = {name: count for name, count in counts.items() if not self._on_disk(name)}
+            old_lines = [self._tombstone_line(self._token, name, count)
+                for name, count in self._tombstones.items()]
+        new_lines = [self._tombstone_line(token, name, count) for name, count in tombstones.items()]
+        # right for whichever of the archives is there if the swap is cut short
+        self._write_tombstones(old_lines + new_lines)
+
+        # the readers of the old archive are closed before it is replaced, those still
+        # reading are closed when they are put back. No new one is opened under the write lock
+        with self._lock:
+            self._generation += 1
+            self._oldest = self._generation
+            readers = self._readers
+            self._readers = []
+        for _, reader in readers:
+            reader.close()
+        try:
+            self._replace(tmp)
+        except Exception:
+            self._write_tombstones(old_lines)
+            raise
+        self._write_tombstones(new_lines)
+
+        with self._lock:
+            self._token = token
+            self._counts = counts
+            self._tombstones = tombstones
+            self._members = sum(counts.values())
+            self._dead = self._members - (len(counts) - len(tombstones))
+            self._added.clear()
+
+    def _replace(self, tmp: str):
+        for attempt in range(SWAP_ATTEMPTS):
+            try:
+                os.replace(tmp, self._zipsrc)
+                return
+            except PermissionError:
+                if attempt == SWAP_ATTEMPTS - 1:
+                    raise
+                time.sleep(0.05)
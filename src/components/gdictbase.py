@@ -8,17 +8,74 @@ from html import unescape
 import codecs
 import re
 import zipfile
+from collections.abc import Callable
 from typing import override, Any
 
 from src.components.classbases.dictbase import DictBase
 from src.components.classbases.ziparchive import ZipArchive
 
 
+def _head(out: list[str], strt: int) -> str:
+    ''' the first character appended to out from strt on, "" if nothing was
+    '''
+    for i in range(strt, len(out)):
+        if out[i]:
+            return out[i][0]
+    return ""
+
+
+def _tail(out: list[str], strt: int, n: int) -> str:
+    ''' the last n characters appended to out from strt on, fewer if there aren't so many
+    '''
+    tail = ""
+    i = len(out)
+    while len(tail) < n and i > strt:
+        i -= 1
+        tail = out[i] + tail
+    return tail[-n:]
+
+
+class GDictEntry:
+    ''' an entry of the google dictionary, {"ok": true, "info": "<json of the primaries>"},
+        parsed once for both the word check and the page
+    '''
+    def __init__(self, dictjson: str):
+        data: dict[str, Any] = json.loads(dictjson, strict=False)
+        self._ok: bool = bool(data["ok"])
+        self._primaries: list[Any] = []
+        if self._ok:
+            info: str = data["info"]
+            try:
+                # the \xhh escapes in info aren't json
+                obj = json.loads(info.replace("\\x", "\\u00"), strict=True)
+            except json.JSONDecodeError:
+                # how the word used to be checked, every backslash kept as it is
+                obj = json.loads(info.replace('\\', '\\\\'), strict=True)
+            self._primaries = obj["primaries"]
+
+    @property
+    def ok(self) -> bool:
+        return self._ok
+
+    @property
+    def primaries(self) -> list[Any]:
+        return self._primaries
+
+    @property
+    def inword(self) -> str:
+        ''' the headword, "" if the entry isn't ok
+        '''
+        if not self._ok:
+            return ""
+        return self._primaries[0]["terms"][0]["text"]
+
+
 class GDictBase(DictBase):
     # TODO: autodetect zip format
     def __init__(self):
         super().__init__()
-        self._dictzip: ZipArchive = ZipArchive()
+        # the manifest follows the zip as it is appended to and compacted
+        self._dictzip: ZipArchive = ZipArchive(on_change=self._source_changed)
 
     def _extract_all_zip(self, zip_path: str, target_dir: str) -> None:
         """
@@ -77,8 +134,8 @@ class GDictBase(DictBase):
 
     @override
     def query_word(self, word: str) -> tuple[int, str]:
-        htmlfile = os.path.join(self._tempdir, word + ".html")
-        if os.path.isfile(htmlfile):
+        htmlfile = self._find_page(word + ".html")
+        if htmlfile:
             return 1, htmlfile
 
         dictjson = ""
@@ -95,169 +152,103 @@ class GDictBase(DictBase):
             msg = f"no word '{word}' in '{self._name}'"
             return -1, msg
 
-        if dictjson:
-            inword = self._get_inword(dictjson)
-
-            if inword:
-                if inword != word:
-                    msg = f"word '{word}', wrong word '{inword}' in '{self._name}'"
-                    return -1, msg
-            else:
-                msg = f"no word '{word}' in '{self._name}'"
-                return -1, msg
-
-        else:
+        if not dictjson:
             msg = f"Fail to read json '{word}' in '{self._name}'"
             return -1, msg
 
-        # print("%s = %s" %(word, dict))
-
-        if dictjson:
-            dictdata: dict[str, Any] = json.loads(dictjson, strict=False)
-            if dictdata["ok"]:
-                info = dictdata["info"]
-                ret = self._parse_json(info, htmlfile)
-                # print("%s = %s" %(word, dict))
-                if ret:
-                    return 1, htmlfile
-                return -1, f"Fail to parse '{word}' in '{self._name}'"
-        else:
-            msg = f"Fail to read word '{word}' in '{self._name}'"
+        entry = GDictEntry(dictjson)
+        inword = entry.inword
+        if not inword:
+            msg = f"no word '{word}' in '{self._name}'"
+            return -1, msg
+        if inword != word:
+            msg = f"word '{word}', wrong word '{inword}' in '{self._name}'"
             return -1, msg
 
-        msg = "Unknown error!"
-        return -1, msg
-
-    def _get_inword(self, dictjson: str) -> str:
-
-        data: dict[str, Any] = json.loads(dictjson, strict = False)
+        htmlfile = self._render_entry(entry, word + ".html")
+        # print("%s = %s" %(word, dict))
+        if htmlfile:
+            return 1, htmlfile
+        return -1, f"Fail to parse '{word}' in '{self._name}'"
 
-        if data["ok"]:
-            info: str = data["info"]
-            # print(info)
-            # GetApp().log("info", info)
-            # regex = re.compile(r'\\(?![/u"])')
-            # info_fixed = regex.sub(r"\\\\", info)
-            # GetApp().log("info", info_fixed)
-            # data = json.loads(info_fixed, strict = False)
-            # info = info.replace('\\"', '"')
-            # info = info.replace('/', '')
-            info = info.replace('\\', '\\\\')
-            data = json.loads(info, strict = True)
-            return data["primaries"][0]["terms"][0]["text"]
-
-        return ""
-
-    def _process_primary(self, tabalign: str, dict_primary: Any) -> str:
-        primary = dict_primary
-        xml: str = ""
-        html: str = ""
-        is_meaning = False
+    def _render_primary(self, out: list[str], tabalign: str, primary: Any):
+        ''' append the html of primary to out, a node only looks at what it appended itself
+        '''
         if isinstance(primary, list):
             for data in primary:
-                html = self._process_primary(tabalign, data)
-                # console.log("html1: " + html + "")
-                if html[0] == "<":
-                    xml += "\n" + tabalign
-                xml += html
+                if isinstance(data, dict) and "type" in data:
+                    # starts with tabalign, never with a tag
+                    self._render_primary(out, tabalign, data)
+                else:
+                    self._render_child(out, "\n" + tabalign, tabalign, data)
         elif isinstance(primary, dict):
-            # let hasChild = false
-            # let hastyp = false
             if "type" in primary:
-                # hastyp = True
-                if primary["type"] == "container":
-                    # print(primary)
-                    xml += f'{tabalign}<div class = "wordtyp">{primary["labels"][0]["text"]}: </div>\n'
-                    xml += tabalign + "<div class = '" + primary["type"] + "1'>\n"
+                strt = len(out)
+                typ = primary["type"]
+                if typ == "container":
+                    out.append(f'{tabalign}<div class = "wordtyp">{primary["labels"][0]["text"]}: </div>\n')
+                    out.append(tabalign + "<div class = '" + typ + "1'>\n")
                     tabalign += "\t"
                     entries = primary["entries"]
-                    html = self._process_terms(tabalign, entries[0]["terms"], entries[0]["type"])
-                    if html[0] == "<":
-                        xml += "\n" + tabalign
-                    xml += html
+                    terms, terms_typ = entries[0]["terms"], entries[0]["type"]
+                elif "labels" in primary:
+                    out.append(f"{tabalign}<div class = '{typ}'>")
+                    tabalign += "\t"
+                    out.append(f"\n{tabalign}<div class = 'labels'>{primary['labels'][0]['text']}</div>")
+                    terms, terms_typ = primary["terms"], typ
                 else:
-                    if "labels" in primary:
-                        # if(xml.substr(-1, 1) == ">"){
-                        # xml += "\n"
-                        # }
-                        xml += f"{tabalign}<div class = '{primary["type"]}'>"
-                        tabalign += "\t"
-                        xml += f"\n{tabalign}<div class = 'labels'>{primary['labels'][0]['text']}</div>"
-                        html = self._process_terms(tabalign, primary["terms"], primary["type"])
-                        if html[0] == "<":
-                            xml += "\n" + tabalign
-                        xml += html
-                    else:
-                        if primary["type"] == "meaning":
-                            is_meaning = True
-                        if primary["type"] == "example" and is_meaning:
-                            xml += "\n"
-                            is_meaning = False
-                        xml += f"{tabalign}<div class = '{primary["type"]}'>"
-                        tabalign += "\t"
-                        html = self._process_terms(tabalign, primary["terms"], primary["type"])
-                        if html[0] == "<":
-                            xml += "\n" + tabalign
-                        # console.log("html4: " + html + "")
-                        xml += html
+                    out.append(f"{tabalign}<div class = '{typ}'>")
+                    tabalign += "\t"
+                    terms, terms_typ = primary["terms"], typ
+                # a slot for the line break, if the terms start with a tag
+                slot = len(out)
+                out.append("")
+                self._render_terms(out, tabalign, terms, terms_typ)
+                head = out[slot + 1] if slot + 1 < len(out) else ""
+                if (head[0] if head else _head(out, slot + 1)) == "<":
+                    out[slot] = "\n" + tabalign
                 if "entries" in primary:
-                    html = self._process_primary(tabalign, primary["entries"])
-                    # console.log("html: " + html + "")
-                    # console.log("xml: " + xml + "")
-                    # console.log("html2: " + html + "")
-                    if html[0] == "<":
-                        xml += "\n" + tabalign + "Q: "
-                    xml += html
-                # xml += tabalign + "</div>\n"
+                    entries = primary["entries"]
+                    if isinstance(entries, list) and entries and isinstance(entries[0], dict) \
+                            and "type" in entries[0]:
+                        self._render_primary(out, tabalign, entries)
+                    else:
+                        self._render_child(out, "\n" + tabalign + "Q: ", tabalign, entries)
                 tabalign = tabalign[0]
-                # console.log(xml.substr(-3, 3))
-                if xml[-3] == ">":
-                    xml += tabalign
-                if xml[-1] == ">":
-                    xml += "\n" + tabalign
-                xml += "</div>\n"
-                # tabalign = tabalign.slice(0, -2)
+                # the end of this node's html so far
+                tail = out[-1]
+                if len(tail) < 3:
+                    tail = _tail(out, strt, 3)
+                if tail[-3] == ">":
+                    out.append(tabalign)
+                elif tail[-1] == ">":
+                    out.append("\n" + tabalign)
+                out.append("</div>\n")
         elif isinstance(primary, str):
-            html = self._process_primary(tabalign, json.loads(primary, strict=False))
-            # console.log("html3: " + html + "")
-            xml += html
-        return xml
-
-    def _process_terms(self, tabalign: str, dict_terms: Any, typ: str) -> str:
-        terms = dict_terms
-        xml: str = ""
-        html: str = ""
+            self._render_primary(out, tabalign, json.loads(primary, strict=False))
+
+    def _render_child(self, out: list[str], prefix: str, tabalign: str, primary: Any):
+        # prefix goes before the child's html if it starts with a tag,
+        # into a slot kept for it until the child is rendered
+        slot = len(out)
+        out.append("")
+        self._render_primary(out, tabalign, primary)
+        if _head(out, slot + 1) == "<":
+            out[slot] = prefix
+
+    def _render_terms(self, out: list[str], tabalign: str, terms: Any, typ: str):
         if isinstance(terms, list):
             for data in terms:
-                # data = terms[i]
-                html = self._process_terms(tabalign, data, typ)
-                # if(html.slice(0,1) == "<"){
-                # xml += "\n" + tabalign
-                # }
-                xml += html
+                self._render_terms(out, tabalign, data, typ)
         elif isinstance(terms, dict):
-            # let hastyp = false
             if "type" in terms:
-                # hastyp = True
                 if terms["type"] != "text" or typ == "headword" or typ == "related":
                     if terms["type"] == "sound":
-                        '''xml += '<div class="'+ terms["type"] + '">'
-                        # xml += terms["text"] +"</div>"
-                        xml += '<embed typ="application/x-shockwave-flash" src="SpeakerApp16.swf"' +
-                            'width="20" height="20" id="movie28564" name="movie28564" bgcolor="#000000"' +
-                            'quality="high" flashlets="sound_name='+ terms["text"] + '"wmode="transparent">'
-                        xml += "</div>"'''
-                        # alert(terms["text"])
-                        xml += self._get_sound(tabalign, terms["text"])
+                        out.append(self._get_sound(tabalign, terms["text"]))
                     else:
-                        # console.log("P: " + xml)
-                        # if(xml.substr(-1, 1) == ">"){
-                        # xml += "\n" + tabalign
-                        # }
-                        xml += f"\n{tabalign}<div class = '{terms["type"]}'>{terms['text']}</div>"
+                        out.append(f"\n{tabalign}<div class = '{terms["type"]}'>{terms['text']}</div>")
                 else:
-                    xml += f"{terms["text"]}"
-        return xml
+                    out.append(f"{terms["text"]}")
 
     '''
     def process_term(dict_terms: Any) str:
@@ -300,15 +291,11 @@ class GDictBase(DictBase):
             '</div>'
         return sound
 
-    def _parse_json(self, json_str: str, htmlfile: str) -> bool:
-        # regex = re.compile(r'\\(?![/u"])')
-        # info_fixed = regex.sub(r"\\\\", info)
-        # dict = info_fixed
-        # info = str(info).replace(/\\x/g, "\\u00")
-        jsonstr = json_str.replace("\\x", "\\u00")
-        obj = json.loads(jsonstr, strict = True)
+    def _render_entry(self, entry: GDictEntry, pagename: str) -> str:
         tabalign = '\t\t'
-        dictdata = self._process_primary(tabalign, obj["primaries"])
+        out: list[str] = []
+        self._render_primary(out, tabalign, entry.primaries)
+        dictdata = "".join(out)
         # dictdata = unescape(dictdata.replace("\\", "&#"))
         # dictdat_bytes = dictdata.encode('utf-8', errors='replace')
         # print(f"dictdata = {dictdata}")
@@ -325,9 +312,7 @@ class GDictBase(DictBase):
         js += tabalign + f"<script src='{jsname}'></script>"
         togeg = tabalign + '<div id="toggle_example" align="right">- Hide Examples</div>'
         html = f"<!DOCTYPE html>\n<html>\n\t<body>\n{css}\n{js}\n{togeg}\n{dictdata}\n\t</body>\n</html>"
-        with open(htmlfile, 'w', encoding="UTF-8") as f:
-            _ = f.write(html)
-        return True
+        return self.store_page(pagename, html)
 
     @override
     def check_addword(self, localfile: str) -> tuple[int, str]:
@@ -337,13 +322,18 @@ class GDictBase(DictBase):
         if os.path.isfile(localfile):
             with open(localfile, "r", encoding="utf-8") as f:
                 dictjson = f.read()
-                inword = self._get_inword(dictjson)
+                inword = GDictEntry(dictjson).inword
 
                 # os.remove(localfile)
 
                 if inword != "":
                     if inword == word:
+                        # before add_file(), which may append the batch and restore the manifest
+                        self._source_changing()
                         _ = self._dictzip.add_file(filename, dictjson)
+                        self._forget_page(word + ".html")
+                        self._forget_page(word + "-error.html")
+                        self._add_headword(word)
                         return 1, f"OK to add '{basename}' to {self._name}.zip"
                     return 0, f"expected word '{word}', inword '{inword}'"
                 return -1, f"No valid data in {localfile}"
@@ -351,21 +341,32 @@ class GDictBase(DictBase):
         return -1, f"No file {localfile}"
 
     @override
-    def get_wordlist(self, word: str, limit: int = 100):
-        word_list: list[str] = []
-        # filename = word[0] + "/" + word + ".*\.json"
-        pattern = "^" + word + ".*"
-        # print("Going to find: " + fileName)
-        _ = self._dictzip.search_file(pattern, word_list)
+    def _neighbours(self, word: str, n: int) -> list[str]:
+        filename = word[0].lower() + "/" + word + ".json"
+        return [name[2: -5] for name in self._dictzip.neighbours(filename, n, ".json")]
 
-        for i in range(len(word_list)):
-            word_list[i] = word_list[i][2: -5]
-            if i > limit:
-                break
+    @override
+    def _headwords(self) -> tuple[int, Callable[[int], str]]:
+        words = [name[2: -5] for name in self._dictzip.names(".json")]
+        return len(words), words.__getitem__
 
-        return word_list
+    @override
+    def get_wordlist(self, word: str, limit: int = 100):
+        # stored as w/word.json
+        prefix = word[0].lower() + "/" + word if word else ""
+        return [name[2: -5] for name in self._dictzip.prefix_names(prefix, limit, ".json")]
 
     @override
     def del_word(self, word: str) -> bool:
-        filename = word[0] + "/" + word + ".json"
-        return self._dictzip.del_file(filename)
+        filename = word[0].lower() + "/" + word + ".json"
+        if not self._dictzip.del_file(filename):
+            return False
+        self._forget_page(word + ".html")
+        self._forget_page(word + "-error.html")
+        self._remove_headword(word)
+        return True
+
+    @property
+    @override
+    def storage_stats(self) -> dict[str, int | float | str] | None:
+        return {**self._dictzip.compact_stats, **self._output_stats()}
@@ -4,11 +4,14 @@
 haha
 """
 import os
-import re
+from collections.abc import Callable
+from concurrent.futures import ThreadPoolExecutor
 from typing import override
 
 from src.components.classbases.dictbase import DictBase
+from src.components.classbases.lrucache import LRUCache
 from src.components.classbases.mdpackage import MdPackage
+from src.components.classbases.mergedindex import MergedIndex
 
 # def _unescape_entities(text):
     # """
@@ -21,69 +24,162 @@ from src.components.classbases.mdpackage import MdPackage
     # return text
 
 
+# a record that only redirects to another headword
+LINK_PREFIX = "@@@LINK="
+# redirected words whose canonical entry is remembered
+LINK_CACHE_ENTRIES = 65536
+# resource names whose mdd is remembered
+RESOURCE_CACHE_ENTRIES = 65536
+
+
 class MDictBase(DictBase):
-    def __init__(self, password: tuple[bytes, str] | None = None):
+    def __init__(self, password: tuple[bytes, str] | None = None, cache_mb: float = 0,
+            use_mmap: bool = False, workers: int = 1):
         super().__init__()
         self._password: tuple[bytes, str] | None = None
+        # the main volume first, then the supplements
+        self._mdx_list: list[MdPackage] = []
+        self._mdx_index: MergedIndex[MdPackage] = MergedIndex([])
         self._mdd_list: list[MdPackage] = []
+        self._mdd_index: MergedIndex[MdPackage] = MergedIndex([])
+        # resource name -> (mdd, position), (-1, -1) if no mdd has it
+        self._resource_map: LRUCache[str, tuple[int, int]] = LRUCache(RESOURCE_CACHE_ENTRIES,
+            sizeof=lambda _: 1)
+        # redirected word -> (volume, position) of its canonical entry
+        self._link_cache: LRUCache[str, tuple[int, int]] = LRUCache(LINK_CACHE_ENTRIES,
+            sizeof=lambda _: 1)
+        # decompressed record blocks shared by the mdx and mdd of this dict
+        self._block_cache: LRUCache[tuple[str, int], bytes | memoryview] | None = None
+        if cache_mb > 0:
+            self._block_cache = LRUCache(int(cache_mb * 1024 * 1024))
+        self._use_mmap: bool = use_mmap
+        # threads to decompress blocks with while building the indexes
+        self._workers: int = workers
 
     @override
     def open(self, name: str, src: str) -> tuple[int, str]:
         _ = super().open(name, src)
         with os.scandir(self._src) as entries:
-            for entry in entries:
+            # the main volume has the shortest name, e.g. Oxford.mdx before Oxford.1.mdx
+            for entry in sorted(entries, key=lambda entry: (len(entry.name), entry.name)):
                 if entry.is_file():
                     # print(f'File: {entry.path}')
                     _, file_extension = os.path.splitext(entry.name)
                     if file_extension == ".mdx":
-                        self._mdx: MdPackage = MdPackage(entry.path, False, "", self._password)
+                        mdx = MdPackage(entry.path, False, "", self._password,
+                            block_cache=self._block_cache, use_mmap=self._use_mmap)
+                        self._mdx_list.append(mdx)
                     elif file_extension == ".mdd":
-                       mdd = MdPackage(entry.path, True, "UTF-16", self._password)
+                       mdd = MdPackage(entry.path, True, "UTF-16", self._password,
+                           block_cache=self._block_cache, use_mmap=self._use_mmap)
                        self._mdd_list.append(mdd)
-        self._mdx.open()
-        for mdd in self._mdd_list:
-            mdd.open()
+        if not self._mdx_list:
+            return -1, f"There is no .mdx in {self._src}"
+
+        packages = self._mdx_list + self._mdd_list
+        if self._workers <= 1:
+            for package in packages:
+                package.open()
+        else:
+            # the volumes are read concurrently, their blocks are all decompressed
+            # on one pool, so no more than workers threads inflate at a time
+            with ThreadPoolExecutor(max_workers=self._workers,
+                    thread_name_prefix=f"inflate-{name}") as blocks, \
+                    ThreadPoolExecutor(max_workers=min(len(packages), self._workers),
+                    thread_name_prefix=f"open-{name}") as readers:
+                _ = list(readers.map(lambda package: package.open(self._workers, blocks), packages))
+
+        self._mdx_index = MergedIndex(self._mdx_list)
+        self._mdd_index = MergedIndex(self._mdd_list)
         return 1, ""
 
+    @override
+    def _source_files(self) -> list[str]:
+        with os.scandir(self._src) as entries:
+            return sorted(entry.path for entry in entries
+                if entry.is_file() and os.path.splitext(entry.name)[1] in (".mdx", ".mdd"))
+
     @override
     def query_word(self, word: str) -> tuple[int, str]:
-        htmlfile = os.path.join(self._tempdir, word + ".html")
-        if os.path.isfile(htmlfile):
-            return 1, htmlfile
-        if self._mdx.has_record(word):
-            ret, data = self._mdx.read_record(word)
-
-            if ret == 1:
-                html = "<!DOCTYPE html><html><body>" + data + "</body></html>"
-                with open(htmlfile, "w", encoding="utf-8") as f:
-                    _ = f.write(html)
-            else:
-                return ret, f"Fail to read {word} in {self._name}.mdx, because {data}"
-
-            for mdd in self._mdd_list:
-                pattern = "href='(.+?)'"
-                matches = re.findall(pattern, data)
-                for match in matches:
-                    src = f"\\{match[0]}"
-                    print(f"src = {src}")
-                    if mdd.has_record(src):
-                        ret, data = mdd.read_record(src)
-                        if ret == 1:
-                            srcfile = os.path.join(self._tempdir, src)
-                            with open(srcfile, "w", encoding="utf-8") as f:
-                                _ = f.write(data)
-                        else:
-                            return -1, f"Fail to read {src} in {self._name}.mdd"
-                    else:
-                        return -1, f"There is no {src} in {self._name}.mdd"
+        htmlfile = self._find_page(word + ".html")
+        if htmlfile:
             return 1, htmlfile
+        ret, data = self._read_entry(word)
+        if ret == 1:
+            html = "<!DOCTYPE html><html><body>" + data + "</body></html>"
+            return 1, self.store_page(word + ".html", html)
+
+        return ret, data
+
+    def _read_entry(self, word: str) -> tuple[int, str]:
+        ''' the record of word, following @@@LINK= redirects to the canonical entry
+        '''
+        entry = self._link_cache.get(word)
+        if entry is not None:
+            vol, i = entry
+            return 1, self._mdx_list[vol].read_record_at(i)
+
+        chain = [word]
+        while True:
+            vol, i = self._mdx_index.find(chain[-1])
+            if vol < 0:
+                if len(chain) == 1:
+                    return -1, f"{word} isn't in {self._name}"
+                return -1, f"{word} links to {chain[-1]}, which isn't in {self._name}"
+
+            record = self._mdx_list[vol].read_record_at(i)
+            if not record.startswith(LINK_PREFIX):
+                break
+
+            lines = record[len(LINK_PREFIX):].strip().splitlines()
+            target = lines[0].strip() if lines else ""
+            if not target:
+                return -1, f"{chain[-1]} links to nothing in {self._name}"
+            if target in chain:
+                return -1, f"cyclic links in {self._name}: {' -> '.join(chain + [target])}"
+            chain.append(target)
+
+        # every word of the chain redirects to this entry
+        for key in chain[:-1]:
+            _ = self._link_cache.put(key, (vol, i))
+        return 1, record
 
-        return -1, f"{word} isn't in {self._name}"
+    @override
+    def _neighbours(self, word: str, n: int) -> list[str]:
+        return self._mdx_index.neighbours(word, n)
+
+    @override
+    def _headwords(self) -> tuple[int, Callable[[int], str]]:
+        return len(self._mdx_index), self._mdx_index.key_at
+
+    @override
+    def read_resource(self, name: str) -> tuple[int, bytes | memoryview | str]:
+        vol, i = self._locate_resource(name)
+        if vol < 0:
+            return -1, f"There is no {name} in {self._name}.mdd"
+        return 1, self._mdd_list[vol].read_data_at(i)
+
+    def _locate_resource(self, name: str) -> tuple[int, int]:
+        ''' (mdd, position) of a resource, resources are stored in the mdd packages
+            under keys like "\\img\\a.png", one probe of the merged mdd index per name
+        '''
+        name = name.removeprefix("./").lstrip("/")
+        location = self._resource_map.get(name)
+        if location is None:
+            key = "\\" + name.replace("/", "\\").lstrip("\\")
+            location = self._mdd_index.find(key)
+            _ = self._resource_map.put(name, location)
+        return location
+
+    @property
+    def cache_stats(self) -> dict[str, int] | None:
+        if self._block_cache is None:
+            return None
+        return self._block_cache.stats
 
     @override
     def get_wordlist(self, word: str, limit: int = 100):
-        pattern = "^" + word + ".*"
-        return self._mdx.search_record(pattern, limit)
+        return self._mdx_index.prefix_keys(word, limit)
 
     @override
     def check_addword(self, localfile: str) -> tuple[int, str]:
@@ -101,7 +197,14 @@ class MDictBase(DictBase):
 
         ret3 = True
 
-        ret1 = self._mdx.close()
+        self._stop_prefetch()
+
+        if self._block_cache is not None:
+            print(f"block cache of {self._name}: {self._block_cache.stats}")
+            self._block_cache.clear()
+
+        for mdx in self._mdx_list:
+            ret1 = ret1 and mdx.close()
         for mdd in self._mdd_list:
             ret2 = ret2 and mdd.close()
 
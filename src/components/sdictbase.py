@@ -1,6 +1,6 @@
 #!/usr/bin/python3
 # -*- coding: utf-8 -*-
-from collections.abc import Generator
+from collections.abc import Callable, Generator
 from typing import NamedTuple
 from typing import override, cast
 
@@ -78,6 +78,12 @@ class SDictBase(DictBase):
             word_list.append(row[0])
         return word_list
 
+    @override
+    def _headwords(self) -> tuple[int, Callable[[int], str]]:
+        words = [cast(str, row[0]) for row in cast(Generator[tuple[object, ...], None, None],
+            self._dictbase.each("select word from Words"))]
+        return len(words), words.__getitem__
+
     @override
     def del_word(self, word: str) -> bool:
         raise NotImplementedError("don't support to delete " + word)
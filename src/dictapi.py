@@ -8,8 +8,10 @@ from flask import request, current_app
 from flask.views import MethodView
 
 # from .classbases.dictbase import DictBase
+from src.components.classbases.suggester import SUGGEST_TOPK
 from src.logit import pv
 from src.app.dictapp import DictApp
+from src.app.warmup import LoadState
 from src.app_factory import get_dict_app
 
 
@@ -25,15 +27,15 @@ class DictApi(MethodView):
         for key, val in self._dictapp.dictbases.items():
             self._dictbase_dict[key] = val.name
 
-    def get(self, dict_id: int | None, word: str | None):
+    def get(self, dict_id: int | None, word: str | None, action: str | None = None):
         ''' query
         '''
-        print(f"dict_id = {dict_id}, word = {word}")
+        print(f"dict_id = {dict_id}, word = {word}, action = {action}")
         # query all dicts info, /dicts
         if dict_id is None:
             dict_list: list[dict[str, int | str]] = []
             for key, val in self._dictbase_dict.items():
-                dict_list.append({"id": key, "title": val})
+                dict_list.append({"id": key, "title": val, "state": self._dictapp.dict_state(key)})
             dicts_json = json.dumps(dict_list, ensure_ascii=False, indent=2) 
             print(f"dicts: {dicts_json}")
             return {
@@ -60,9 +62,31 @@ class DictApi(MethodView):
                     'status': 'success',
                     'message': 'sucess to query',
                     'data':{
+                        "state": self._dictapp.dict_state(dict_id),
                         "name": dictbase.name,
                         "desc": dictbase.desc,
-                        "cover": dictbase.cover
+                        "cover": dictbase.cover,
+                        "prefetch": dictbase.prefetch_stats,
+                        "suggest": dictbase.suggest_stats,
+                        "storage": dictbase.storage_stats
+                    }
+                }
+
+            # the dict may still be opening in the background,
+            # a lookup also needs the audio archive and the word dict
+            state, msg = self._dictapp.check_ready(dict_id, action is None and word[-1] != '*')
+            if state is not LoadState.READY:
+                return self._not_ready(state, msg)
+
+            if action == "suggest":
+                # spelling suggestions, /dicts/{dict_id}/{word}/suggest?k=5
+                k = request.args.get("k", SUGGEST_TOPK, type=int)
+                return {
+                    'status': 'success',
+                    'message': 'success to query',
+                    'data': {
+                        "word": word,
+                        "suggestions": self._dictapp.suggest(dict_id, word, k)
                     }
                 }
 
@@ -129,6 +153,9 @@ class DictApi(MethodView):
             partly update
             '/words/<string:word>/add/level/<string:level>',
         '''
+        state, msg = self._dictapp.check_ready()
+        if state is not LoadState.READY:
+            return self._not_ready(state, msg)
         ret = self._dictapp.add_level(word, level)
         if ret:
             return {
@@ -143,6 +170,19 @@ class DictApi(MethodView):
                 'data': ret  
             }
 
+    def _not_ready(self, state: LoadState, msg: str):
+        if state is LoadState.FAILED:
+            return {
+                'status': 'fail',
+                'message': msg,
+                'data': None
+            }, 500
+        return {
+            'status': 'warming',
+            'message': msg,
+            'data': None
+        }, 503, {'Retry-After': '1'}
+
     def _convert2relativepath(self, abs_path: str):
         relative_path = os.path.relpath(abs_path, self._proj_path)
         return relative_path
@@ -1,6 +1,7 @@
 #!/usr/bin/python3
 # -*- coding: utf-8 -*-
 import os
+import mimetypes
 import tempfile
 from typing import cast
 
@@ -10,8 +11,11 @@ from flask import send_from_directory
 from flask.views import MethodView
 
 from src.logit import pv, po, pe
+from src.components.classbases.dictbase import DictBase
+from src.components.classbases.precompress import ENCODINGS
 from src.app.dictapp import DictApp
 from src.app_factory import get_dict_app
+from src.resourceapi import resource_response
 
 
 class FileApi(MethodView):
@@ -59,16 +63,76 @@ class FileApi(MethodView):
         )
         # print(f"full_physical_path = {full_physical_path}")
 
+        # filename may hold "/" (output/img/a.png), so ".." segments must not climb
+        # out of the output directory, nor itemspath out of the project
+        proj_dir = os.path.abspath(self._proj_path)
+        root_dir = proj_dir
+        if itemname:
+            root_dir = os.path.abspath(os.path.join(proj_dir, itemspath, itemname, "output"))
+        if (os.path.commonpath([full_physical_path, root_dir]) != root_dir
+                or os.path.commonpath([root_dir, proj_dir]) != proj_dir):
+            return jsonify({
+                'code': 404,
+                'msg': f'no such file: {target_filename}',
+                'data': None
+            }), 404
+
         # return redirect(redirect_path)
 
         dir_name = os.path.dirname(full_physical_path)
         file_name = os.path.basename(full_physical_path)
+
+        if itemname:
+            output_dir = os.path.join(self._proj_path, itemspath, itemname, "output")
+            dictbase = self._dictapp.find_dictbase(output_dir)
+            if dictbase is not None:
+                resource = os.path.relpath(full_physical_path, os.path.abspath(output_dir))
+                resource = resource.replace(os.sep, "/")
+                # the compressed copy of a page made when it was rendered, if the client takes it
+                encoding = cast(str | None, request.accept_encodings.best_match(list(ENCODINGS)))
+                # rendered pages are served from memory first
+                response = self._cached_page(dictbase, resource, encoding)
+                if response is not None:
+                    return response
+                # resources referenced by an entry aren't extracted to output/,
+                # they are streamed from the dictionary itself
+                if not os.path.isfile(full_physical_path):
+                    response = resource_response(dictbase, resource)
+                    if response is not None:
+                        return response
+                elif encoding is not None and os.path.isfile(full_physical_path + ENCODINGS[encoding]):
+                    response = send_from_directory(
+                        directory=dir_name,
+                        path=file_name + ENCODINGS[encoding],
+                        mimetype=mimetypes.guess_type(file_name)[0] or "application/octet-stream"
+                    )
+                    response.content_encoding = encoding
+                    response.vary.add("Accept-Encoding")
+                    return response
+
         # 自动适配MIME类型（Flask会根据文件后缀识别）
         return send_from_directory(
             directory=dir_name,
             path=file_name
         )
 
+    def _cached_page(self, dictbase: DictBase, pagename: str, encoding: str | None) -> Response | None:
+        ''' a page from the page cache, compressed with encoding if there is such a copy
+        '''
+        page = None
+        if encoding is not None:
+            page = dictbase.read_page(pagename + ENCODINGS[encoding])
+        if page is None:
+            encoding = None
+            page = dictbase.read_page(pagename)
+        if page is None:
+            return None
+        response = Response(page, mimetype="text/html")
+        if encoding is not None:
+            response.content_encoding = encoding
+        response.vary.add("Accept-Encoding")
+        return response
+
     def post(self, itempath: str, itemnum: int, filename: str) -> tuple[Response, int]:
         """ Handle file upload and process via DictApp.add_file()
 
@@ -167,17 +231,36 @@ class FileApi(MethodView):
                 'data': None
             }), 500
 
-    def delete(self, book_id):
-        '''
-            delete
-        '''
-        # book = Book.query.get(book_id)
-        # db.session.delete(book)
-        # db.session.commit()
-        return {
-            'status': 'success',
-            'message': 'Sucess to delete data!'
-        }
+    def delete(self, itempath: str, itemnum: int, filename: str) -> tuple[Response, int]:
+        """ Delete a word uploaded or downloaded before, via DictApp.del_word()
+
+        Args:
+            itempath: dicts or audios
+            itemnum: the dict id
+            filename: the word with the suffix it was uploaded with
+
+        Returns:
+            Tuple[Response, int]: JSON response with status code:
+                - 200: The word is deleted
+                - 404: The word isn't there
+                - 400: The dict doesn't support deleting or isn't ready
+
+        Tests:
+            curl -X DELETE http://127.0.0.1:5000/dicts/1/upload/German.json
+            curl -X DELETE http://127.0.0.1:5000/audios/1/upload/German.mp3
+        """
+        word, _ = os.path.splitext(filename)
+        ret, msg = self._dictapp.del_word(itempath, itemnum, word)
+        code = 200 if ret == 1 else 404 if ret == 0 else 400
+        return jsonify({
+            'code': code,
+            'msg': msg,
+            'data': {
+                'itempath': itempath,
+                'dictnum': itemnum,
+                'filename': filename
+            } if ret == 1 else None
+        }), code
 
     def put(self, book_id):
         '''
@@ -0,0 +1,40 @@
+#!/usr/bin/python3
+# -*- coding: utf-8 -*-
+from typing import cast
+
+from flask import current_app
+from flask.views import MethodView
+
+from src.app.dictapp import DictApp
+from src.app_factory import get_dict_app
+
+
+class HealthApi(MethodView):
+    """ how far the dictionaries have come opening in the background
+
+    """
+    def __init__(self):
+        self._proj_path: str = cast(str, current_app.static_folder)
+        self._dictapp: DictApp = get_dict_app(self._proj_path)
+
+    def get(self, check: str):
+        """ /health, the server is up, with the load progress and timings of every dict
+            /ready, the same but 503 until nothing is pending or loading any more
+
+        Tests:
+            curl http://127.0.0.1:5000/health
+            curl -i http://127.0.0.1:5000/ready
+        """
+        report = self._dictapp.warmup_report
+        done = report is not None and report["done"]
+        if check == "ready" and not done:
+            return {
+                'status': 'warming',
+                'message': 'the dictionaries are still loading',
+                'data': report
+            }, 503, {'Retry-After': '1'}
+        return {
+            'status': 'success',
+            'message': 'ready' if done else 'the dictionaries are still loading',
+            'data': report
+        }
@@ -10,6 +10,7 @@ from flask.views import MethodView
 from src.components.classbases.dictbase import DictBase
 from src.logit import pv, po, pe
 from src.app.dictapp import DictApp
+from src.app.warmup import LoadState
 from src.app_factory import get_dict_app
 
 
@@ -39,6 +40,9 @@ class ReciteApi(MethodView):
         msg = ""
         data_dict = {}
         dict_id = 1
+        state, msg = self._app.check_ready(dict_id)
+        if state is not LoadState.READY:
+            return self._not_ready(state, msg)
         if para is None:
             match action:
                 case "start2recite":
@@ -168,6 +172,9 @@ class ReciteApi(MethodView):
         '''
             create
         '''
+        state, msg = self._app.check_ready()
+        if state is not LoadState.READY:
+            return self._not_ready(state, msg)
         code = 400
         msg = ""
         data_dict: dict[str, object] = {}
@@ -205,6 +212,15 @@ class ReciteApi(MethodView):
             'data': data_dict
         }
 
+    def _not_ready(self, state: LoadState, msg: str):
+        # the words are still opening in the background, or failed to
+        code = 500 if state is LoadState.FAILED else 503
+        return {
+            'code': code,
+            'msg': msg,
+            'data': {}
+        }, code
+
     def _convert2relativepath(self, abs_path: str):
         relative_path = os.path.relpath(abs_path, self._proj_path)
         return relative_path
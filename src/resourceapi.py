@@ -0,0 +1,78 @@
+#!/usr/bin/python3
+# -*- coding: utf-8 -*-
+import mimetypes
+from collections.abc import Iterator
+from typing import cast
+
+from flask import Response, current_app
+from flask import jsonify
+from flask.views import MethodView
+
+from src.components.classbases.dictbase import DictBase
+from src.app.dictapp import DictApp
+from src.app.warmup import LoadState
+from src.app_factory import get_dict_app
+
+# bytes handed to the server per write while streaming a resource
+STREAM_CHUNK_SIZE = 64 * 1024
+
+
+def resource_response(dictbase: DictBase, resource: str) -> Response | None:
+    ''' stream a resource of dictbase as it is stored, None if there is no such resource
+    '''
+    ret, data = dictbase.read_resource(resource)
+    if ret != 1:
+        return None
+
+    view = memoryview(cast(bytes | memoryview, data))
+
+    def generate() -> Iterator[bytes]:
+        for strt in range(0, len(view), STREAM_CHUNK_SIZE):
+            yield bytes(view[strt: strt + STREAM_CHUNK_SIZE])
+
+    mimetype = mimetypes.guess_type(resource)[0] or "application/octet-stream"
+    response = Response(generate(), mimetype=mimetype, direct_passthrough=True)
+    response.content_length = len(view)
+    return response
+
+
+class ResourceApi(MethodView):
+    """ resources (images, fonts, sounds, ...) packed with a dictionary,
+        e.g. the .mdd files of an mdx dictionary
+
+    """
+    def __init__(self):
+        self._proj_path: str = cast(str, current_app.static_folder)
+        self._dictapp: DictApp = get_dict_app(self._proj_path)
+
+    def get(self, dict_id: int, resource: str):
+        """ /dicts/<dict_id>/res/<resource>
+
+        Tests:
+            curl http://127.0.0.1:5000/dicts/1/res/img/a.png --output a.png
+        """
+        dictbase = self._dictapp.dictbases.get(dict_id)
+        if dictbase is None:
+            return jsonify({
+                'code': 404,
+                'msg': f'no dict id: {dict_id}',
+                'data': None
+            }), 404
+
+        state, msg = self._dictapp.check_ready(dict_id, lookup=False)
+        if state is not LoadState.READY:
+            code = 500 if state is LoadState.FAILED else 503
+            return jsonify({
+                'code': code,
+                'msg': msg,
+                'data': None
+            }), code
+
+        response = resource_response(dictbase, resource)
+        if response is None:
+            return jsonify({
+                'code': 404,
+                'msg': f'There is no {resource} in {dictbase.name}',
+                'data': None
+            }), 404
+        return response
@@ -0,0 +1,165 @@
+#!/usr/bin/python3
+# -*- coding: utf-8 -*-
+''' known answers for the ciphers and the hash of encrypted mdx dictionaries,
+    on the pure python path and, if numpy is installed, on the numpy path
+
+    python -m unittest discover -s tests
+'''
+import random
+import unittest
+from contextlib import contextmanager, ExitStack
+from unittest import mock
+
+from src.components.classbases import mdpackage
+from src.components.classbases.mdpackage import MdPackage
+from src.components.classbases.utils import pureSalsa20
+from src.components.classbases.utils.pureSalsa20 import Salsa20
+from src.components.classbases.utils.ripemd128 import ripemd128
+
+# the test vectors of the RIPEMD-128 specification
+RIPEMD128_VECTORS = [
+    (b"", "cdf26213a150dc3ecb610f18f6b38b46"),
+    (b"a", "86be7afa339d0fc7cfc785e72f578d33"),
+    (b"abc", "c14a12199c66e4ba84636b0f69144c77"),
+    (b"message digest", "9e327b3d6e523062afc1132d7df9d1b8"),
+    (b"abcdefghijklmnopqrstuvwxyz", "fd2aa607f71dc8f510714922b371834e"),
+    (b"abcdbcdecdefdefgefghfghighijhijkijkljklmklmnlmnomnopnopq", "a1aa0689d0fafa2ddc22e88b49133a06"),
+    (b"ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqrstuvwxyz0123456789", "d1e959eb179c911faea4624c60c5c702"),
+    (b"1234567890" * 8, "3f45ef194732c2dbb2c4a2c769795fa3"),
+    (b"a" * 1000000, "4a7f5723f954eba1216c9d8f6320431f"),
+]
+
+# eSTREAM Salsa20 set 1, vector 0: the key 80 00 .. 00, the nonce 0, stream[0..63]
+SALSA20_VECTORS = [
+    (16, 20, "4DFA5E481DA23EA09A31022050859936DA52FCEE218005164F267CB65F5CFD7F"
+             "2B4F97E0FF16924A52DF269515110A07F9E460BC65EF95DA58F740B7D1DBB0AA"),
+    (16, 12, "FC207DBFC76C5E1774961E7A5AAD09069B2225AC1CE0FE7A0CE77003E7E5BDF8"
+             "B31AF821000813E6C56B8C1771D6EE7039B2FBD0A68E8AD70A3944B677937897"),
+    (16, 8, "A9C9F888AB552A2D1BBFF9F36BEBEB337A8B4B107C75B63BAE26CB9A235BBA9D"
+            "784F38BEFC3ADF4CD3E266687EA7B9F09BA650AE81EAC6063AE31FF12218DDC5"),
+    (32, 20, "E3BE8FDD8BECA2E3EA8EF9475B29A6E7003951E1097A5C38D23B7A5FAD9F6844"
+             "B22C97559E2723C7CBBD3FE4FC8D9A0744652A83E72A9C461876AF4D7EF1A117"),
+    (32, 8, "B1F599E9B0D96DF436AE31F5EF589565B92D245DB5A1D4C7A78E5E8D0146F8A4"
+            "9D326C1A3BF50C052C9C8F114DC74972C4469591E31C9ED11927AA9871F38583"),
+]
+
+
+def fast_decrypt_reference(data: bytes, key: bytes) -> bytes:
+    # one byte at a time, as MdPackage did before it was vectorized
+    b = bytearray(data)
+    previous = 0x36
+    for i in range(len(b)):
+        t = (b[i] >> 4 | b[i] << 4) & 0xff
+        t = t ^ previous ^ (i & 0xff) ^ key[i % len(key)]
+        previous = b[i]
+        b[i] = t
+    return bytes(b)
+
+
+def fast_encrypt(data: bytes, key: bytes) -> bytes:
+    # the inverse of _fast_decrypt
+    c = bytearray(len(data))
+    previous = 0x36
+    for i, t in enumerate(data):
+        t = t ^ previous ^ (i & 0xff) ^ key[i % len(key)]
+        c[i] = (t >> 4 | t << 4) & 0xff
+        previous = c[i]
+    return bytes(c)
+
+
+class Ripemd128Test(unittest.TestCase):
+    def test_vectors(self):
+        for message, digest in RIPEMD128_VECTORS:
+            with self.subTest(message=message[:16]):
+                self.assertEqual(ripemd128(message).hex(), digest)
+
+    def test_block_boundaries(self):
+        # the padding spills into a second block from 56 bytes on
+        digests = {ripemd128(b"a" * n) for n in range(54, 130)}
+        self.assertEqual(len(digests), 130 - 54)
+
+
+class _BothPaths:
+    ''' the tests are run without numpy, then with it if it is installed
+    '''
+    modules = ()
+
+    def paths(self) -> list[str]:
+        if all(module.np is not None for module in self.modules):
+            return ["python", "numpy"]
+        return ["python"]
+
+    @contextmanager
+    def path(self, name: str):
+        np = self.modules[0].np if name == "numpy" else None
+        with self.subTest(path=name), ExitStack() as stack:
+            for module in self.modules:
+                _ = stack.enter_context(mock.patch.object(module, "np", np))
+            yield
+
+
+class Salsa20Test(_BothPaths, unittest.TestCase):
+    modules = (pureSalsa20,)
+
+    def test_vectors(self):
+        for name in self.paths():
+            with self.path(name):
+                for keylen, rounds, stream in SALSA20_VECTORS:
+                    key = b"\x80" + bytes(keylen - 1)
+                    # a block more, the numpy path only takes several blocks
+                    out = Salsa20(key, bytes(8), rounds).encrypt_bytes(bytes(128))
+                    self.assertEqual(out[:64].hex().upper(), stream)
+
+    def test_paths_agree(self):
+        streams: dict[tuple[int, int, int], set[bytes]] = {}
+        for name in self.paths():
+            with self.path(name):
+                for rounds in (8, 20):
+                    # across the 32-bit halves and the 64-bit counter wrapping round
+                    for counter, n in ((0, 1000), (2**32 - 3, 640), (2**64 - 2, 300)):
+                        rnd = random.Random(f"{rounds}-{counter}-{n}")
+                        key, iv, data = rnd.randbytes(32), rnd.randbytes(8), rnd.randbytes(n)
+                        salsa = Salsa20(key, iv, rounds)
+                        salsa.set_counter(counter)
+                        out = salsa.encrypt_bytes(data)
+                        self.assertEqual(salsa.get_counter(), (counter + (n + 63) // 64) % 2**64)
+                        salsa = Salsa20(key, iv, rounds)
+                        salsa.set_counter(counter)
+                        self.assertEqual(salsa.encrypt_bytes(out), data)
+                        streams.setdefault((rounds, counter, n), set()).add(out)
+        for key, outs in streams.items():
+            self.assertEqual(len(outs), 1, key)
+
+
+class FastDecryptTest(_BothPaths, unittest.TestCase):
+    modules = (mdpackage,)
+
+    def test_round_trip(self):
+        package = MdPackage.__new__(MdPackage)
+        rnd = random.Random(1)
+        for name in self.paths():
+            with self.path(name):
+                # the byte index is taken mod 256, over 256 bytes it wraps round
+                for n in (0, 1, 2, 15, 16, 17, 255, 256, 257, 1000, 70000):
+                    data, key = rnd.randbytes(n), rnd.randbytes(16)
+                    encrypted = fast_encrypt(data, key)
+                    with self.subTest(n=n):
+                        self.assertEqual(package._fast_decrypt(encrypted, key), data)
+                        self.assertEqual(package._fast_decrypt(memoryview(encrypted), key), data)
+                        self.assertEqual(package._fast_decrypt(encrypted, key),
+                            fast_decrypt_reference(encrypted, key))
+
+    def test_mdx_decrypt(self):
+        # the key of a key block info is ripemd128 of its checksum and 0x3695
+        package = MdPackage.__new__(MdPackage)
+        plain = bytes(range(256)) * 3
+        head = b"\x02\x00\x00\x00" + b"\x12\x34\x56\x78"
+        key = ripemd128(head[4:8] + b"\x95\x36\x00\x00")
+        block = head + fast_encrypt(plain, key)
+        for name in self.paths():
+            with self.path(name):
+                self.assertEqual(package._mdx_decrypt(block), head + plain)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,47 @@
+#!/usr/bin/python3
+# -*- coding: utf-8 -*-
+''' pages of the google dictionary against the pages the renderer made
+    before it was rewritten, in tests/data/gdict: <word>.json and <word>.html
+
+    python -m unittest discover -s tests
+'''
+import os
+import unittest
+from unittest import mock
+
+from src.components.gdictbase import GDictBase, GDictEntry
+
+DATA_DIR = os.path.join(os.path.dirname(__file__), "data", "gdict")
+
+
+class GDictRenderTest(unittest.TestCase):
+    def setUp(self):
+        self.dictbase = GDictBase()
+        # the page itself, not where it is kept
+        patch = mock.patch.object(self.dictbase, "store_page", lambda pagename, html: html)
+        _ = patch.start()
+        self.addCleanup(patch.stop)
+
+    def test_golden_pages(self):
+        words = sorted(name[:-5] for name in os.listdir(DATA_DIR) if name.endswith(".json"))
+        self.assertTrue(words)
+        for word in words:
+            with self.subTest(word=word):
+                with open(os.path.join(DATA_DIR, word + ".json"), "r", encoding="utf-8") as f:
+                    entry = GDictEntry(f.read())
+                with open(os.path.join(DATA_DIR, word + ".html"), "r", encoding="utf-8", newline="") as f:
+                    page = f.read()
+                self.assertEqual(entry.inword, word)
+                self.assertEqual(self.dictbase._render_entry(entry, word + ".html"), page)
+
+    def test_empty_child(self):
+        # a child that renders nothing is left out, with no line break or "Q: " for it
+        entry = GDictEntry('{"ok": true, "info": "{\\"primaries\\": [{\\"type\\": \\"headword\\", '
+            '\\"terms\\": [{\\"type\\": \\"text\\", \\"text\\": \\"w\\"}], \\"entries\\": [{}]}]}"}')
+        page = self.dictbase._render_entry(entry, "w.html")
+        self.assertIn("\t\t<div class = 'headword'>\n\t\t\t<div class = 'text'>w</div>\n\t</div>\n"
+            "\n\t</body>", page)
+
+
+if __name__ == "__main__":
+    unittest.main()
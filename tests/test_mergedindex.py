@@ -0,0 +1,38 @@
+#!/usr/bin/python3
+# -*- coding: utf-8 -*-
+''' key lookups of the sorted key tables
+
+    python -m unittest discover -s tests
+'''
+import random
+import unittest
+
+from src.components.classbases.mergedindex import find_sorted, prefix_range
+
+# around the surrogates, the utf-8 length steps and the last code point
+ALPHABET = ["a", "z", "\x7f", "\x80", "é", "퟿", "", "￿", "\U00010000", "\U0010ffff"]
+
+
+class PrefixRangeTest(unittest.TestCase):
+    def setUp(self):
+        rnd = random.Random(5)
+        words = {"".join(rnd.choices(ALPHABET, k=rnd.randint(0, 4))) for _ in range(3000)}
+        self.keys = sorted(word.encode("utf-8") for word in words)
+
+    def test_prefixes(self):
+        rnd = random.Random(6)
+        prefixes = ["", *ALPHABET] + ["".join(rnd.choices(ALPHABET, k=rnd.randint(1, 3))) for _ in range(2000)]
+        for prefix in prefixes:
+            with self.subTest(prefix=prefix):
+                lo, hi = prefix_range(len(self.keys), prefix, self.keys.__getitem__)
+                expected = [key for key in self.keys if key.startswith(prefix.encode("utf-8"))]
+                self.assertEqual(self.keys[lo: hi], expected)
+
+    def test_find_sorted(self):
+        for i, key in enumerate(self.keys):
+            self.assertEqual(find_sorted(len(self.keys), key, self.keys.__getitem__), i)
+        self.assertEqual(find_sorted(len(self.keys), b"\xff", self.keys.__getitem__), -1)
+
+
+if __name__ == "__main__":
+    unittest.main()